@@ -1,31 +1,79 @@
+import time
+# Startup is measured from here, i.e. excluding interpreter start-up itself
+LAUNCH_TIME = time.perf_counter()
 import tkinter as tk
 from tkinter import messagebox
+from tkinter import font as tkfont
+import importlib.util
+import collections
 import random
-import time
 import sys
-import math
 import threading
-try:
-    import spotipy
-    from spotipy.oauth2 import SpotifyOAuth
-    SPOTIFY_AVAILABLE = True
-except ImportError:
-    SPOTIFY_AVAILABLE = False
+import os
+import sudoku_solver
+import sudoku_generator
+import solution_grids
+import sudoku_canonical
+from puzzle_pool import PuzzlePool
+from puzzle_bank import PuzzleBank
+from sudoku_board import BoardModel
+from candidate_engine import CandidateEngine
+import move_log
+from move_log import MoveLog, CORRECT, WRONG, CLEARED, UNDONE
+from wave_visualizer import WaveVisualizer
+from beat_grid import BeatClock, BeatGrid
+from frame_scheduler import CachedProbe, FrameScheduler, THROTTLE
+from spotify_service import PlaybackService, spotify_client_factory
+from audio_features import AudioFeatureProvider, FixtureFeatureSource
+from board_renderer import CanvasBoardRenderer, EntryBoardRenderer, READONLY_KINDS, cell_styles
+from perf_stats import stats
+from perf_overlay import PerfOverlay
+from sudoku_client import GameClient, parse_address
+# spotipy (and requests under it) is only imported once "Connect Spotify" is
+# pressed, on the playback worker thread; startup just checks it is installed
+SPOTIFY_AVAILABLE = importlib.util.find_spec("spotipy") is not None
+
+# Board sizes offered in the UI, by box size
+BOARD_SIZES = {"4×4": 2, "9×9": 3, "16×16": 4, "25×25": 5}
+# Canvas cell size in pixels for each board size
+CELL_PIXELS = {4: 64, 9: 48, 16: 32, 25: 24}
 
 class SudokuGame:
-    def __init__(self):
+    def __init__(self, canvas_board=False, startup_check=False, server=None, room=None,
+                 resume=False):
+        self.canvas_board = canvas_board
+        # Quit as soon as the first frame is up, after reporting how long it took
+        self.startup_check = startup_check
+        self.first_frame_ms = None
         self.root = tk.Tk()
         self.root.title("Sudoku Game")
         self.root.geometry("550x700")
         
-        self.is_dark_mode = self.detect_dark_mode()
+        # Every periodic job runs through one scheduler, which suspends or
+        # slows them while the window is hidden or unfocused
+        self.scheduler = FrameScheduler(self.root)
+        self.scheduler.focus_listeners.append(self.on_focus_regained)
+        # Theme detection forks a process on macOS, so its result is cached
+        self.theme_probe = CachedProbe(self.detect_dark_mode, ttl=10.0)
+        
+        self.is_dark_mode = self.theme_probe.get()
         self.setup_colors()
         
         self.root.configure(bg=self.bg_color)
         
+        # Everything about the board follows from the box size: 3 is the
+        # classic 9x9 game, 2 gives 4x4, 4 gives 16x16 and 5 gives 25x25
+        self.box_size = 3
+        self.board_size = 9
+        self.symbols = sudoku_solver.SYMBOLS[self.board_size]
         self.grid = [[0 for _ in range(9)] for _ in range(9)]
         self.solution = [[0 for _ in range(9)] for _ in range(9)]
         self.entries = [[None for _ in range(9)] for _ in range(9)]
+        # What the board currently shows, kept in sync by check_number
+        self.board = BoardModel()
+        # Candidates from the givens and correct digits, for pencil marks and hints
+        self.candidates = CandidateEngine()
+        self.show_marks = False
         self.mistakes = 0
         self.max_mistakes = 3
         self.difficulty = "Easy"
@@ -38,66 +86,121 @@ class SudokuGame:
         self.player1_mistakes = 0
         self.player2_mistakes = 0
         
+        # Online play: the server deals the puzzle, checks every move against
+        # its solution and decides turns and mistakes; this side sends moves
+        # and renders the verdicts
+        self.server_address = server
+        self.online_room = room or "lobby"
+        self.is_online = False
+        self.net_client = None
+        self.online_seat = None
+        self.online_seats = 2
+        self.online_players = []
+        # Cells of moves sent but not yet answered, by move id
+        self.online_moves = {}
+        if server:
+            self.game_mode = "Online"
+            self.is_online = True
+            self.is_multiplayer = True
+        
         self.spotify_connected = False
         self.current_song = "No song playing"
         self.spotify_client = None
-        self.sound_waves = []
+        self.playback_service = None
+        self.wave_visualizer = None
+        self.wave_bar_count = 50
+        self.wave_fps = 8
         self.wave_animation_running = False
         self.is_music_playing = False
         self.current_track_id = None
         self.track_tempo = 120
         self.track_energy = 0.5
         self.song_start_time = 0
-        
-        self.difficulty_settings = {
-            "Easy": 35,
-            "Medium": 45,
-            "Hard": 55,
-            "Stupidly Hard": 60,
-            "Impossibly Hard": 70
-        }
-        
+        # Amplitude envelopes are precomputed per track and sampled by phase
+        self.beat_grid = BeatGrid(tempo=self.track_tempo, energy=self.track_energy)
+        self.idle_grid = BeatGrid(tempo=60, energy=0.0, seed=0, scale=0.35)
+        self.beat_clock = BeatClock()
+        # Created on the first Spotify connection
+        self.audio_features = None
+        
+        self.difficulty_settings = dict(sudoku_generator.DIFFICULTY_SETTINGS)
+        self.symmetry = "none"
+        self.generation_time_budget = 2.0
+        # Target the rater's technique score bands instead of only a hole count
+        self.generate_by_score = False
+        
+        # Canonical keys of every puzzle served so far, so a relabelled or
+        # rotated copy of one the player has already had is never dealt again
+        self.seen_puzzles = sudoku_canonical.SeenSet.open(os.path.expanduser("~/.sudoku_seen"))
+        
+        self.puzzle_pool = self.create_puzzle_pool()
+        self.puzzle_bank = PuzzleBank.open(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                        "puzzles.bank"))
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Timings and counters; F3 shows them, SUDOKU_PERF_LOG appends a JSON
+        # line snapshot to that file every 30 seconds and on exit
+        self.perf_log_path = os.environ.get("SUDOKU_PERF_LOG")
+        if self.perf_log_path:
+            stats.enabled = True
+        
+        # Every game and move is appended to a binary log on a worker thread;
+        # --resume picks the last unfinished game back up from it
+        self.move_log = MoveLog(os.environ.get("SUDOKU_MOVE_LOG") or
+                                os.path.expanduser("~/.sudoku_moves"))
+        
+        # Only the board and controls are built before the window first
+        # appears; the first puzzle comes from the bank or is generated
+        # synchronously, and everything else waits for finish_startup
         self.create_widgets()
-        self.generate_puzzle()
-        
-        self.check_theme_change()
+        if not (resume and not self.is_online and self.resume_from_log()):
+            self.generate_puzzle()
+        self.root.after_idle(self.finish_startup)
+    
+    def finish_startup(self):
+        # Runs once Tk is idle after mapping the window, so pending redraws
+        # are flushed first and the board is on screen and accepting input
+        self.root.update_idletasks()
+        self.first_frame_ms = (time.perf_counter() - LAUNCH_TIME) * 1000.0
+        stats.record("startup.first_frame", self.first_frame_ms / 1000.0)
+        if self.startup_check or stats.enabled:
+            print(f"First interactive frame after {self.first_frame_ms:.1f} ms", file=sys.stderr)
+        if self.startup_check:
+            self.on_close()
+            return
         
+        self.puzzle_pool.start()
+        self.move_log.start()
         self.init_sound_waves()
+        self.scheduler.add("waves", self.animate_waves, 1.0 / self.wave_fps, priority=1,
+                           when_unfocused=THROTTLE)
+        self.scheduler.add("theme", self.check_theme_change, 10.0, when_unfocused=THROTTLE, delay=10.0)
+        if self.is_online:
+            self.connect_online()
     
     def init_sound_waves(self):
-        self.sound_waves = [random.uniform(0.3, 0.8) for _ in range(50)]
+        self.wave_visualizer = WaveVisualizer(self.wave_canvas,
+                                              bar_count=self.wave_bar_count, fps=self.wave_fps,
+                                              color=self.wave_color(),
+                                              source=self.next_wave_amplitude)
+        self.wave_visualizer.fill(lambda: random.uniform(0.3, 0.8))
         self.wave_animation_running = True
     
+    def wave_color(self):
+        return '#00AAFF' if self.is_dark_mode else '#0066CC'
+    
+    def next_wave_amplitude(self):
+        now = time.time()
+        if self.is_music_playing:
+            return self.beat_grid.sample(now - self.song_start_time)
+        return self.idle_grid.sample(now)
+    
     def animate_waves(self):
+        # One visualizer frame; the returned delay becomes the task interval,
+        # so the visualizer's own frame-time backoff still applies
         if not self.wave_animation_running:
-            return
-        
-        self.wave_canvas.delete("all")
-        
-        canvas_width = 400
-        canvas_height = 80
-        
-        wave_color = '#00AAFF' if self.is_dark_mode else '#0066CC'
-        bar_width = canvas_width / len(self.sound_waves)
-        
-        for i, amplitude in enumerate(self.sound_waves):
-            x = i * bar_width
-            wave_height = max(8, amplitude * (canvas_height - 5))
-            center_y = canvas_height / 2
-            
-            self.wave_canvas.create_rectangle(
-                x + 1.5, center_y - wave_height/2,
-                x + bar_width - 1.5, center_y + wave_height/2,
-                fill=wave_color, outline=wave_color
-            )
-        
-        if self.is_music_playing:
-            beat_intensity = 0.6 + 0.3 * math.sin(time.time() * (self.track_tempo / 60.0) * 2 * math.pi)
-            self.sound_waves = self.sound_waves[1:] + [random.uniform(0.4, beat_intensity)]
-        else:
-            self.sound_waves = self.sound_waves[1:] + [random.uniform(0.05, 0.15)]
-        
-        self.root.after(120, self.animate_waves)
+            return None
+        return self.wave_visualizer.step()
     
     def detect_dark_mode(self):
         try:
@@ -132,30 +235,26 @@ class SudokuGame:
             self.prefilled_fg = '#333333'
             self.timer_color = '#0066CC'
             self.mistake_color = '#CC0000'
-        
+        self.cell_styles = cell_styles(self.prefilled_bg, self.prefilled_fg,
+                                       self.empty_cell_bg, self.empty_cell_fg)
+        
+    def create_puzzle_pool(self):
+        score_bands = sudoku_generator.DIFFICULTY_SCORE_BANDS if self.generate_by_score else None
+        # Large boards take a while to dig; a game started before the workers
+        # deliver gets a quicker, shallower dig so the UI stays responsive
+        sync_budget = self.generation_time_budget if self.box_size <= 3 else 0.5
+        return PuzzlePool(self.difficulty_settings, symmetry=self.symmetry,
+                          time_budget=self.generation_time_budget,
+                          score_bands=score_bands, seen=self.seen_puzzles, box=self.box_size,
+                          sync_time_budget=sync_budget)
+    
     def create_widgets(self):
         self.main_frame = tk.Frame(self.root, bg=self.grid_bg)
         self.main_frame.pack(pady=15)
         
-        self.subgrids = [[None for _ in range(3)] for _ in range(3)]
-        
-        for box_row in range(3):
-            for box_col in range(3):
-                subgrid = tk.Frame(self.main_frame, bg=self.grid_bg, bd=3, relief='solid')
-                subgrid.grid(row=box_row, column=box_col, padx=3, pady=3)
-                self.subgrids[box_row][box_col] = subgrid
-        
-        for i in range(9):
-            for j in range(9):
-                box_row, box_col = i // 3, j // 3
-                cell_row, cell_col = i % 3, j % 3
-                
-                entry = tk.Entry(self.subgrids[box_row][box_col], width=3, justify='center', 
-                               font=('Arial', 20, 'bold'), bd=2, relief='solid')
-                entry.grid(row=cell_row, column=cell_col, padx=3, pady=3)
-                entry.bind('<KeyRelease>', lambda e, r=i, c=j: self.validate_input(e, r, c))
-                entry.bind('<Button-1>', lambda e, r=i, c=j: self.on_click(r, c))
-                self.entries[i][j] = entry
+        self.cell_font = tkfont.Font(root=self.root, family='Arial', size=20, weight='bold')
+        self.marks_font = tkfont.Font(root=self.root, family='Arial', size=8)
+        self.create_board()
         
         controls_frame = tk.Frame(self.root, bg=self.bg_color)
         controls_frame.pack(pady=10)
@@ -167,8 +266,8 @@ class SudokuGame:
                 bg=self.bg_color, fg=self.text_color).pack(side=tk.LEFT, padx=5)
         
         self.mode_var = tk.StringVar(value=self.game_mode)
-        self.mode_menu = tk.OptionMenu(mode_frame, self.mode_var, 
-                                      "Single Player", "Multiplayer",
+        modes = ["Single Player", "Multiplayer"] + (["Online"] if self.server_address else [])
+        self.mode_menu = tk.OptionMenu(mode_frame, self.mode_var, *modes,
                                       command=self.change_mode)
         self.mode_menu.config(font=('Arial', 12))
         self.mode_menu.pack(side=tk.LEFT, padx=5)
@@ -187,6 +286,30 @@ class SudokuGame:
         self.difficulty_menu.config(font=('Arial', 12))
         self.difficulty_menu.pack(side=tk.LEFT, padx=5)
         
+        self.size_frame = tk.Frame(self.root, bg=self.bg_color)
+        self.size_frame.pack()
+        
+        self.size_label = tk.Label(self.size_frame, text="Board:", font=('Arial', 14, 'bold'),
+                                   bg=self.bg_color, fg=self.text_color)
+        self.size_label.pack(side=tk.LEFT, padx=5)
+        
+        self.size_var = tk.StringVar(value="9×9")
+        self.size_menu = tk.OptionMenu(self.size_frame, self.size_var, *BOARD_SIZES,
+                                       command=self.change_size)
+        self.size_menu.config(font=('Arial', 12))
+        self.size_menu.pack(side=tk.LEFT, padx=5)
+        
+        self.marks_var = tk.BooleanVar(value=self.show_marks)
+        self.marks_check = tk.Checkbutton(self.size_frame, text="Notes", variable=self.marks_var,
+                                          command=self.toggle_marks, font=('Arial', 12),
+                                          bg=self.bg_color, fg=self.text_color,
+                                          selectcolor=self.bg_color)
+        self.marks_check.pack(side=tk.LEFT, padx=5)
+        
+        self.hint_btn = tk.Button(self.size_frame, text="Hint", command=self.show_hint,
+                                  font=('Arial', 12))
+        self.hint_btn.pack(side=tk.LEFT, padx=5)
+        
         self.timer_label = tk.Label(self.root, text="Time: 00:00", 
                                    font=('Arial', 16, 'bold'), fg=self.timer_color, bg=self.bg_color)
         self.timer_label.pack(pady=10)
@@ -199,6 +322,10 @@ class SudokuGame:
                                     font=('Arial', 14, 'bold'), fg=self.text_color, bg=self.bg_color)
         self.player_label.pack(pady=5)
         
+        self.hint_label = tk.Label(self.root, text="", font=('Arial', 12), wraplength=480,
+                                   fg=self.text_color, bg=self.bg_color)
+        self.hint_label.pack(pady=2)
+        
         spotify_frame = tk.Frame(self.root, bg=self.bg_color)
         spotify_frame.pack(pady=5)
         
@@ -220,11 +347,107 @@ class SudokuGame:
                                    highlightthickness=1, highlightcolor='#555555')
         self.wave_canvas.pack(pady=10)
         
-        self.update_timer()
+        self.scheduler.add("timer", self.update_timer, 1.0, priority=2)
+        
+        self.perf_overlay = PerfOverlay(self.root, stats)
+        self.root.bind('<F3>', self.toggle_perf_overlay)
+        self.root.bind('<F4>', self.export_perf_stats)
+        self.root.bind('<Control-z>', self.undo_move)
+        if self.perf_log_path:
+            self.scheduler.add("perf_export", self.export_perf_stats, 30.0, when_hidden=THROTTLE,
+                               delay=30.0)
+    
+    def toggle_perf_overlay(self, event=None):
+        if self.perf_overlay.toggle():
+            self.scheduler.add("perf_overlay", self.perf_overlay.refresh, 0.5, priority=-1)
+        else:
+            self.scheduler.remove("perf_overlay")
+    
+    def export_perf_stats(self, event=None):
+        path = self.perf_log_path or os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                  "perf_stats.jsonl")
+        stats.export(path)
+    
+    def create_board(self):
+        # 16x16 and 25x25 would need hundreds of Entry widgets, so those
+        # boards always use the single-canvas renderer
+        if self.canvas_board or self.board_size > 9:
+            self.create_canvas_board()
+        else:
+            self.create_entry_board()
+    
+    def create_entry_board(self):
+        box, size = self.box_size, self.board_size
+        self.subgrids = [[None for _ in range(box)] for _ in range(box)]
+        
+        for box_row in range(box):
+            for box_col in range(box):
+                subgrid = tk.Frame(self.main_frame, bg=self.grid_bg, bd=3, relief='solid')
+                subgrid.grid(row=box_row, column=box_col, padx=3, pady=3)
+                self.subgrids[box_row][box_col] = subgrid
+        
+        for i in range(size):
+            for j in range(size):
+                box_row, box_col = i // box, j // box
+                cell_row, cell_col = i % box, j % box
+                
+                entry = tk.Entry(self.subgrids[box_row][box_col], width=3, justify='center', 
+                               font=self.cell_font, bd=2, relief='solid')
+                entry.grid(row=cell_row, column=cell_col, padx=3, pady=3)
+                entry.bind('<KeyRelease>', lambda e, r=i, c=j: self.validate_input(e, r, c))
+                entry.bind('<Button-1>', lambda e, r=i, c=j: self.on_click(r, c))
+                self.entries[i][j] = entry
         
-        self.root.after(500, self.animate_waves)
+        self.board_renderer = EntryBoardRenderer(self.entries, self.cell_styles, self.symbols,
+                                                 self.marks_font)
+    
+    def create_canvas_board(self):
+        # One canvas draws every cell and handles keyboard/mouse input itself
+        self.subgrids = []
+        cell_size = CELL_PIXELS[self.board_size]
+        font, marks_font = self.cell_font, self.marks_font
+        if self.board_size > 9:
+            font = tkfont.Font(root=self.root, family='Arial', size=cell_size * 5 // 12, weight='bold')
+            # box lines of marks have to fit in one cell
+            marks_font = tkfont.Font(root=self.root, family='Arial',
+                                     size=max(5, cell_size // (2 * self.box_size)))
+        self.board_renderer = CanvasBoardRenderer(self.main_frame, self.cell_styles, font,
+                                                  self.grid_bg, self.on_board_input, self.on_click,
+                                                  size=self.board_size, box_size=self.box_size,
+                                                  cell_size=cell_size, symbols=self.symbols,
+                                                  marks_font=marks_font)
+        self.board_renderer.canvas.pack(padx=3, pady=3)
+    
+    def change_size(self, label):
+        box = BOARD_SIZES[label]
+        if box == self.box_size:
+            return
+        self.resize_board(box)
+        self.new_game()
+    
+    def resize_board(self, box):
+        self.box_size = box
+        self.board_size = box * box
+        self.symbols = sudoku_solver.SYMBOLS[self.board_size]
+        
+        # The pool only ever generates one size, so it is swapped with the board
+        started = self.puzzle_pool.executor is not None
+        self.puzzle_pool.shutdown()
+        self.puzzle_pool = self.create_puzzle_pool()
+        self.puzzle_pool.set_current(self.difficulty)
+        if started:
+            self.puzzle_pool.start()
+        
+        for child in self.main_frame.winfo_children():
+            child.destroy()
+        self.entries = [[None for _ in range(self.board_size)] for _ in range(self.board_size)]
+        self.create_board()
+        # Let the window grow or shrink to fit the new board
+        self.root.geometry("")
+        self.size_var.set(next(label for label, b in BOARD_SIZES.items() if b == box))
     
     def validate_input(self, event, row, col):
+        self.board_renderer.note_input(row, col)
         value = event.widget.get()
         
         if value:
@@ -233,13 +456,87 @@ class SudokuGame:
                 event.widget.delete(0, tk.END)
                 event.widget.insert(0, value)
             
-            if not value.isdigit() or not (1 <= int(value) <= 9):
+            if sudoku_solver.symbol_value(value, self.board_size) is None:
                 event.widget.delete(0, tk.END)
+                self.clear_cell(row, col)
                 return
             
             self.root.after_idle(lambda: self.check_number(row, col))
+        else:
+            self.clear_cell(row, col)
+    
+    def on_board_input(self, row, col, value):
+        if sudoku_solver.symbol_value(value, self.board_size) is not None:
+            self.root.after_idle(lambda: self.check_number(row, col))
+        else:
+            self.board_renderer.render_cell(row, col, "", "empty")
+            self.clear_cell(row, col)
+    
+    def clear_cell(self, row, col):
+        # Logged alongside the board, so a replay sees every emptied cell
+        if self.board.get(row, col) and not self.is_online:
+            self.log_move(row, col, 0, CLEARED)
+        self.board.clear(row, col)
+        self.update_candidates(row, col)
+    
+    def log_move(self, row, col, num, verdict):
+        player = self.current_player if self.is_multiplayer else 1
+        self.move_log.move(row * self.board_size + col, num, player, verdict)
+    
+    def update_candidates(self, row, col):
+        # Only a digit matching the solution counts; a wrong one leaves the
+        # cell's candidates as they were, hidden until it is cleared. Online,
+        # the board only ever holds digits the server accepted
+        num = self.board.get(row, col)
+        if not self.is_online and num != self.solution[row][col]:
+            num = 0
+        changed = self.candidates.set(row * self.board_size + col, num)
+        self.refresh_marks(changed)
+        if self.hint_label.cget("text"):
+            self.hint_label.config(text="")
+    
+    def refresh_marks(self, cells):
+        # Only cells whose candidates may have changed are passed in, and the
+        # renderer skips any whose text is unchanged
+        if not self.show_marks:
+            return
+        started = time.perf_counter()
+        board, candidates, renderer = self.board, self.candidates, self.board_renderer
+        for i in cells:
+            row, col = divmod(i, self.board_size)
+            hidden = board.get(row, col) or renderer.kind(row, col) == "wrong"
+            renderer.render_marks(row, col, "" if hidden else candidates.marks(i))
+        stats.record("render.marks", time.perf_counter() - started)
+    
+    def toggle_marks(self):
+        self.show_marks = self.marks_var.get()
+        if self.show_marks:
+            self.refresh_marks(range(self.board_size * self.board_size))
+        else:
+            self.board_renderer.clear_marks()
+    
+    def show_hint(self):
+        # Online games are checked by the server, so no help there
+        if self.is_online:
+            return
+        started = time.perf_counter()
+        hint = self.candidates.hint()
+        stats.record("game.hint", time.perf_counter() - started)
+        if hint is None:
+            self.hint_label.config(text="No simple step from here - time to guess!")
+            return
+        if hint.eliminations:
+            # Struck for good, so asking again moves on to the next step
+            self.refresh_marks(self.candidates.strike(hint.eliminations))
+        cell = hint.cell if hint.cell is not None else min(hint.eliminations)
+        self.board_renderer.focus_cell(*divmod(cell, self.board_size))
+        self.hint_label.config(text=hint.text)
     
     def check_number(self, row, col):
+        if self.is_online:
+            self.send_online_move(row, col)
+            return
+        
         if self.is_multiplayer:
             current_mistakes = self.player1_mistakes if self.current_player == 1 else self.player2_mistakes
         else:
@@ -248,27 +545,38 @@ class SudokuGame:
         if current_mistakes >= self.max_mistakes:
             return
             
-        entry = self.entries[row][col]
-        value = entry.get()
+        value = self.board_renderer.input_text(row, col)
         
-        if not value or entry['state'] == 'readonly':
+        if not value or self.board_renderer.kind(row, col) in READONLY_KINDS:
             return
         
-        num = int(value)
+        started = time.perf_counter()
+        num = sudoku_solver.symbol_value(value, self.board_size)
+        if num is None:
+            return
+        # Shown as the board's own symbol, e.g. upper-case hex on 16x16
+        value = self.symbols[num - 1]
+        self.board.set(row, col, num)
         
         # Check if the number is correct according to the solution
         if num == self.solution[row][col]:
             # Correct answer
+            self.log_move(row, col, num, CORRECT)
             if self.is_multiplayer:
-                color = '#0066FF' if self.current_player == 1 else '#00AA00'
-                entry.config(bg=color, fg='white', state='readonly', font=('Arial', 20, 'bold'))
+                kind = "correct" if self.current_player == 1 else "correct_p2"
+                self.board_renderer.render_cell(row, col, value, kind)
                 self.switch_player()
             else:
-                entry.config(bg='#0066FF', fg='white', state='readonly', font=('Arial', 20, 'bold'))
+                self.board_renderer.render_cell(row, col, value, "correct")
+            self.update_candidates(row, col)
+            stats.record("game.check_number", time.perf_counter() - started)
             self.root.after_idle(self.check_solution)
         else:
             # Wrong answer - this is a mistake
-            entry.config(bg='#FF3333', fg='white', state='normal', font=('Arial', 20, 'bold'))
+            self.log_move(row, col, num, WRONG)
+            self.board_renderer.render_cell(row, col, value, "wrong")
+            self.update_candidates(row, col)
+            stats.record("game.check_number", time.perf_counter() - started)
             if self.is_multiplayer:
                 if self.current_player == 1:
                     self.player1_mistakes += 1
@@ -293,101 +601,136 @@ class SudokuGame:
                     self.new_game()
     
     def on_click(self, row, col):
-        entry = self.entries[row][col]
-        if entry['bg'] == '#FF3333':
-            entry.delete(0, tk.END)
-            entry.config(bg=self.empty_cell_bg, fg=self.empty_cell_fg, state='normal')
+        if self.board_renderer.kind(row, col) == "wrong":
+            self.board_renderer.render_cell(row, col, "", "empty")
+            self.clear_cell(row, col)
     
-    def is_valid(self, grid, row, col, num):
-        for j in range(9):
-            if grid[row][j] == num:
-                return False
-        
-        for i in range(9):
-            if grid[i][col] == num:
-                return False
-        
-        start_row, start_col = 3 * (row // 3), 3 * (col // 3)
-        for i in range(start_row, start_row + 3):
-            for j in range(start_col, start_col + 3):
-                if grid[i][j] == num:
-                    return False
+    def undo_move(self, event=None):
+        # Single player only: in a shared game an undo would take back the
+        # other player's turn as well
+        if self.is_multiplayer:
+            return
+        undone = self.board.undo()
+        if undone is None:
+            return
+        row, col, num = undone
+        self.render_played_cell(row, col, num)
+        self.update_candidates(row, col)
+        self.log_move(row, col, num, UNDONE)
+    
+    def render_played_cell(self, row, col, num, player=1):
+        if not num:
+            self.board_renderer.render_cell(row, col, "", "empty")
+        elif num != self.solution[row][col]:
+            self.board_renderer.render_cell(row, col, self.symbols[num - 1], "wrong")
+        else:
+            kind = "correct_p2" if player == 2 else "correct"
+            self.board_renderer.render_cell(row, col, self.symbols[num - 1], kind)
+    
+    def resume_from_log(self):
+        latest = move_log.last_game(self.move_log.path)
+        if latest is None:
+            return False
+        game, board, moves = latest
+        wrong = collections.Counter(m.player for m in moves if m.verdict == WRONG)
+        if board.is_complete() or max(wrong.values(), default=0) >= self.max_mistakes:
+            return False
+        
+        if game.box != self.box_size:
+            self.resize_board(game.box)
+        if game.players == 2:
+            self.game_mode = "Multiplayer"
+            self.is_multiplayer = True
+            self.mode_var.set(self.game_mode)
+        self.grid = game.puzzle
+        self.solution = game.solution
+        self.update_display()
         
+        # The replayed board already holds the final digit of every cell;
+        # the log only adds who played it
+        player_of = {m.cell: m.player for m in moves}
+        for i, num in enumerate(board.cells):
+            if num and not board.given[i]:
+                row, col = divmod(i, self.board_size)
+                self.board.set(row, col, num)
+                self.render_played_cell(row, col, num, player_of.get(i, 1))
+                self.update_candidates(row, col)
+        
+        self.mistakes = self.player1_mistakes = wrong[1]
+        self.player2_mistakes = wrong[2]
+        played = sum(1 for m in moves if m.verdict in (CORRECT, WRONG))
+        self.current_player = 1 + played % 2 if self.is_multiplayer else 1
+        if self.is_multiplayer:
+            self.update_multiplayer_display()
+        else:
+            self.mistake_label.config(text=f"Mistakes: {self.mistakes}/{self.max_mistakes}")
+        self.start_time = time.time() - (moves[-1].time - game.time if moves else 0.0)
         return True
     
-
+    def is_valid(self, grid, row, col, num):
+        return sudoku_solver.is_valid(grid, row, col, num)
     
     def generate_puzzle(self):
         self.mistakes = 0
         self.mistake_label.config(text=f"Mistakes: {self.mistakes}/{self.max_mistakes}")
         
-        self.grid = [[0 for _ in range(9)] for _ in range(9)]
-        self.fill_grid()
-        
-        # Store the complete solution
-        self.solution = [row[:] for row in self.grid]
+        if self.is_online:
+            # Online puzzles come from the server; the board stays empty
+            # until the room's game arrives
+            size = self.board_size
+            self.grid = [[0] * size for _ in range(size)]
+            self.solution = [[0] * size for _ in range(size)]
+            self.update_display()
+            return
         
-        cells_to_remove = self.difficulty_settings[self.difficulty]
-        self.remove_cells(cells_to_remove)
+        # Shipped puzzles come straight from the bank; otherwise the background
+        # pool hands over a ready one, generating synchronously only when empty
+        with stats.timer("game.generate_puzzle"):
+            banked = self.draw_banked_puzzle()
+            puzzle, solution = banked or self.puzzle_pool.get(self.difficulty)
+        stats.count("puzzle.bank" if banked else "puzzle.pool")
+        self.grid = [row[:] for row in puzzle]
+        self.solution = [row[:] for row in solution]
+        self.move_log.game(puzzle, solution, players=2 if self.is_multiplayer else 1)
         
         self.update_display()
     
+    def draw_banked_puzzle(self, attempts=5):
+        # The bank only holds 9x9 puzzles
+        if not self.puzzle_bank or self.box_size != 3:
+            return None
+        for _ in range(attempts):
+            banked = self.puzzle_bank.draw(self.difficulty)
+            if banked is None:
+                return None
+            if self.seen_puzzles.add(sudoku_canonical.puzzle_key(banked[0])):
+                return banked
+        return None
+    
     def fill_grid(self):
-        for i in range(9):
-            for j in range(9):
-                if self.grid[i][j] == 0:
-                    numbers = list(range(1, 10))
-                    random.shuffle(numbers)
-                    for num in numbers:
-                        if self.is_valid(self.grid, i, j, num):
-                            self.grid[i][j] = num
-                            if self.fill_grid():
-                                return True
-                            self.grid[i][j] = 0
-                    return False
+        # A seed grid under random validity-preserving transforms
+        self.grid = solution_grids.random_grid(box=self.box_size)
         return True
     
     def remove_cells(self, count):
-        positions = [(i, j) for i in range(9) for j in range(9)]
-        random.shuffle(positions)
-        
-        for i in range(min(count, len(positions))):
-            row, col = positions[i]
-            self.grid[row][col] = 0
+        # Only keeps removals that leave the puzzle with a single solution, so
+        # the hardest levels stop at the closest unique puzzle
+        self.grid, removed = sudoku_generator.dig_holes(self.grid, count, symmetry=self.symmetry,
+                                                        time_budget=self.generation_time_budget)
+        return removed
     
     def has_unique_solution(self):
-        # Create a copy of the grid
-        test_grid = [row[:] for row in self.grid]
-        solutions = [0]  # Use list to allow modification in nested function
-        
-        def count_solutions(grid):
-            if solutions[0] > 1:
-                return  # Stop if more than one solution found
-                
-            for i in range(9):
-                for j in range(9):
-                    if grid[i][j] == 0:
-                        for num in range(1, 10):
-                            if self.is_valid(grid, i, j, num):
-                                grid[i][j] = num
-                                count_solutions(grid)
-                                grid[i][j] = 0
-                        return
-            solutions[0] += 1
-        
-        count_solutions(test_grid)
-        return solutions[0] == 1
+        return sudoku_solver.has_unique_solution(self.grid)
     
     def update_display(self):
-        for i in range(9):
-            for j in range(9):
-                self.entries[i][j].config(state='normal')
-                self.entries[i][j].delete(0, tk.END)
-                if self.grid[i][j] != 0:
-                    self.entries[i][j].insert(0, str(self.grid[i][j]))
-                    self.entries[i][j].config(state='readonly', bg=self.prefilled_bg, fg=self.prefilled_fg, font=('Arial', 20, 'bold'))
-                else:
-                    self.entries[i][j].config(state='normal', bg=self.empty_cell_bg, fg=self.empty_cell_fg, font=('Arial', 20, 'bold'))
+        # Only cells whose text, state or colours differ from what they last
+        # showed are touched
+        with stats.timer("render.grid"):
+            self.board.load(self.grid)
+            self.board_renderer.render_grid(self.grid)
+            self.candidates.load(self.grid)
+            self.hint_label.config(text="")
+        self.refresh_marks(range(self.board_size * self.board_size))
     
     def new_game(self):
         self.mistakes = 0
@@ -396,6 +739,7 @@ class SudokuGame:
         self.current_player = 1
         self.start_time = time.time()
         self.timer_running = True
+        self.scheduler.set_enabled("timer", True, run_now=True)
         
         if self.is_multiplayer:
             self.update_multiplayer_display()
@@ -404,15 +748,25 @@ class SudokuGame:
             self.player_label.config(text="")
         
         self.generate_puzzle()
+        if self.is_online and self.online_seat is not None:
+            # Joining again hands back the room's current game
+            self.join_online_room()
     
     def change_difficulty(self, selected_difficulty):
         self.difficulty = selected_difficulty
+        self.puzzle_pool.set_current(selected_difficulty)
         self.new_game()
     
     def change_mode(self, selected_mode):
         self.game_mode = selected_mode
-        self.is_multiplayer = (selected_mode == "Multiplayer")
+        was_online = self.is_online
+        self.is_online = (selected_mode == "Online")
+        self.is_multiplayer = selected_mode in ("Multiplayer", "Online")
+        if was_online and not self.is_online:
+            self.disconnect_online()
         self.new_game()
+        if self.is_online and not was_online:
+            self.connect_online()
     
     def switch_player(self):
         if not self.is_multiplayer:
@@ -424,28 +778,183 @@ class SudokuGame:
         if not self.is_multiplayer:
             return
         
+        if self.is_online:
+            self.update_online_display()
+            return
+        
         self.mistake_label.config(text=f"P1: {self.player1_mistakes}/{self.max_mistakes} | P2: {self.player2_mistakes}/{self.max_mistakes}")
         
         player_color = '#0066FF' if self.current_player == 1 else '#00AA00'
         self.player_label.config(text=f"Player {self.current_player}'s Turn", fg=player_color)
     
-    def update_timer(self):
-        if self.timer_running:
+    def update_online_display(self):
+        if self.online_seats == 1:
+            self.mistake_label.config(text=f"Mistakes: {self.player1_mistakes}/{self.max_mistakes}")
+        else:
+            self.mistake_label.config(text=f"P1: {self.player1_mistakes}/{self.max_mistakes} | P2: {self.player2_mistakes}/{self.max_mistakes}")
+        
+        if self.online_seat is None:
+            text, color = "Connecting...", self.text_color
+        elif len(self.online_players) < self.online_seats:
+            text, color = "Waiting for an opponent...", self.text_color
+        else:
+            color = '#0066FF' if self.current_player == 1 else '#00AA00'
+            if self.current_player == self.online_seat:
+                text = f"Your Turn (Player {self.online_seat})"
+            else:
+                text = f"Player {self.current_player}'s Turn"
+        self.player_label.config(text=text, fg=color)
+    
+    def connect_online(self):
+        host, port = self.server_address
+        self.net_client = GameClient(host, port)
+        self.net_client.start()
+        self.online_seat = None
+        self.online_players = []
+        self.update_online_display()
+        self.scheduler.add("network", self.poll_online, 0.05, priority=2, when_hidden=THROTTLE)
+    
+    def disconnect_online(self):
+        self.scheduler.remove("network")
+        if self.net_client:
+            self.net_client.close()
+        self.net_client = None
+        self.online_seat = None
+        self.online_moves = {}
+    
+    def join_online_room(self):
+        self.net_client.join(self.online_room, self.difficulty, self.box_size)
+    
+    def poll_online(self):
+        if self.net_client is None:
+            return
+        for kind, payload in self.net_client.drain():
+            if kind == "connected":
+                self.join_online_room()
+            elif kind in ("failed", "closed"):
+                self.disconnect_online()
+                reason = f"Disconnected from server: {payload}" if payload else "Disconnected from server"
+                self.player_label.config(text=reason, fg=self.mistake_color)
+                return
+            else:
+                self.on_server_message(payload)
+    
+    def on_server_message(self, message):
+        kind = message["t"]
+        if kind == "joined":
+            self.online_seat = message["seat"]
+            self.difficulty = message["difficulty"]
+            self.difficulty_var.set(self.difficulty)
+            self.update_online_display()
+        elif kind == "players":
+            self.online_players = message["seated"]
+            self.update_online_display()
+        elif kind == "game":
+            self.load_online_game(message)
+        elif kind == "move":
+            self.apply_online_move(message)
+        elif kind == "error":
+            cell = self.online_moves.pop(message.get("id"), None)
+            if cell is not None:
+                self.board.clear(*cell)
+                self.board_renderer.render_cell(cell[0], cell[1], "", "empty")
+            self.player_label.config(text=message["error"].capitalize(), fg=self.mistake_color)
+    
+    def load_online_game(self, message):
+        if message["box"] != self.box_size:
+            self.resize_board(message["box"])
+        self.grid = sudoku_solver.from_string(message["board"])
+        # The solution never leaves the server
+        self.solution = [[0] * self.board_size for _ in range(self.board_size)]
+        self.online_seats = message["seats"]
+        self.max_mistakes = message["max"]
+        self.player1_mistakes, self.player2_mistakes = (message["mistakes"] + [0])[:2]
+        self.current_player = message["turn"]
+        self.online_moves = {}
+        self.start_time = time.time()
+        self.timer_running = True
+        self.scheduler.set_enabled("timer", True, run_now=True)
+        self.update_display()
+        self.update_online_display()
+    
+    def send_online_move(self, row, col):
+        value = self.board_renderer.input_text(row, col)
+        if not value or self.board_renderer.kind(row, col) in READONLY_KINDS:
+            return
+        num = sudoku_solver.symbol_value(value, self.board_size)
+        if num is None:
+            return
+        if self.net_client is None or self.current_player != self.online_seat:
+            # Only the seat whose turn it is may play; the server would refuse it anyway
+            self.board_renderer.render_cell(row, col, "", "empty")
+            return
+        self.board_renderer.render_cell(row, col, self.symbols[num - 1], "empty")
+        move_id = self.net_client.move(row * self.board_size + col, num)
+        if move_id is not None:
+            self.online_moves[move_id] = (row, col)
+    
+    def apply_online_move(self, message):
+        # Moves arrive as single-cell deltas for both players' moves
+        row, col = divmod(message["cell"], self.board_size)
+        num = message["value"]
+        if message["seat"] == self.online_seat:
+            self.online_moves.pop(message.get("id"), None)
+        if message["ok"]:
+            self.board.set(row, col, num)
+            kind = "correct" if message["seat"] == 1 else "correct_p2"
+        else:
+            kind = "wrong"
+        self.board_renderer.render_cell(row, col, self.symbols[num - 1], kind)
+        if message["ok"]:
+            self.update_candidates(row, col)
+        self.player1_mistakes, self.player2_mistakes = (message["mistakes"] + [0])[:2]
+        self.current_player = message["turn"]
+        self.update_online_display()
+        
+        if not message.get("over"):
+            return
+        # The server deals the next game on its own; it is loaded when it arrives
+        self.timer_running = False
+        winner = message.get("winner")
+        if winner == self.online_seat:
+            text = "You win! Loading new game..."
+        elif winner is not None:
+            text = f"Player {winner} wins! Loading new game..."
+        elif max(message["mistakes"]) >= self.max_mistakes:
+            text = "Sorry you failed! Loading new game..."
+        else:
             elapsed = int(time.time() - self.start_time)
-            minutes = elapsed // 60
-            seconds = elapsed % 60
-            self.timer_label.config(text=f"Time: {minutes:02d}:{seconds:02d}")
-        self.root.after(1000, self.update_timer)
+            text = f"Puzzle solved in {elapsed // 60:02d}:{elapsed % 60:02d}!"
+        messagebox.showinfo("Game Over", text)
+    
+    def update_timer(self):
+        if not self.timer_running:
+            self.scheduler.set_enabled("timer", False)
+            return
+        elapsed = int(time.time() - self.start_time)
+        minutes = elapsed // 60
+        seconds = elapsed % 60
+        self.timer_label.config(text=f"Time: {minutes:02d}:{seconds:02d}")
     
     def check_theme_change(self):
-        current_dark_mode = self.detect_dark_mode()
+        current_dark_mode = self.theme_probe.get()
         if current_dark_mode != self.is_dark_mode:
             self.is_dark_mode = current_dark_mode
             self.setup_colors()
             self.update_theme()
-        self.root.after(2000, self.check_theme_change)
+    
+    def on_focus_regained(self):
+        # The system theme or the playing song may have changed while away
+        self.theme_probe.invalidate()
+        self.check_theme_change()
+        if self.playback_service:
+            self.playback_service.poke()
     
     def update_theme(self):
+        with stats.timer("render.theme"):
+            self.apply_theme()
+    
+    def apply_theme(self):
         # Update root background
         self.root.configure(bg=self.bg_color)
         
@@ -458,6 +967,10 @@ class SudokuGame:
         # Update difficulty frame and label
         self.diff_frame.configure(bg=self.bg_color)
         self.diff_label.configure(bg=self.bg_color, fg=self.text_color)
+        self.size_frame.configure(bg=self.bg_color)
+        self.size_label.configure(bg=self.bg_color, fg=self.text_color)
+        self.marks_check.configure(bg=self.bg_color, fg=self.text_color, selectcolor=self.bg_color)
+        self.hint_label.configure(bg=self.bg_color, fg=self.text_color)
         
         # Update timer and mistake labels
         self.timer_label.configure(bg=self.bg_color, fg=self.timer_color)
@@ -466,17 +979,11 @@ class SudokuGame:
         # Update song label and canvas
         self.song_label.configure(bg=self.bg_color, fg=self.text_color)
         self.wave_canvas.configure(bg=self.bg_color)
+        if self.wave_visualizer:
+            self.wave_visualizer.set_color(self.wave_color())
         
-        # Update all grid entries
-        for i in range(9):
-            for j in range(9):
-                entry = self.entries[i][j]
-                if entry['state'] == 'readonly' and entry['bg'] not in ['#0066FF', '#FF3333']:
-                    # Pre-filled cell
-                    entry.configure(bg=self.prefilled_bg, fg=self.prefilled_fg)
-                elif entry['bg'] not in ['#0066FF', '#FF3333']:
-                    # Empty cell
-                    entry.configure(bg=self.empty_cell_bg, fg=self.empty_cell_fg)
+        # Recolour only the cells whose style changed
+        self.board_renderer.set_styles(self.cell_styles, self.grid_bg)
     
     def connect_spotify(self):
         try:
@@ -500,78 +1007,114 @@ class SudokuGame:
                 self.current_song = "♪ Demo Mode - Awesome Beats"
                 self.spotify_btn.config(text="Demo Mode Active", bg='#FF6600')
                 self.song_label.config(text=self.current_song)
-                self.demo_music_mode()
+                self.start_demo_mode()
                 return
             
-            # Real Spotify connection
+            if self.playback_service and self.playback_service.running:
+                return
+            
+            # Real Spotify connection; the OAuth flow and every playback
+            # request run on the service's worker thread
             scope = "user-read-currently-playing user-read-playback-state"
-            import os
             cache_path = os.path.expanduser("~/.spotify_cache")
-            sp_oauth = SpotifyOAuth(client_id=client_id,
-                                   client_secret=client_secret,
-                                   redirect_uri=redirect_uri,
-                                   scope=scope,
-                                   cache_path=cache_path,
-                                   open_browser=True)
-            
-            self.spotify_client = spotipy.Spotify(auth_manager=sp_oauth)
-            self.spotify_connected = True
-            self.spotify_btn.config(text="Connected!", bg='#1DB954')
-            self.get_current_song()
+            factory = spotify_client_factory(client_id, client_secret, redirect_uri, cache_path, scope,
+                                             api_base=os.environ.get("SPOTIFY_API_BASE"),
+                                             access_token=os.environ.get("SPOTIFY_ACCESS_TOKEN"))
+            if self.audio_features is None:
+                fixture = os.environ.get("SPOTIFY_FEATURES_FIXTURE")
+                self.audio_features = AudioFeatureProvider(
+                    source=FixtureFeatureSource(fixture) if fixture else None,
+                    cache_path=os.path.expanduser("~/.sudoku_audio_features.json"))
+            self.playback_service = PlaybackService(factory, feature_provider=self.audio_features)
+            self.playback_service.start()
+            self.spotify_btn.config(text="Connecting...", bg='#1DB954')
+            # Draining the queue is cheap, so it keeps running (slowly) while
+            # hidden and the song label is current when the window returns
+            self.scheduler.add("spotify", self.get_current_song, 0.25, priority=1,
+                               when_hidden=THROTTLE, throttle_factor=8.0)
             
         except Exception as e:
-            messagebox.showerror("Connection Error", f"Failed to connect to Spotify: {str(e)}")
-            # Fall back to demo mode
-            self.spotify_connected = True
-            self.current_song = "♪ Demo Mode - Connection Failed"
-            self.spotify_btn.config(text="Demo Mode", bg='#FF6600')
-            self.song_label.config(text=self.current_song)
-            self.demo_music_mode()
+            self.spotify_connection_failed(e)
+    
+    def spotify_connection_failed(self, error):
+        messagebox.showerror("Connection Error", f"Failed to connect to Spotify: {str(error)}")
+        # Fall back to demo mode
+        self.spotify_connected = True
+        self.current_song = "♪ Demo Mode - Connection Failed"
+        self.spotify_btn.config(text="Demo Mode", bg='#FF6600')
+        self.song_label.config(text=self.current_song)
+        self.start_demo_mode()
+    
+    def start_demo_mode(self):
+        # Simulated song changes every 30 seconds, starting right away
+        self.scheduler.add("demo", self.demo_music_mode, 30.0)
     
     def get_current_song(self):
-        if not self.spotify_client:
+        # Drains snapshots pushed by the playback service; never blocks on
+        # the network itself
+        if not self.playback_service:
             return
         
-        try:
-            current = self.spotify_client.current_playback()
-            if current and current['item']:
-                track = current['item']
-                artist = track['artists'][0]['name']
-                song = track['name']
-                track_id = track['id']
-                self.is_music_playing = current['is_playing']
-                
-                # Set new track ID
-                if track_id != self.current_track_id:
-                    self.current_track_id = track_id
-                    # Use default values to avoid API permission issues
-                    self.track_tempo = 120
-                    self.track_energy = 0.6
-                
-                # Track song timing for beat sync
-                if self.is_music_playing:
-                    progress_ms = current.get('progress_ms', 0)
-                    self.song_start_time = time.time() - (progress_ms / 1000.0)
-                    self.current_song = f"♪ {artist} - {song}"
-                else:
-                    self.current_song = f"⏸ {artist} - {song} (Paused)"
+        for kind, payload in self.playback_service.drain():
+            if kind == "connected":
+                self.spotify_client = self.playback_service.client
+                self.spotify_connected = True
+                self.spotify_btn.config(text="Connected!", bg='#1DB954')
+            elif kind == "failed":
+                self.playback_service = None
+                self.scheduler.remove("spotify")
+                self.spotify_connection_failed(payload)
+                return
+            elif kind == "playback":
+                self.apply_playback(payload)
+            elif kind == "features":
+                self.apply_features(*payload)
             else:
-                self.current_song = "No song playing"
+                self.current_song = "Spotify connection lost"
                 self.is_music_playing = False
-            
-            self.song_label.config(text=self.current_song)
-            
-        except Exception as e:
-            self.current_song = "Spotify connection lost"
+        
+        self.song_label.config(text=self.current_song)
+    
+    def apply_playback(self, playback):
+        if playback is None:
+            self.current_song = "No song playing"
             self.is_music_playing = False
-            self.song_label.config(text=self.current_song)
+            return
         
-        # Update every 2 seconds for better sync
-        if self.spotify_connected:
-            self.root.after(2000, self.get_current_song)
+        self.is_music_playing = playback.is_playing
+        
+        # Set new track ID
+        if playback.track_id != self.current_track_id:
+            self.current_track_id = playback.track_id
+            # Features come from the provider's cache; the defaults stand in
+            # until a "features" message brings them, or for good when the
+            # API would not give them to us
+            self.track_tempo = playback.tempo or 120
+            self.track_energy = playback.energy if playback.energy is not None else 0.6
+            self.beat_grid = BeatGrid(tempo=self.track_tempo, energy=self.track_energy,
+                                      seed=playback.track_id)
+            self.beat_clock.reset()
+        
+        # Track song timing for beat sync, from when the response arrived;
+        # every progress report nudges the clock to correct drift
+        if self.is_music_playing:
+            self.song_start_time = self.beat_clock.sync(playback.progress_ms, playback.received_at)
+            self.current_song = f"♪ {playback.artist} - {playback.song}"
+        else:
+            self.current_song = f"⏸ {playback.artist} - {playback.song} (Paused)"
+    
+    def apply_features(self, track_id, features):
+        # Features fetched after the snapshot went out; the beat clock keeps
+        # running, only the grid it samples changes
+        if track_id != self.current_track_id:
+            return
+        self.track_tempo = features.tempo or 120
+        self.track_energy = features.energy if features.energy is not None else 0.6
+        self.beat_grid = BeatGrid(tempo=self.track_tempo, energy=self.track_energy, seed=track_id)
     
     def demo_music_mode(self):
         if not self.spotify_connected:
+            self.scheduler.remove("demo")
             return
         
         # Simulate changing songs every 30 seconds
@@ -589,36 +1132,17 @@ class SudokuGame:
         
         # Update wave intensity randomly
         base_intensity = random.uniform(0.4, 0.9)
-        for i in range(len(self.sound_waves)):
-            self.sound_waves[i] = base_intensity * random.uniform(0.5, 1.3)
-        
-        # Continue demo mode
-        if self.spotify_connected:
-            self.root.after(30000, self.demo_music_mode)
+        if self.wave_visualizer:
+            self.wave_visualizer.fill(lambda: base_intensity * random.uniform(0.5, 1.3))
+        self.beat_grid = BeatGrid(tempo=self.track_tempo, energy=base_intensity, seed=current_song)
     
     def check_solution(self):
-        # Get current grid state
-        current_grid = [[0 for _ in range(9)] for _ in range(9)]
-        
-        for i in range(9):
-            for j in range(9):
-                value = self.entries[i][j].get()
-                if value:
-                    current_grid[i][j] = int(value)
-        
-        # Check if complete and valid
-        for i in range(9):
-            for j in range(9):
-                if current_grid[i][j] == 0:
-                    return False
-                
-                # Temporarily remove current number to check validity
-                temp = current_grid[i][j]
-                current_grid[i][j] = 0
-                if not self.is_valid(current_grid, i, j, temp):
-                    current_grid[i][j] = temp
-                    return False
-                current_grid[i][j] = temp
+        # The board model tracks filled cells and duplicate digits per unit as
+        # entries change, so this never has to read the widgets back
+        with stats.timer("game.check_solution"):
+            complete = self.board.is_complete()
+        if not complete:
+            return False
         
         # Puzzle completed successfully
         self.timer_running = False
@@ -629,9 +1153,33 @@ class SudokuGame:
         self.new_game()
         return True
     
+    def on_close(self):
+        if self.net_client:
+            self.net_client.close()
+        self.move_log.close()
+        if self.perf_log_path:
+            self.export_perf_stats()
+        self.puzzle_pool.shutdown()
+        self.seen_puzzles.save()
+        if self.playback_service:
+            self.playback_service.stop()
+        if self.puzzle_bank:
+            self.puzzle_bank.close()
+        self.root.destroy()
+    
     def run(self):
         self.root.mainloop()
 
+def argument_value(flag):
+    if flag in sys.argv[:-1]:
+        return sys.argv[sys.argv.index(flag) + 1]
+    return None
+
 if __name__ == "__main__":
-    game = SudokuGame()
+    server = argument_value("--server")
+    game = SudokuGame(canvas_board="--canvas-board" in sys.argv,
+                      startup_check="--startup-check" in sys.argv,
+                      server=parse_address(server) if server else None,
+                      room=argument_value("--room"),
+                      resume="--resume" in sys.argv)
     game.run()
@@ -0,0 +1,138 @@
+import collections
+import json
+import os
+import threading
+
+AudioFeatures = collections.namedtuple("AudioFeatures", "tempo energy")
+
+# Spotify accepts at most 100 ids per audio-features request
+MAX_BATCH = 100
+
+
+class SpotifyFeatureSource:
+    def __init__(self, client):
+        self.client = client
+
+    def fetch(self, track_ids):
+        found = {}
+        for start in range(0, len(track_ids), MAX_BATCH):
+            for item in self.client.audio_features(track_ids[start:start + MAX_BATCH]) or []:
+                if item and item.get('id'):
+                    found[item['id']] = AudioFeatures(item['tempo'], item['energy'])
+        return found
+
+    def upcoming(self):
+        queue = self.client.queue() or {}
+        return [item['id'] for item in queue.get('queue') or [] if item and item.get('id')]
+
+
+class FixtureFeatureSource:
+    def __init__(self, fixture):
+        # fixture: mapping or path to a JSON file of {track_id: {"tempo", "energy"}}
+        if isinstance(fixture, str):
+            with open(fixture) as f:
+                fixture = json.load(f)
+        self.features = {track_id: AudioFeatures(item['tempo'], item['energy'])
+                         for track_id, item in fixture.items()}
+        self.requests = 0
+
+    def fetch(self, track_ids):
+        self.requests += 1
+        return {track_id: self.features[track_id] for track_id in track_ids if track_id in self.features}
+
+    def upcoming(self):
+        return []
+
+
+class AudioFeatureProvider:
+    def __init__(self, source=None, capacity=512, cache_path=None, lookahead=2):
+        self.source = source
+        self.capacity = capacity
+        self.cache_path = cache_path
+        self.lookahead = lookahead
+        self.cache = collections.OrderedDict()
+        # Queue ids from the last prefetch that have not started playing yet
+        self.upcoming = []
+        self.current_track = None
+        self.lock = threading.Lock()
+        # Set after the API refuses the endpoint, so we stop asking
+        self.disabled = False
+        self.load()
+
+    def load(self):
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self.lock:
+            for track_id, (tempo, energy) in list(stored.items())[-self.capacity:]:
+                self.cache[track_id] = AudioFeatures(tempo, energy)
+
+    def save(self):
+        if not self.cache_path:
+            return
+        with self.lock:
+            stored = {track_id: list(features) for track_id, features in self.cache.items()}
+        tmp_path = self.cache_path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(stored, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            pass
+
+    def _store(self, found):
+        with self.lock:
+            for track_id, features in found.items():
+                self.cache[track_id] = features
+                self.cache.move_to_end(track_id)
+            while len(self.cache) > self.capacity:
+                self.cache.popitem(last=False)
+
+    def get(self, track_id):
+        with self.lock:
+            features = self.cache.get(track_id)
+            if features is not None:
+                self.cache.move_to_end(track_id)
+            return features
+
+    def prefetch(self, track_ids):
+        if self.disabled or self.source is None:
+            return {}
+        with self.lock:
+            missing = list(dict.fromkeys(t for t in track_ids if t and t not in self.cache))
+        if not missing:
+            return {}
+        try:
+            found = self.source.fetch(missing)
+        except Exception as e:
+            if getattr(e, 'http_status', None) in (401, 403, 404):
+                self.disabled = True
+            return {}
+        self._store(found)
+        if found:
+            self.save()
+        return found
+
+    def features(self, track_id):
+        # The queue is only re-read when the prefetched lookahead runs low, and
+        # one batched request then covers the current track and what follows.
+        # Repeated polls of the same track never go to the network.
+        if track_id == self.current_track:
+            return self.get(track_id)
+        self.current_track = track_id
+        if track_id in self.upcoming:
+            del self.upcoming[:self.upcoming.index(track_id) + 1]
+        cached = self.get(track_id)
+        if cached is not None and len(self.upcoming) >= self.lookahead:
+            return cached
+        if not self.disabled and self.source is not None:
+            try:
+                self.upcoming = self.source.upcoming()
+            except Exception:
+                self.upcoming = []
+        self.prefetch([track_id] + self.upcoming)
+        return self.get(track_id)
@@ -0,0 +1,263 @@
+import argparse
+import collections
+import os
+import sys
+import time
+from array import array
+import puzzle_bank
+import sudoku_solver
+
+try:
+    import numpy as np
+except ImportError:
+    # Everything still works on plain sequences, one grid at a time
+    np = None
+
+# Per-grid status, most serious first: a grid gets the first one that applies
+OK, BAD_VALUE, CONFLICT, INCOMPLETE, BAD_SOLUTION, MISMATCH = range(6)
+STATUS_NAMES = ("ok", "bad value", "conflict", "incomplete", "bad solution", "mismatch")
+
+# Grids checked per vectorised pass; about 25 MB of temporaries
+CHUNK = 65536
+
+# status[i] is one of the codes above and first[i] the lowest cell index
+# (row * 9 + col) involved in the problem, or -1 for OK grids
+BatchResult = collections.namedtuple("BatchResult", "status first")
+
+UNITS = sudoku_solver.UNITS
+
+if np is not None:
+    UNIT_CELLS = np.array(UNITS, dtype=np.intp)
+    # Bit of each digit, 0 for empty cells and for anything out of range,
+    # so one gather turns a grid into masks without any branching
+    MASK_OF = np.zeros(256, dtype=np.uint16)
+    MASK_OF[1:10] = 1 << np.arange(1, 10)
+    BANK_RECORD = np.dtype([("level", "u1"), ("rating", "<u2"), ("seed", "<u8"),
+                            ("puzzle", "u1", (41,)), ("solution", "u1", (41,))])
+
+
+def flat_cells(grid):
+    if len(grid) == 81:
+        return grid
+    return [v for row in grid for v in row]
+
+
+def check_cells(cells, solution=None, complete=False):
+    # (status, first cell) for one flat grid; the reference the vectorised
+    # path is checked against, and the fallback without numpy
+    for i, v in enumerate(cells):
+        if not 0 <= v <= 9:
+            return BAD_VALUE, i
+    first = None
+    for unit in UNITS:
+        seen = {}
+        for c in unit:
+            v = cells[c]
+            if not v:
+                continue
+            if v in seen:
+                low = min(seen[v], c)
+                first = low if first is None else min(first, low)
+            else:
+                seen[v] = c
+    if first is not None:
+        return CONFLICT, first
+    if complete and 0 in cells:
+        return INCOMPLETE, list(cells).index(0)
+    if solution is not None:
+        status, at = check_cells(solution, complete=True)
+        if status != OK:
+            return BAD_SOLUTION, at
+        for i, (v, s) in enumerate(zip(cells, solution)):
+            if v and v != s:
+                return MISMATCH, i
+    return OK, -1
+
+
+def check_chunk(cells, solutions=None, complete=False):
+    # cells and solutions: (n, 81) uint8 arrays
+    n = len(cells)
+    status = np.zeros(n, dtype=np.uint8)
+    first = np.full(n, -1, dtype=np.int16)
+
+    def mark(failed, code, where):
+        # Grids that already failed keep their earlier, more serious status
+        failed &= status == OK
+        if failed.any():
+            status[failed] = code
+            first[failed] = where[failed].argmax(axis=1)
+
+    bad = cells > 9
+    mark(bad.any(axis=1), BAD_VALUE, bad)
+
+    # A unit holds a repeated digit exactly when the sum of its digit bits
+    # differs from their OR; two reductions over (n, 27, 9) cover every unit
+    units = MASK_OF[cells][:, UNIT_CELLS]
+    repeated = (units.sum(axis=2, dtype=np.uint16) != np.bitwise_or.reduce(units, axis=2)).any(axis=1)
+    repeated &= status == OK
+    if repeated.any():
+        # Only the failing grids pay for locating the clashing cells
+        rows = np.flatnonzero(repeated)
+        failing = units[rows]
+        same = (failing[:, :, :, None] == failing[:, :, None, :]) & (failing[:, :, :, None] != 0)
+        clashing = same.sum(axis=3) > 1
+        where = np.zeros((len(rows), 81), dtype=bool)
+        # Rows, columns and boxes each cover every cell exactly once
+        for kind in range(3):
+            where[:, UNIT_CELLS[9 * kind:9 * kind + 9].ravel()] |= \
+                clashing[:, 9 * kind:9 * kind + 9].reshape(len(rows), 81)
+        status[rows] = CONFLICT
+        first[rows] = where.argmax(axis=1)
+
+    if complete:
+        empty = cells == 0
+        mark(empty.any(axis=1), INCOMPLETE, empty)
+
+    if solutions is not None:
+        solved = check_chunk(solutions, complete=True)
+        unsolved = solved.status != OK
+        unsolved &= status == OK
+        status[unsolved] = BAD_SOLUTION
+        first[unsolved] = solved.first[unsolved]
+        differs = (cells != 0) & (cells != solutions)
+        mark(differs.any(axis=1), MISMATCH, differs)
+    return BatchResult(status, first)
+
+
+def as_cells(grids):
+    # Reads the slice (which pages it in for a memmap) as (n, 81) uint8
+    block = np.asarray(grids)
+    if block.dtype != np.uint8:
+        block = block.astype(np.uint8)
+    return block.reshape(len(block), 81)
+
+
+def iter_validate(grids, solutions=None, complete=False, chunk=CHUNK):
+    # Yields (start index, BatchResult) per chunk, so a memory-mapped set of
+    # any size is streamed through with bounded memory. grids is an
+    # (N, 9, 9) or (N, 81) array, or without numpy any sequence of grids
+    for start in range(0, len(grids), chunk):
+        block = grids[start:start + chunk]
+        answers = solutions[start:start + chunk] if solutions is not None else None
+        if np is not None:
+            yield start, check_chunk(as_cells(block),
+                                     as_cells(answers) if answers is not None else None, complete)
+        else:
+            status, first = array("B"), array("h")
+            for k, grid in enumerate(block):
+                code, at = check_cells(flat_cells(grid),
+                                       flat_cells(answers[k]) if answers is not None else None,
+                                       complete)
+                status.append(code)
+                first.append(at)
+            yield start, BatchResult(status, first)
+
+
+def validate(grids, solutions=None, complete=False, chunk=CHUNK):
+    results = [result for _, result in iter_validate(grids, solutions, complete, chunk)]
+    if np is not None:
+        if not results:
+            return BatchResult(np.zeros(0, dtype=np.uint8), np.zeros(0, dtype=np.int16))
+        return BatchResult(np.concatenate([r.status for r in results]),
+                           np.concatenate([r.first for r in results]))
+    status, first = array("B"), array("h")
+    for result in results:
+        status.extend(result.status)
+        first.extend(result.first)
+    return BatchResult(status, first)
+
+
+def unpack_nibbles(packed):
+    # (n, 41) packed bank grids -> (n, 81) cells
+    cells = np.empty((len(packed), 82), dtype=np.uint8)
+    cells[:, 0::2] = packed >> 4
+    cells[:, 1::2] = packed & 0xF
+    return cells[:, :81]
+
+
+def iter_bank(path, chunk=CHUNK):
+    # Yields (start, puzzles, solutions) straight from a puzzle bank file,
+    # mapped rather than read so only the current chunk is resident
+    if np is None:
+        bank = puzzle_bank.PuzzleBank(path)
+        try:
+            for start in range(0, len(bank), chunk):
+                records = [bank.record(k) for k in range(start, min(len(bank), start + chunk))]
+                yield start, [r[1] for r in records], [r[2] for r in records]
+        finally:
+            bank.close()
+        return
+    if BANK_RECORD.itemsize != puzzle_bank.RECORD.size:
+        raise ValueError("bank record layout changed")
+    size = os.path.getsize(path) - puzzle_bank.HEADER.size
+    count = size // BANK_RECORD.itemsize
+    if not count:
+        return
+    records = np.memmap(path, dtype=BANK_RECORD, mode="r", offset=puzzle_bank.HEADER.size,
+                        shape=(count,))
+    for start in range(0, count, chunk):
+        block = records[start:start + chunk]
+        yield start, unpack_nibbles(block["puzzle"]), unpack_nibbles(block["solution"])
+
+
+def validate_bank(path, chunk=CHUNK):
+    # Every puzzle checked against its own solution
+    for start, puzzles, solutions in iter_bank(path, chunk):
+        for offset, result in iter_validate(puzzles, solutions, chunk=chunk):
+            yield start + offset, result
+
+
+def load_grids(path):
+    if np is None:
+        raise SystemExit("numpy is needed to read .npy files")
+    return np.load(path, mmap_mode="r")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Check a puzzle bank or .npy grid set for "
+                                                 "rule violations in bulk.")
+    parser.add_argument("path", help="puzzle bank file, or .npy array of (N, 9, 9) grids")
+    parser.add_argument("--solutions", help=".npy array of solutions matching the grids")
+    parser.add_argument("--complete", action="store_true",
+                        help="treat empty cells as an error (for solution sets)")
+    parser.add_argument("--chunk", type=int, default=CHUNK, help="grids per pass")
+    parser.add_argument("--show", type=int, default=10, help="failing grids to list")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.path.endswith(".npy"):
+        grids = load_grids(args.path)
+        solutions = load_grids(args.solutions) if args.solutions else None
+        results = iter_validate(grids, solutions, args.complete, args.chunk)
+    else:
+        results = validate_bank(args.path, args.chunk)
+
+    started = time.perf_counter()
+    counts = collections.Counter()
+    shown = 0
+    total = 0
+    for start, result in results:
+        total += len(result.status)
+        for code in range(len(STATUS_NAMES)):
+            counts[code] += int((result.status == code).sum()) if np is not None else \
+                result.status.count(code)
+        if shown < args.show and counts[OK] < total:
+            for k, code in enumerate(result.status):
+                if code != OK and shown < args.show:
+                    row, col = divmod(int(result.first[k]), 9)
+                    print(f"grid {start + k}: {STATUS_NAMES[code]} at r{row + 1}c{col + 1}")
+                    shown += 1
+    elapsed = time.perf_counter() - started
+
+    summary = ", ".join(f"{counts[code]} {name}" for code, name in enumerate(STATUS_NAMES)
+                        if counts[code])
+    rate = total / elapsed if elapsed else 0.0
+    print(f"{total} grids in {elapsed:.2f}s ({rate:,.0f}/s): {summary or 'nothing to check'}",
+          file=sys.stderr)
+    return 0 if counts[OK] == total else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+import math
+import random
+
+
+class BeatGrid:
+    def __init__(self, tempo=120.0, energy=0.6, beats=None, seed=None, resolution=0.01,
+                 beats_per_bar=4, bars=8, decay=0.18, scale=1.0):
+        # The envelope is built once per track; sample() is then a single
+        # table lookup by playback phase
+        self.resolution = resolution
+        rng = random.Random(seed)
+        peak = (0.45 + 0.5 * energy) * scale
+        floor = (0.12 + 0.15 * energy) * scale
+
+        if beats:
+            onsets = list(beats)
+            length = onsets[-1] + 60.0 / max(tempo, 1.0)
+            self.looped = False
+        else:
+            period = 60.0 / max(tempo, 1.0)
+            count = beats_per_bar * bars
+            onsets = [k * period for k in range(count)]
+            length = count * period
+            self.looped = True
+
+        size = max(1, int(length / resolution))
+        envelope = [floor] * size
+        for k, onset in enumerate(onsets):
+            # Downbeats hit harder, and every beat gets a fixed per-track
+            # variation so repeated bars do not look identical
+            accent = 1.0 if k % beats_per_bar == 0 else 0.8
+            height = (peak - floor) * accent * rng.uniform(0.75, 1.0)
+            start = int(onset / resolution)
+            end = onsets[k + 1] if k + 1 < len(onsets) else length
+            for index in range(start, min(size, int(end / resolution) + 1)):
+                t = index * resolution - onset
+                envelope[index] = max(envelope[index], floor + height * math.exp(-t / decay))
+        self.envelope = envelope
+        self.floor = floor
+
+    def sample(self, phase):
+        index = int(phase / self.resolution)
+        if self.looped:
+            return self.envelope[index % len(self.envelope)]
+        if 0 <= index < len(self.envelope):
+            return self.envelope[index]
+        return self.floor
+
+
+class BeatClock:
+    def __init__(self, snap_threshold=1.0, correction=0.5):
+        self.start_time = 0.0
+        self.snap_threshold = snap_threshold
+        self.correction = correction
+        self.synced = False
+
+    def sync(self, progress_ms, received_at):
+        # Pull the estimated track start towards each new progress report;
+        # large jumps (seeks, track changes) are taken at once
+        target = received_at - progress_ms / 1000.0
+        error = target - self.start_time
+        if not self.synced or abs(error) > self.snap_threshold:
+            self.start_time = target
+            self.synced = True
+        else:
+            self.start_time += error * self.correction
+        return self.start_time
+
+    def reset(self):
+        self.synced = False
+
+    def phase(self, now):
+        return now - self.start_time
@@ -0,0 +1,480 @@
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import time
+import solution_grids
+import sudoku_generator
+import sudoku_solver
+from sudoku_board import BoardModel
+from candidate_engine import CandidateEngine
+from move_log import MoveLog, CORRECT
+
+# Well-known hard puzzles, all with a single solution
+HARD_PUZZLES = {
+    "ai_escargot": "1....7.9..3..2...8..96..5....53..9...1..8...26....4...3......1..4......7..7...3..",
+    "inkala_2012": "8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..",
+    "easter_monster": "1.......2.9.4...5...6...7...5.9.3.......7.......85..4.7.....6...3...9.8...2.....1",
+    "norvig_hard1": "..............3.85..1.2.......5.7.....4...1...9.......5......73..2.1........4...9",
+    "norvig_top95_1": "4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......",
+    "min_17_clue": "000000010400000000020000000000050407008000300001090000300400200050100000000806000",
+}
+
+# Metrics ending in these are better when larger; everything else is a cost
+HIGHER_IS_BETTER = ("_per_sec",)
+# Only these are judged for regressions; tail latencies and maxima are too
+# noisy at the default sample counts and are reported for information
+JUDGED = ("_per_sec", "mean_ms", "p50_ms")
+# Differences below this many milliseconds are timer noise, not a change
+NOISE_FLOOR_MS = 0.005
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    n = len(ordered)
+
+    def pick(fraction):
+        return ordered[min(n - 1, int(fraction * n))] * 1000.0
+
+    return {"count": n,
+            "mean_ms": round(sum(ordered) / n * 1000.0, 4),
+            "p50_ms": round(pick(0.5), 4),
+            "p90_ms": round(pick(0.9), 4),
+            "p99_ms": round(pick(0.99), 4),
+            "max_ms": round(ordered[-1] * 1000.0, 4)}
+
+
+def bench_generation(args, results):
+    # The game's fill_grid and remove_cells are thin wrappers over these two
+    rng = random.Random(args.seed)
+    for difficulty in args.difficulty:
+        holes = sudoku_generator.DIFFICULTY_SETTINGS[difficulty]
+        fill_times, remove_times, removed_counts = [], [], []
+        start = time.perf_counter()
+        for _ in range(args.count):
+            t0 = time.perf_counter()
+            solution = solution_grids.random_grid(rng)
+            t1 = time.perf_counter()
+            _, removed = sudoku_generator.dig_holes(solution, holes, rng, args.symmetry,
+                                                    args.time_budget)
+            t2 = time.perf_counter()
+            fill_times.append(t1 - t0)
+            remove_times.append(t2 - t1)
+            removed_counts.append(removed)
+        elapsed = time.perf_counter() - start
+        results[f"generate.{difficulty}.fill"] = summarize(fill_times)
+        results[f"generate.{difficulty}.remove"] = summarize(remove_times)
+        results[f"generate.{difficulty}"] = {
+            "puzzles_per_sec": round(args.count / elapsed, 2),
+            "mean_holes": round(sum(removed_counts) / len(removed_counts), 2)}
+
+
+def bench_solution_grids(args, results):
+    # The transform-based generator against the randomised search it replaced
+    rng = random.Random(args.seed)
+    for name, func in (("permute", solution_grids.random_grid),
+                       ("search", sudoku_solver.random_solution)):
+        times = []
+        for _ in range(args.repeat * 10):
+            t0 = time.perf_counter()
+            func(rng)
+            times.append(time.perf_counter() - t0)
+        results[f"solution.{name}"] = summarize(times)
+
+
+def bench_uniqueness(args, results):
+    for name, text in HARD_PUZZLES.items():
+        grid = sudoku_solver.from_string(text)
+        times = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            unique = sudoku_solver.has_unique_solution(grid)
+            times.append(time.perf_counter() - t0)
+        solver = sudoku_solver.SudokuSolver(grid)
+        solver.search(2)
+        summary = summarize(times)
+        summary["nodes"] = solver.nodes
+        summary["unique"] = unique
+        results[f"unique.{name}"] = summary
+
+
+def bench_board(args, results):
+    # Replays a whole game onto the board model the way check_number does,
+    # timing the completion check, the move log append and undoing it all
+    rng = random.Random(args.seed)
+    puzzle, solution = sudoku_generator.generate(sudoku_generator.DIFFICULTY_SETTINGS["Medium"], rng)
+    empty = [(r, c) for r in range(9) for c in range(9) if puzzle[r][c] == 0]
+    set_times, check_times, undo_times, log_times = [], [], [], []
+    # Never started, so records only queue up: the cost the UI thread pays
+    log = MoveLog(os.devnull)
+    for _ in range(args.repeat):
+        board = BoardModel(puzzle)
+        for r, c in empty:
+            t0 = time.perf_counter()
+            board.set(r, c, solution[r][c])
+            t1 = time.perf_counter()
+            board.is_complete()
+            t2 = time.perf_counter()
+            log.move(r * 9 + c, solution[r][c], 1, CORRECT)
+            t3 = time.perf_counter()
+            set_times.append(t1 - t0)
+            check_times.append(t2 - t1)
+            log_times.append(t3 - t2)
+        for _ in empty:
+            t0 = time.perf_counter()
+            board.undo()
+            undo_times.append(time.perf_counter() - t0)
+        log.pending = []
+    results["board.set"] = summarize(set_times)
+    results["board.check_solution"] = summarize(check_times)
+    results["board.undo"] = summarize(undo_times)
+    results["board.log_move"] = summarize(log_times)
+
+
+def bench_hints(args, results):
+    # Solves a puzzle one hint at a time, timing each hint query, the
+    # candidate update for the digit it places and the pencil-mark text for
+    # every cell that update touched; then the worst case, a full search that
+    # finds nothing on a puzzle beyond these techniques
+    rng = random.Random(args.seed)
+    puzzle, _ = sudoku_generator.generate(sudoku_generator.DIFFICULTY_SETTINGS["Hard"], rng)
+    hint_times, set_times, marks_times = [], [], []
+    for _ in range(args.repeat):
+        engine = CandidateEngine(puzzle)
+        while True:
+            t0 = time.perf_counter()
+            hint = engine.hint()
+            hint_times.append(time.perf_counter() - t0)
+            if hint is None:
+                break
+            t0 = time.perf_counter()
+            if hint.cell is not None:
+                changed = engine.set(hint.cell, hint.digit)
+            else:
+                changed = engine.strike(hint.eliminations)
+            t1 = time.perf_counter()
+            for i in changed:
+                engine.marks(i)
+            t2 = time.perf_counter()
+            set_times.append(t1 - t0)
+            marks_times.append(t2 - t1)
+    results["hints.query"] = summarize(hint_times)
+    results["hints.update"] = summarize(set_times)
+    results["hints.marks"] = summarize(marks_times)
+
+    engine = CandidateEngine(sudoku_solver.from_string(HARD_PUZZLES["ai_escargot"]))
+    hint = engine.hint()
+    while hint is not None:
+        if hint.cell is not None:
+            engine.set(hint.cell, hint.digit)
+        else:
+            engine.strike(hint.eliminations)
+        hint = engine.hint()
+    stuck_times = []
+    for _ in range(args.repeat * 10):
+        # As if a digit had just gone in, so nothing derived is reused
+        engine.version += 1
+        t0 = time.perf_counter()
+        engine.hint()
+        stuck_times.append(time.perf_counter() - t0)
+    results["hints.none_found"] = summarize(stuck_times)
+
+
+def bench_validate(args, results):
+    # Bulk puzzle/solution checking: the per-grid reference loop against the
+    # vectorised passes, over relabelled copies of one generated puzzle
+    import batch_validator
+    rng = random.Random(args.seed)
+    puzzle, solution = sudoku_generator.generate(sudoku_generator.DIFFICULTY_SETTINGS["Medium"], rng)
+    pairs = [solution_grids.permute_puzzle(puzzle, solution, rng) for _ in range(1000)]
+    puzzles = [[v for row in p for v in row] for p, _ in pairs]
+    solutions = [[v for row in s for v in row] for _, s in pairs]
+
+    t0 = time.perf_counter()
+    for p, s in zip(puzzles, solutions):
+        batch_validator.check_cells(p, s)
+    results["validate.python"] = {"grids_per_sec": round(len(puzzles) / (time.perf_counter() - t0))}
+
+    np = batch_validator.np
+    if np is None:
+        results["validate.numpy"] = {"skipped": "numpy is not installed"}
+        return
+    copies = args.repeat * 10
+    grids = np.tile(np.array(puzzles, dtype=np.uint8), (copies, 1)).reshape(-1, 9, 9)
+    answers = np.tile(np.array(solutions, dtype=np.uint8), (copies, 1)).reshape(-1, 9, 9)
+    t0 = time.perf_counter()
+    batch_validator.validate(grids, answers)
+    results["validate.numpy"] = {"grids_per_sec": round(len(grids) / (time.perf_counter() - t0))}
+
+
+def start_virtual_display():
+    # Only needed when there is no display; returns the Xvfb process to stop
+    if os.environ.get("DISPLAY") or sys.platform in ("win32", "darwin"):
+        return None
+    xvfb = shutil.which("Xvfb")
+    if not xvfb:
+        return None
+    display = ":%d" % (90 + os.getpid() % 100)
+    process = subprocess.Popen([xvfb, display, "-screen", "0", "800x600x24"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ["DISPLAY"] = display
+    time.sleep(0.5)
+    return process
+
+
+def bench_waves(args, results):
+    try:
+        import tkinter as tk
+    except ImportError:
+        results["waves"] = {"skipped": "tkinter is not available"}
+        return
+    from beat_grid import BeatGrid
+    from wave_visualizer import WaveVisualizer
+
+    display = start_virtual_display()
+    try:
+        try:
+            root = tk.Tk()
+        except tk.TclError as e:
+            results["waves"] = {"skipped": f"no display: {e}"}
+            return
+        canvas = tk.Canvas(root, width=400, height=80)
+        canvas.pack()
+        grid = BeatGrid(tempo=128, energy=0.8, seed=0)
+        started = time.time()
+        visualizer = WaveVisualizer(canvas, source=lambda: grid.sample(time.time() - started))
+        root.update()
+        step_times, frame_times = [], []
+        for _ in range(args.frames):
+            t0 = time.perf_counter()
+            visualizer.step()
+            t1 = time.perf_counter()
+            # Includes Tk's redraw of the moved bars, which is what a real
+            # frame costs the event loop
+            root.update_idletasks()
+            t2 = time.perf_counter()
+            step_times.append(t1 - t0)
+            frame_times.append(t2 - t0)
+        root.destroy()
+        results["waves.step"] = summarize(step_times)
+        results["waves.frame"] = summarize(frame_times)
+    finally:
+        if display is not None:
+            display.terminate()
+            display.wait()
+
+
+def bench_render(args, results):
+    # The Entry grid against the single-canvas board: building it, drawing a
+    # new puzzle into it and a theme switch, each timed up to the point Tk
+    # has redrawn the result
+    try:
+        import tkinter as tk
+    except ImportError:
+        results["render"] = {"skipped": "tkinter is not available"}
+        return
+    from board_renderer import CanvasBoardRenderer, EntryBoardRenderer, cell_styles
+
+    rng = random.Random(args.seed)
+    puzzles = [sudoku_generator.generate(sudoku_generator.DIFFICULTY_SETTINGS["Medium"], rng)[0]
+               for _ in range(2)]
+    # The game's light and dark themes
+    themes = [cell_styles('#E8E8E8', '#333333', '#FFFFFF', '#000000'),
+              cell_styles('#4A4A4A', '#CCCCCC', '#3A3A3A', '#FFFFFF')]
+
+    def build_entries(parent, styles):
+        # As create_entry_board lays it out: a frame per box, an Entry per cell
+        entries = [[None] * 9 for _ in range(9)]
+        for box in range(9):
+            subgrid = tk.Frame(parent, bd=3, relief='solid')
+            subgrid.grid(row=box // 3, column=box % 3, padx=3, pady=3)
+            for k in range(9):
+                r, c = 3 * (box // 3) + k // 3, 3 * (box % 3) + k % 3
+                entry = tk.Entry(subgrid, width=3, justify='center', font=('Arial', 16, 'bold'),
+                                 bd=2, relief='solid')
+                entry.grid(row=k // 3, column=k % 3, padx=3, pady=3)
+                entries[r][c] = entry
+        return EntryBoardRenderer(entries, styles)
+
+    def build_canvas(parent, styles):
+        renderer = CanvasBoardRenderer(parent, styles, ('Arial', 16, 'bold'), '#333333',
+                                       lambda r, c, text: None, lambda r, c: None)
+        renderer.canvas.pack()
+        return renderer
+
+    display = start_virtual_display()
+    try:
+        try:
+            root = tk.Tk()
+        except tk.TclError as e:
+            results["render"] = {"skipped": f"no display: {e}"}
+            return
+        for name, build in (("entry", build_entries), ("canvas", build_canvas)):
+            build_times, grid_times, style_times = [], [], []
+            for i in range(args.repeat):
+                frame = tk.Frame(root)
+                frame.pack()
+                t0 = time.perf_counter()
+                renderer = build(frame, themes[0])
+                root.update_idletasks()
+                build_times.append(time.perf_counter() - t0)
+                for k in range(10):
+                    t0 = time.perf_counter()
+                    renderer.render_grid(puzzles[k % 2])
+                    root.update_idletasks()
+                    grid_times.append(time.perf_counter() - t0)
+                    t0 = time.perf_counter()
+                    renderer.set_styles(themes[(k + 1) % 2])
+                    root.update_idletasks()
+                    style_times.append(time.perf_counter() - t0)
+                frame.destroy()
+            results[f"render.{name}.build"] = summarize(build_times)
+            results[f"render.{name}.render_grid"] = summarize(grid_times)
+            results[f"render.{name}.set_styles"] = summarize(style_times)
+        root.destroy()
+    finally:
+        if display is not None:
+            display.terminate()
+            display.wait()
+
+
+def bench_startup(args, results):
+    # Launches the game with --startup-check, which reports the time from
+    # its first line to the first interactive frame and exits
+    display = start_virtual_display()
+    app = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Sudoku X Spotify.py")
+    try:
+        times = []
+        for _ in range(min(args.repeat, 10)):
+            process = subprocess.run([sys.executable, app, "--startup-check"], capture_output=True,
+                                     text=True, timeout=60, cwd=os.path.dirname(app))
+            match = re.search(r"First interactive frame after ([0-9.]+) ms", process.stderr)
+            if not match:
+                lines = process.stderr.strip().splitlines() or [f"exit status {process.returncode}"]
+                results["startup"] = {"skipped": lines[-1]}
+                return
+            times.append(float(match.group(1)) / 1000.0)
+        results["startup.first_frame"] = summarize(times)
+    finally:
+        if display is not None:
+            display.terminate()
+            display.wait()
+
+
+def bench_server(args, results):
+    # Simulated players against a server started on a free loopback port
+    import server_loadtest
+    results.update(server_loadtest.run(rooms=args.rooms, duration=args.duration,
+                                       seed=args.seed))
+
+
+SUITES = {
+    "generate": bench_generation,
+    "solution": bench_solution_grids,
+    "unique": bench_uniqueness,
+    "board": bench_board,
+    "hints": bench_hints,
+    "validate": bench_validate,
+    "waves": bench_waves,
+    "render": bench_render,
+    "startup": bench_startup,
+    "server": bench_server,
+}
+
+
+def flatten(results):
+    flat = {}
+    for name, metrics in results.items():
+        for key, value in metrics.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and key != "count":
+                flat[f"{name}.{key}"] = value
+    return flat
+
+
+def compare(baseline, current, threshold):
+    # Prints every metric present in both runs and returns the regressions
+    old, new = flatten(baseline["results"]), flatten(current["results"])
+    regressions = []
+    print(f"{'metric':<44}{'baseline':>12}{'current':>12}{'change':>9}")
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        change = (after - before) / before if before else 0.0
+        worse = -change if key.endswith(HIGHER_IS_BETTER) else change
+        flag = ""
+        judged = key.endswith(JUDGED) and (key.endswith(HIGHER_IS_BETTER) or
+                                           abs(after - before) > NOISE_FLOOR_MS)
+        if judged and worse > threshold:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        elif judged and worse < -threshold:
+            flag = "  faster"
+        print(f"{key:<44}{before:>12.4g}{after:>12.4g}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark puzzle generation, solving, the board "
+                                                 "model, the wave visualizer, board rendering, "
+                                                 "startup and the multiplayer server.")
+    parser.add_argument("-S", "--suite", dest="suites", action="append", choices=list(SUITES),
+                        help="suite to run (repeatable, default: all)")
+    parser.add_argument("-n", "--count", type=int, default=20,
+                        help="puzzles to generate per difficulty")
+    parser.add_argument("-d", "--difficulty", action="append",
+                        choices=list(sudoku_generator.DIFFICULTY_SETTINGS),
+                        help="difficulty to generate (repeatable, default: all)")
+    parser.add_argument("-r", "--repeat", type=int, default=20,
+                        help="repetitions for the solver and board suites")
+    parser.add_argument("--frames", type=int, default=300, help="wave frames to draw")
+    parser.add_argument("--rooms", type=int, default=200, help="rooms for the server suite")
+    parser.add_argument("--duration", type=float, default=5.0,
+                        help="seconds of play for the server suite")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("--symmetry", choices=sudoku_generator.SYMMETRIES, default="none")
+    parser.add_argument("--time-budget", type=float, default=2.0)
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative slowdown reported as a regression (default 0.1 = 10%%)")
+    args = parser.parse_args(argv)
+    args.suites = args.suites or list(SUITES)
+    args.difficulty = args.difficulty or list(sudoku_generator.DIFFICULTY_SETTINGS)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {}
+    for name in args.suites:
+        start = time.perf_counter()
+        SUITES[name](args, results)
+        print(f"{name}: {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+    report = {"meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "python": platform.python_version(),
+                       "platform": platform.platform(),
+                       "args": {key: value for key, value in vars(args).items()
+                                if key not in ("output", "compare")}},
+              "results": results}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    elif not args.compare:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, report, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
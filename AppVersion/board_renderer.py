@@ -0,0 +1,290 @@
+import tkinter as tk
+
+CORRECT_BG = '#0066FF'
+PLAYER2_BG = '#00AA00'
+WRONG_BG = '#FF3333'
+MARKS_FG = '#888888'
+
+READONLY_KINDS = ("prefilled", "correct", "correct_p2")
+
+
+def cell_styles(prefilled_bg, prefilled_fg, empty_bg, empty_fg):
+    return {
+        "prefilled": (prefilled_bg, prefilled_fg),
+        "empty": (empty_bg, empty_fg),
+        "correct": (CORRECT_BG, 'white'),
+        "correct_p2": (PLAYER2_BG, 'white'),
+        "wrong": (WRONG_BG, 'white'),
+    }
+
+
+class EntryBoardRenderer:
+    def __init__(self, entries, styles, symbols="123456789", marks_font=None):
+        self.entries = entries
+        self.styles = styles
+        # Text shown for each value, value v being symbols[v - 1]
+        self.symbols = symbols
+        self.marks_font = marks_font
+        size = len(entries)
+        # Pencil marks are Labels laid over their Entry, made on first use
+        self.mark_labels = [[None] * size for _ in range(size)]
+        self.marks = [[""] * size for _ in range(size)]
+        # Last text/state/colours pushed to each Entry; None means unknown
+        self.shown = [[(None, None, None, None) for _ in range(size)] for _ in range(size)]
+        self.kinds = [["empty"] * size for _ in range(size)]
+        self.texts = [[None] * size for _ in range(size)]
+        # Text goes through a variable so it can change without toggling a
+        # readonly Entry back to normal first
+        self.vars = [[tk.StringVar(master=entry) for entry in row] for row in entries]
+        for row, variables in zip(entries, self.vars):
+            for entry, var in zip(row, variables):
+                entry.config(textvariable=var)
+
+    def kind(self, row, col):
+        return self.kinds[row][col]
+
+    def input_text(self, row, col):
+        return self.vars[row][col].get()
+
+    def note_input(self, row, col):
+        # The player typed into this Entry, so its text is no longer known
+        _, state, bg, fg = self.shown[row][col]
+        self.shown[row][col] = (None, state, bg, fg)
+        self.texts[row][col] = None
+
+    def render_cell(self, row, col, text, kind):
+        # text=None keeps whatever the Entry currently holds
+        self.kinds[row][col] = kind
+        bg, fg = self.styles[kind]
+        state = 'readonly' if kind in READONLY_KINDS else 'normal'
+        shown_text, shown_state, shown_bg, shown_fg = self.shown[row][col]
+        if (text, state, bg, fg) == (shown_text, shown_state, shown_bg, shown_fg):
+            return
+
+        options = {}
+        if text is not None and text != shown_text:
+            self.vars[row][col].set(text)
+        if state != shown_state:
+            options['state'] = state
+        if bg != shown_bg:
+            options['bg'] = bg
+        if fg != shown_fg:
+            options['fg'] = fg
+        if options:
+            self.entries[row][col].config(**options)
+        self.shown[row][col] = (text, state, bg, fg)
+        self.texts[row][col] = text
+
+    def render_grid(self, grid):
+        for i, row in enumerate(grid):
+            for j, num in enumerate(row):
+                if num:
+                    self.render_cell(i, j, self.symbols[num - 1], "prefilled")
+                else:
+                    self.render_cell(i, j, "", "empty")
+
+    def render_marks(self, row, col, text):
+        # text="" hides the cell's pencil marks
+        if text == self.marks[row][col]:
+            return
+        self.marks[row][col] = text
+        label = self.mark_labels[row][col]
+        if not text:
+            label.place_forget()
+            return
+        entry = self.entries[row][col]
+        if label is None:
+            label = self.mark_labels[row][col] = tk.Label(
+                entry.master, font=self.marks_font, fg=MARKS_FG, bg=self.styles["empty"][0],
+                justify='center')
+            # Clicks go through to the Entry underneath, so it can still be typed into
+            label.bind('<Button-1>', lambda e: entry.focus_set())
+        label.config(text=text)
+        label.place(in_=entry, relx=0, rely=0, relwidth=1, relheight=1)
+
+    def clear_marks(self):
+        for i, row in enumerate(self.marks):
+            for j, text in enumerate(row):
+                if text:
+                    self.render_marks(i, j, "")
+
+    def focus_cell(self, row, col):
+        self.entries[row][col].focus_set()
+
+    def set_styles(self, styles, background=None):
+        self.styles = styles
+        for i, row in enumerate(self.kinds):
+            for j, kind in enumerate(row):
+                self.render_cell(i, j, self.texts[i][j], kind)
+        for row in self.mark_labels:
+            for label in row:
+                if label is not None:
+                    label.config(bg=styles["empty"][0])
+
+
+class CanvasBoardRenderer:
+    def __init__(self, parent, styles, font, background, on_input, on_click,
+                 size=9, box_size=3, cell_size=48, box_gap=4, symbols="123456789",
+                 marks_font=None):
+        self.styles = styles
+        self.marks_font = marks_font
+        self.symbols = symbols
+        self.size = size
+        self.box_size = box_size
+        self.cell_size = cell_size
+        self.box_gap = box_gap
+        # on_input(row, col, text) fires when the player types or clears a
+        # cell, on_click(row, col) when a cell is clicked
+        self.on_input = on_input
+        self.on_click = on_click
+
+        boxes = size // box_size
+        extent = size * cell_size + (boxes + 1) * box_gap
+        self.canvas = tk.Canvas(parent, width=extent, height=extent, bg=background,
+                                highlightthickness=0, takefocus=1)
+
+        self.kinds = [["empty"] * size for _ in range(size)]
+        self.texts = [[""] * size for _ in range(size)]
+        self.rects = [[None] * size for _ in range(size)]
+        self.labels = [[None] * size for _ in range(size)]
+        # Pencil-mark text items, made on first use
+        self.mark_items = [[None] * size for _ in range(size)]
+        self.marks = [[""] * size for _ in range(size)]
+        bg, fg = styles["empty"]
+        for row in range(size):
+            for col in range(size):
+                x0, y0 = self.cell_origin(row, col)
+                # Every cell carries its kind as a tag, so recolouring a whole
+                # kind is one itemconfigure regardless of board size
+                self.rects[row][col] = self.canvas.create_rectangle(
+                    x0, y0, x0 + cell_size - 2, y0 + cell_size - 2,
+                    fill=bg, outline='#555555', tags=("bg:empty",))
+                self.labels[row][col] = self.canvas.create_text(
+                    x0 + cell_size / 2 - 1, y0 + cell_size / 2 - 1, text="",
+                    fill=fg, font=font, tags=("fg:empty",))
+        self.selection = self.canvas.create_rectangle(0, 0, 0, 0, outline='#FFCC00', width=3,
+                                                      state='hidden')
+        self.selected = None
+
+        self.canvas.bind('<Button-1>', self._on_button)
+        self.canvas.bind('<Key>', self._on_key)
+
+    def cell_origin(self, row, col):
+        x = self.box_gap + col * self.cell_size + (col // self.box_size) * self.box_gap
+        y = self.box_gap + row * self.cell_size + (row // self.box_size) * self.box_gap
+        return x, y
+
+    def cell_at(self, x, y):
+        for col in range(self.size):
+            x0, _ = self.cell_origin(0, col)
+            if x0 <= x < x0 + self.cell_size:
+                break
+        else:
+            return None
+        for row in range(self.size):
+            _, y0 = self.cell_origin(row, 0)
+            if y0 <= y < y0 + self.cell_size:
+                return row, col
+        return None
+
+    def select(self, row, col):
+        self.selected = (row, col)
+        x0, y0 = self.cell_origin(row, col)
+        self.canvas.coords(self.selection, x0, y0, x0 + self.cell_size - 2, y0 + self.cell_size - 2)
+        self.canvas.itemconfigure(self.selection, state='normal')
+        self.canvas.tag_raise(self.selection)
+
+    def _on_button(self, event):
+        self.canvas.focus_set()
+        cell = self.cell_at(event.x, event.y)
+        if cell is not None:
+            self.select(*cell)
+            self.on_click(*cell)
+
+    def _on_key(self, event):
+        if self.selected is None:
+            return
+        row, col = self.selected
+        moves = {'Up': (-1, 0), 'Down': (1, 0), 'Left': (0, -1), 'Right': (0, 1)}
+        if event.keysym in moves:
+            d_row, d_col = moves[event.keysym]
+            self.select((row + d_row) % self.size, (col + d_col) % self.size)
+            return
+        if self.kinds[row][col] in READONLY_KINDS:
+            return
+        if event.keysym in ('BackSpace', 'Delete'):
+            self._set_text(row, col, "")
+            self.on_input(row, col, "")
+        elif event.char and event.char.isprintable():
+            self._set_text(row, col, event.char)
+            self.on_input(row, col, event.char)
+
+    def _set_text(self, row, col, text):
+        if text != self.texts[row][col]:
+            self.texts[row][col] = text
+            self.canvas.itemconfigure(self.labels[row][col], text=text)
+
+    def kind(self, row, col):
+        return self.kinds[row][col]
+
+    def input_text(self, row, col):
+        return self.texts[row][col]
+
+    def note_input(self, row, col):
+        pass
+
+    def render_cell(self, row, col, text, kind):
+        if text is not None:
+            self._set_text(row, col, text)
+        old_kind = self.kinds[row][col]
+        if kind == old_kind:
+            return
+        self.kinds[row][col] = kind
+        bg, fg = self.styles[kind]
+        rect, label = self.rects[row][col], self.labels[row][col]
+        self.canvas.dtag(rect, "bg:" + old_kind)
+        self.canvas.addtag_withtag("bg:" + kind, rect)
+        self.canvas.dtag(label, "fg:" + old_kind)
+        self.canvas.addtag_withtag("fg:" + kind, label)
+        self.canvas.itemconfigure(rect, fill=bg)
+        self.canvas.itemconfigure(label, fill=fg)
+
+    def render_grid(self, grid):
+        for i, row in enumerate(grid):
+            for j, num in enumerate(row):
+                if num:
+                    self.render_cell(i, j, self.symbols[num - 1], "prefilled")
+                else:
+                    self.render_cell(i, j, "", "empty")
+
+    def render_marks(self, row, col, text):
+        # text="" hides the cell's pencil marks
+        if text == self.marks[row][col]:
+            return
+        self.marks[row][col] = text
+        item = self.mark_items[row][col]
+        if item is None:
+            x0, y0 = self.cell_origin(row, col)
+            item = self.mark_items[row][col] = self.canvas.create_text(
+                x0 + self.cell_size / 2 - 1, y0 + self.cell_size / 2 - 1, text=text,
+                fill=MARKS_FG, font=self.marks_font, justify='center', tags=("marks",))
+            if self.selected is not None:
+                self.canvas.tag_raise(self.selection)
+        else:
+            self.canvas.itemconfigure(item, text=text)
+
+    def clear_marks(self):
+        self.canvas.itemconfigure("marks", text="")
+        self.marks = [[""] * self.size for _ in range(self.size)]
+
+    def focus_cell(self, row, col):
+        self.canvas.focus_set()
+        self.select(row, col)
+
+    def set_styles(self, styles, background=None):
+        self.styles = styles
+        for kind, (bg, fg) in styles.items():
+            self.canvas.itemconfigure("bg:" + kind, fill=bg)
+            self.canvas.itemconfigure("fg:" + kind, fill=fg)
+        if background is not None:
+            self.canvas.configure(bg=background)
@@ -0,0 +1,331 @@
+import collections
+from array import array
+from itertools import combinations
+import sudoku_solver
+
+# One step the player could take next. A single names the cell and digit to
+# place; an elimination maps cells to the candidate bits it removes from
+# them. cells are the ones the reasoning is about, for highlighting
+Hint = collections.namedtuple("Hint", "technique cell digit eliminations cells text")
+
+SUBSET_NAMES = {2: "Pair", 3: "Triple"}
+
+
+class CandidateEngine:
+    # Candidates of every cell as a bitmask, from the digits accepted so far
+    # (givens and correct entries). Placing or taking back a digit only
+    # touches that cell's row, column and box, so the marks can stay live
+    def __init__(self, grid=None, box=3):
+        if grid:
+            box = sudoku_solver.box_of_grid(grid)
+        # Bumped on every change, so derived tables know when to rebuild
+        self.version = 0
+        self.load(grid or [[0] * box * box for _ in range(box * box)])
+        # Easiest first, in the rater's order; fish are left to the rater
+        self.finders = (
+            self.hidden_single,
+            self.naked_single,
+            self.pointing_claiming,
+            lambda: self.naked_subset(2),
+            lambda: self.hidden_subset(2),
+            lambda: self.naked_subset(3),
+            lambda: self.hidden_subset(3),
+        )
+
+    def load(self, grid):
+        geo = self.geo = sudoku_solver.geometry(sudoku_solver.box_of_grid(grid))
+        self.size = geo.size
+        self.cells = bytearray(geo.cells)
+        # used[unit] has the bit of every digit already in that unit
+        self.used = array("I", bytes(4 * 3 * geo.size))
+        self.cands = [0] * geo.cells
+        # Candidates taken out by hints the player has been shown, on top of
+        # what the placed digits rule out
+        self.struck = [0] * geo.cells
+        self.struck_any = False
+        # Pencil-mark text by candidate mask
+        self.texts = {}
+        # Each unit's cells as one bit per cell
+        self.unit_bits = [sum(1 << i for i in unit) for unit in geo.units]
+        self.version += 1
+        self.spots_version = None
+        self.spots = None
+        used, bit = self.used, geo.bit
+        for i, num in enumerate(v for row in grid for v in row):
+            if num:
+                self.cells[i] = num
+                for unit in geo.units_of[i]:
+                    used[unit] |= bit[num]
+        self._recompute(range(geo.cells))
+
+    def _recompute(self, changed):
+        cells, used, cands, struck = self.cells, self.used, self.cands, self.struck
+        units_of, all_digits = self.geo.units_of, self.geo.all_digits
+        for i in changed:
+            if cells[i]:
+                cands[i] = 0
+            else:
+                row, col, box = units_of[i]
+                cands[i] = all_digits & ~(used[row] | used[col] | used[box] | struck[i])
+
+    def set(self, i, num):
+        # num is the digit now accepted in cell i, 0 for none; returns the
+        # cells whose candidates may have changed
+        old = self.cells[i]
+        if old == num:
+            return (i,)
+        self.version += 1
+        geo = self.geo
+        changed = [i] + geo.peers[i]
+        if not old:
+            bit = geo.bit[num]
+            self.cells[i] = num
+            for unit in geo.units_of[i]:
+                self.used[unit] |= bit
+            cands, keep = self.cands, ~bit
+            cands[i] = 0
+            for p in geo.peers[i]:
+                cands[p] &= keep
+            return changed
+
+        self.cells[i] = 0
+        keep = ~geo.bit[old]
+        for unit in geo.units_of[i]:
+            self.used[unit] &= keep
+        if self.struck_any:
+            # A struck candidate may have relied on the digit taken back, so
+            # they all come back; this only happens on an undo
+            self.struck = [0] * geo.cells
+            self.struck_any = False
+            changed = range(geo.cells)
+        if num:
+            self.cells[i] = num
+            for unit in geo.units_of[i]:
+                self.used[unit] |= geo.bit[num]
+        self._recompute(changed)
+        return changed
+
+    def strike(self, eliminations):
+        # Applies a hint's eliminations; returns the cells that changed
+        self.version += 1
+        for i, mask in eliminations.items():
+            self.struck[i] |= mask
+            self.cands[i] &= ~mask
+        self.struck_any = self.struck_any or bool(eliminations)
+        return list(eliminations)
+
+    def candidates(self, i):
+        return self.geo.digits_of_mask(self.cands[i])
+
+    def marks(self, i):
+        # Candidates laid out box x box, a blank for each ruled-out digit
+        mask = self.cands[i]
+        text = self.texts.get(mask)
+        if text is None:
+            box, symbols = self.geo.box, self.geo.symbols
+            text = self.texts[mask] = "\n".join(
+                " ".join(symbols[d] if mask >> d & 1 else " " for d in range(r * box, r * box + box))
+                for r in range(box))
+        return text
+
+    def cell_name(self, i):
+        return f"r{i // self.size + 1}c{i % self.size + 1}"
+
+    def cell_list(self, cells):
+        names = [self.cell_name(i) for i in cells]
+        return names[0] if len(names) == 1 else ", ".join(names[:-1]) + " and " + names[-1]
+
+    def unit_name(self, unit):
+        return f"{('row', 'column', 'box')[unit // self.size]} {unit % self.size + 1}"
+
+    def digit_list(self, mask):
+        names = [self.geo.symbols[d - 1] for d in self.geo.digits_of_mask(mask)]
+        return names[0] if len(names) == 1 else ", ".join(names[:-1]) + " and " + names[-1]
+
+    def hint(self):
+        # The easiest next step, or None when these techniques are stuck
+        for find in self.finders:
+            hint = find()
+            if hint is not None:
+                return hint
+        return None
+
+    def hidden_single(self):
+        cands = self.cands
+        for u, unit in enumerate(self.geo.units):
+            once = twice = 0
+            for i in unit:
+                mask = cands[i]
+                twice |= once & mask
+                once |= mask
+            hidden = once & ~twice
+            if hidden:
+                bit = hidden & -hidden
+                cell = next(i for i in unit if cands[i] & bit)
+                num = self.geo.digit_of[bit]
+                return Hint("Hidden Single", cell, num, {}, tuple(unit),
+                            f"Hidden single: {self.geo.symbols[num - 1]} can only go in "
+                            f"{self.cell_name(cell)} within {self.unit_name(u)}.")
+        return None
+
+    def naked_single(self):
+        cands = self.cands
+        for i, mask in enumerate(cands):
+            if mask and not mask & (mask - 1):
+                num = self.geo.digit_of[mask]
+                return Hint("Naked Single", i, num, {}, (i,),
+                            f"Naked single: {self.cell_name(i)} can only be "
+                            f"{self.geo.symbols[num - 1]}; every other digit is ruled out.")
+        return None
+
+    def pointing_claiming(self):
+        # Works on segments, the cells a line shares with a box: segs[line *
+        # box + band] is the union of candidates in that segment, so both
+        # patterns come down to a few ORs per line
+        geo, cands = self.geo, self.cands
+        size, box = self.size, geo.box
+        row_segs = [0] * (size * box)
+        col_segs = [0] * (size * box)
+        row_of, col_of = geo.row_of, geo.col_of
+        for i, mask in enumerate(cands):
+            if mask:
+                row, col = row_of[i], col_of[i]
+                row_segs[row * box + col // box] |= mask
+                col_segs[col * box + row // box] |= mask
+
+        for segs, first_unit, rows in ((row_segs, 0, True), (col_segs, size, False)):
+            for group in range(box):
+                lines = range(group * box, group * box + box)
+                for band in range(box):
+                    box_unit = 2 * size + (group * box + band if rows else band * box + group)
+                    # Pointing: a digit confined to one line within the box
+                    once = twice = 0
+                    for line in lines:
+                        mask = segs[line * box + band]
+                        twice |= once & mask
+                        once |= mask
+                    only = once & ~twice
+                    if not only:
+                        continue
+                    for line in lines:
+                        bits = only & segs[line * box + band]
+                        if bits:
+                            outside = 0
+                            for k in range(box):
+                                if k != band:
+                                    outside |= segs[line * box + k]
+                            bits &= outside
+                            if bits:
+                                return self.locked_hint("Pointing", box_unit, first_unit + line,
+                                                        bits & -bits)
+
+            for line in range(size):
+                # Claiming: a digit confined to one box within the line
+                once = twice = 0
+                for band in range(box):
+                    mask = segs[line * box + band]
+                    twice |= once & mask
+                    once |= mask
+                only = once & ~twice
+                if not only:
+                    continue
+                group = line // box
+                for band in range(box):
+                    bits = only & segs[line * box + band]
+                    if bits:
+                        inside = 0
+                        for other in range(group * box, group * box + box):
+                            if other != line:
+                                inside |= segs[other * box + band]
+                        bits &= inside
+                        if bits:
+                            box_unit = 2 * size + (group * box + band if rows else band * box + group)
+                            return self.locked_hint("Claiming", first_unit + line, box_unit,
+                                                    bits & -bits)
+        return None
+
+    def locked_hint(self, word, within, into, bit):
+        # bit is confined to the cells `within` shares with `into`, so the
+        # rest of `into` loses it
+        units, cands = self.geo.units, self.cands
+        inside = set(units[within])
+        shared = tuple(i for i in units[into] if i in inside)
+        eliminations = {i: bit for i in units[into] if i not in inside and cands[i] & bit}
+        symbol = self.geo.symbols[self.geo.digit_of[bit] - 1]
+        return Hint("Pointing/Claiming", None, None, eliminations, shared,
+                    f"{word}: in {self.unit_name(within)}, {symbol} only fits in "
+                    f"{self.unit_name(into)}, so it can be removed from "
+                    f"{self.cell_list(eliminations)}.")
+
+    def naked_subset(self, n):
+        cands, popcount = self.cands, self.geo.popcount
+        for u, unit in enumerate(self.geo.units):
+            open_cells = [i for i in unit if cands[i] and popcount(cands[i]) <= n]
+            if len(open_cells) < n:
+                continue
+            for group in combinations(open_cells, n):
+                union = 0
+                for i in group:
+                    union |= cands[i]
+                if popcount(union) != n:
+                    continue
+                eliminations = {i: cands[i] & union for i in unit
+                                if i not in group and cands[i] & union}
+                if eliminations:
+                    return Hint(f"Naked {SUBSET_NAMES[n]}", None, None, eliminations, group,
+                                f"Naked {SUBSET_NAMES[n].lower()}: {self.cell_list(group)} can "
+                                f"only hold {self.digit_list(union)} between them, so those "
+                                f"digits can be removed from the rest of {self.unit_name(u)}.")
+        return None
+
+    def unit_spots(self):
+        # For each unit, (digit, places as cell bits, place count) for every
+        # digit with two or three places left in it. Shared by the hidden
+        # pair and triple searches, and only rebuilt once candidates change
+        if self.spots_version == self.version:
+            return self.spots
+        size = self.size
+        # places_of[d] has bit i set for every cell i that can still take d
+        places_of = [0] * (size + 1)
+        for i, mask in enumerate(self.cands):
+            cell_bit = 1 << i
+            while mask:
+                low = mask & -mask
+                places_of[low.bit_length()] |= cell_bit
+                mask ^= low
+        self.spots = []
+        for unit_bits in self.unit_bits:
+            spots = []
+            for num in range(1, size + 1):
+                places = places_of[num] & unit_bits
+                if places & (places - 1):
+                    count = bin(places).count("1")
+                    if count <= 3:
+                        spots.append((num, places, count))
+            self.spots.append(spots)
+        self.spots_version = self.version
+        return self.spots
+
+    def hidden_subset(self, n):
+        cands, bit = self.cands, self.geo.bit
+        for u, spots in enumerate(self.unit_spots()):
+            if n < 3:
+                spots = [spot for spot in spots if spot[2] <= n]
+            if len(spots) < n:
+                continue
+            unit = self.geo.units[u]
+            for chosen in combinations(spots, n):
+                where = keep = 0
+                for num, places, _ in chosen:
+                    where |= places
+                    keep |= bit[num]
+                if bin(where).count("1") != n:
+                    continue
+                group = tuple(i for i in unit if where >> i & 1)
+                eliminations = {i: cands[i] & ~keep for i in group if cands[i] & ~keep}
+                if eliminations:
+                    return Hint(f"Hidden {SUBSET_NAMES[n]}", None, None, eliminations, group,
+                                f"Hidden {SUBSET_NAMES[n].lower()}: in {self.unit_name(u)}, "
+                                f"{self.digit_list(keep)} only fit in {self.cell_list(group)}, "
+                                f"so every other candidate can be removed from those cells.")
+        return None
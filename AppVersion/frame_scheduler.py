@@ -0,0 +1,200 @@
+import sys
+import time
+from perf_stats import stats
+
+PAUSE = "pause"
+THROTTLE = "throttle"
+RUN = "run"
+
+
+class Task:
+    def __init__(self, name, callback, interval, priority, when_hidden, when_unfocused,
+                 throttle_factor):
+        self.name = name
+        # A callback may return a number to change its own interval (seconds)
+        self.callback = callback
+        self.interval = interval
+        self.priority = priority
+        self.when_hidden = when_hidden
+        self.when_unfocused = when_unfocused
+        self.throttle_factor = throttle_factor
+        self.enabled = True
+        self.next_due = 0.0
+        self.runs = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+
+class CachedProbe:
+    def __init__(self, probe, ttl):
+        self.probe = probe
+        self.ttl = ttl
+        self.value = None
+        self.expires = 0.0
+
+    def get(self):
+        now = time.monotonic()
+        if now >= self.expires:
+            self.value = self.probe()
+            self.expires = now + self.ttl
+        return self.value
+
+    def invalidate(self):
+        self.expires = 0.0
+
+
+class FrameScheduler:
+    def __init__(self, root, frame_budget_ms=12.0):
+        self.root = root
+        self.frame_budget = frame_budget_ms / 1000.0
+        self.tasks = {}
+        self.visible = True
+        self.focused = True
+        self.after_id = None
+        self.wake_at = None
+        self.focus_listeners = []
+
+        root.bind('<Map>', self._on_map, add='+')
+        root.bind('<Unmap>', self._on_unmap, add='+')
+        root.bind('<FocusIn>', self._on_focus_change, add='+')
+        root.bind('<FocusOut>', self._on_focus_change, add='+')
+
+    def add(self, name, callback, interval, priority=0, when_hidden=PAUSE, when_unfocused=RUN,
+            throttle_factor=4.0, delay=0.0):
+        task = Task(name, callback, interval, priority, when_hidden, when_unfocused, throttle_factor)
+        task.next_due = time.monotonic() + delay
+        self.tasks[name] = task
+        self._reschedule()
+        return task
+
+    def remove(self, name):
+        self.tasks.pop(name, None)
+
+    def has(self, name):
+        return name in self.tasks
+
+    def set_enabled(self, name, enabled, run_now=False):
+        task = self.tasks.get(name)
+        if task is None or task.enabled == enabled:
+            return
+        task.enabled = enabled
+        if enabled:
+            task.next_due = time.monotonic() if run_now else time.monotonic() + task.interval
+            self._reschedule()
+
+    def effective_interval(self, task):
+        # None means the task is suspended in the current window state
+        interval = task.interval
+        for active, policy in ((self.visible, task.when_hidden), (self.focused, task.when_unfocused)):
+            if active:
+                continue
+            if policy == PAUSE:
+                return None
+            if policy == THROTTLE:
+                interval *= task.throttle_factor
+        return interval
+
+    def _reschedule(self):
+        # Only one Tk timer is ever pending: the one for the earliest due task
+        due = None
+        for task in self.tasks.values():
+            if task.enabled and self.effective_interval(task) is not None:
+                if due is None or task.next_due < due:
+                    due = task.next_due
+        if due is None:
+            self._cancel()
+            return
+        if self.after_id is not None and self.wake_at is not None and self.wake_at <= due:
+            return
+        self._cancel()
+        delay_ms = max(1, int((due - time.monotonic()) * 1000))
+        self.wake_at = due
+        self.after_id = self.root.after(delay_ms, self.tick)
+
+    def _cancel(self):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+        self.after_id = None
+        self.wake_at = None
+
+    def tick(self):
+        self.after_id = None
+        self.wake_at = None
+        frame_start = time.monotonic()
+        due = [task for task in self.tasks.values()
+               if task.enabled and task.next_due <= frame_start
+               and self.effective_interval(task) is not None]
+        due.sort(key=lambda task: -task.priority)
+
+        ran = 0
+        for index, task in enumerate(due):
+            # Once the frame budget is spent, lower-priority work waits for
+            # the next tick instead of stretching this one
+            if index and time.monotonic() - frame_start > self.frame_budget:
+                break
+            ran += 1
+            started = time.monotonic()
+            try:
+                result = task.callback()
+            except Exception:
+                # One failing task must not take the shared timer, and with
+                # it every other task, down; it is reported and runs again
+                # at its next interval
+                result = None
+                stats.count("task.error")
+                self.root.report_callback_exception(*sys.exc_info())
+            finally:
+                finished = time.monotonic()
+                duration = finished - started
+                task.runs += 1
+                task.total_time += duration
+                task.max_time = max(task.max_time, duration)
+                if stats.enabled:
+                    stats.record("task." + task.name, duration)
+            if isinstance(result, (int, float)) and not isinstance(result, bool):
+                task.interval = result
+            interval = self.effective_interval(task)
+            task.next_due = finished + (interval if interval is not None else task.interval)
+
+        if stats.enabled:
+            frame_time = time.monotonic() - frame_start
+            stats.record("frame", frame_time)
+            if frame_time > self.frame_budget:
+                stats.count("frame.over_budget")
+            if ran < len(due):
+                stats.count("frame.deferred", len(due) - ran)
+        self._reschedule()
+
+    def _on_map(self, event):
+        if event.widget is self.root and not self.visible:
+            self.visible = True
+            self._resume()
+
+    def _on_unmap(self, event):
+        if event.widget is self.root:
+            self.visible = False
+
+    def _on_focus_change(self, event):
+        # Focus moves between our own widgets too, so ask Tk afterwards
+        # whether the application still has it
+        self.root.after_idle(self._update_focus)
+
+    def _update_focus(self):
+        try:
+            focused = self.root.focus_displayof() is not None
+        except KeyError:
+            focused = True
+        if focused != self.focused:
+            self.focused = focused
+            if focused:
+                for listener in self.focus_listeners:
+                    listener()
+                self._resume()
+
+    def _resume(self):
+        # Work that was suspended runs as soon as the window comes back
+        now = time.monotonic()
+        for task in self.tasks.values():
+            if task.enabled and task.next_due > now + task.interval:
+                task.next_due = now
+        self._reschedule()
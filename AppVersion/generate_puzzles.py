@@ -0,0 +1,106 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+import puzzle_bank
+import sudoku_canonical
+import sudoku_generator
+import sudoku_rater
+import sudoku_solver
+
+
+def puzzle_seed(base_seed, difficulty, index):
+    # String seeding is hashed deterministically, so every puzzle can be
+    # regenerated on its own regardless of worker count or ordering
+    return random.Random(f"{base_seed}:{difficulty}:{index}").getrandbits(64)
+
+
+def generate_job(job):
+    difficulty, seed, symmetry, time_budget, by_score, dedupe = job
+    holes = sudoku_generator.DIFFICULTY_SETTINGS[difficulty]
+    if by_score:
+        band = sudoku_generator.DIFFICULTY_SCORE_BANDS[difficulty]
+        puzzle, solution, rating = sudoku_generator.generate_rated_seeded(band, holes, seed,
+                                                                          symmetry, time_budget)
+    else:
+        puzzle, solution = sudoku_generator.generate_seeded(holes, seed, symmetry, time_budget)
+        rating = sudoku_rater.rate(puzzle)
+    # Banks store the score in tenths
+    key = sudoku_canonical.puzzle_key(puzzle) if dedupe else None
+    return difficulty, puzzle, solution, seed, int(round(rating.score * 10)), key
+
+
+def build_jobs(args):
+    for difficulty in args.difficulty:
+        for index in range(args.count):
+            yield (difficulty, puzzle_seed(args.seed, difficulty, index), args.symmetry,
+                   args.time_budget, args.by_score, args.seen is not None)
+
+
+def unseen(results, seen, skipped):
+    # Drops puzzles equivalent (up to relabelling and grid symmetries) to one
+    # generated earlier in this run or recorded in the seen file
+    for difficulty, puzzle, solution, seed, rating, key in results:
+        if seen is not None and not seen.add(key):
+            skipped[difficulty] = skipped.get(difficulty, 0) + 1
+            continue
+        yield difficulty, puzzle, solution, seed, rating
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate Sudoku puzzles in bulk without a display.")
+    parser.add_argument("-n", "--count", type=int, default=100,
+                        help="puzzles to generate per difficulty")
+    parser.add_argument("-d", "--difficulty", action="append",
+                        choices=list(sudoku_generator.DIFFICULTY_SETTINGS),
+                        help="difficulty to generate (repeatable, default: all)")
+    parser.add_argument("-s", "--seed", type=int, default=0,
+                        help="base seed; the same seed always yields the same puzzles")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--symmetry", choices=sudoku_generator.SYMMETRIES, default="none")
+    parser.add_argument("--time-budget", type=float, default=2.0,
+                        help="seconds allowed for digging holes in one puzzle")
+    parser.add_argument("--by-score", action="store_true",
+                        help="target each difficulty's technique score band instead of only a hole count")
+    parser.add_argument("--bank", help="append to this puzzle bank file instead of writing to stdout")
+    parser.add_argument("--seen", help="seen-set file: skip puzzles equivalent to ones already in it, "
+                                       "and record the new ones")
+    args = parser.parse_args(argv)
+    args.difficulty = args.difficulty or list(sudoku_generator.DIFFICULTY_SETTINGS)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    total = args.count * len(args.difficulty)
+    seen = sudoku_canonical.SeenSet.open(args.seen) if args.seen else None
+    skipped = {}
+    start = time.perf_counter()
+
+    with multiprocessing.Pool(args.workers) as pool:
+        results = unseen(pool.imap(generate_job, build_jobs(args), chunksize=16), seen, skipped)
+        if args.bank:
+            puzzle_bank.append_puzzles(args.bank, results)
+        else:
+            out = sys.stdout
+            for difficulty, puzzle, solution, seed, rating in results:
+                out.write(f"{difficulty}\t{seed}\t{rating / 10:.1f}\t{sudoku_solver.to_string(puzzle)}\t"
+                          f"{sudoku_solver.to_string(solution)}\n")
+            out.flush()
+
+    if seen is not None:
+        seen.save()
+    elapsed = time.perf_counter() - start
+    # Puzzles dropped as already seen were generated but never written
+    written = total - sum(skipped.values())
+    print(f"Generated {written} puzzles in {elapsed:.2f}s ({written / elapsed:.1f} puzzles/sec)",
+          file=sys.stderr)
+    if skipped:
+        print("Skipped already seen: " + ", ".join(f"{name} {count}" for name, count in skipped.items()),
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import argparse
+import collections
+import os
+import struct
+import sys
+import threading
+import time
+import sudoku_solver
+from sudoku_board import BoardModel
+
+# Append-only session log: a header, then records that each start with a
+# type byte. A move is 14 bytes; a game record carries its puzzle and
+# solution so the moves after it can be replayed on their own
+MAGIC = b"SXSMOVE1"
+MOVE_RECORD = struct.Struct("<BdHBBB")   # type, time, cell, digit, player, verdict
+GAME_RECORD = struct.Struct("<BdBB")     # type, time, box, players; then 2 * cells bytes
+MOVE, GAME = 1, 2
+# Sidecar naming the newest game record, so resuming reads from there
+# instead of replaying every game ever logged. It is only a hint: checked
+# against the record it points at, and the whole log is scanned without it
+LAST_MAGIC = b"SXSLAST1"
+LAST_GAME = struct.Struct("<8sQd")       # magic, offset of the game record, its time
+
+# Verdicts: what check_number made of a digit, or why the cell changed
+CORRECT, WRONG, CLEARED, UNDONE = 1, 2, 3, 4
+VERDICT_NAMES = {CORRECT: "correct", WRONG: "wrong", CLEARED: "cleared", UNDONE: "undone"}
+
+Move = collections.namedtuple("Move", "time cell digit player verdict")
+Game = collections.namedtuple("Game", "time box players puzzle solution")
+
+
+class MoveLog:
+    # Records are packed on the caller's thread (a struct pack and a list
+    # append under a lock) and written in batches by a worker thread, so the
+    # UI never waits on the disk
+    def __init__(self, path, flush_interval=1.0, batch_size=256):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.pending = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.thread = None
+        self.failed = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="move-log", daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.wake_event.wait(self.flush_interval)
+            self.wake_event.clear()
+            self.flush()
+        self.flush()
+
+    def _append(self, record):
+        with self.lock:
+            self.pending.append(record)
+            full = len(self.pending) >= self.batch_size
+        if full:
+            self.wake_event.set()
+
+    def game(self, puzzle, solution, players=1, timestamp=None):
+        box = sudoku_solver.box_of_grid(puzzle)
+        self._append(GAME_RECORD.pack(GAME, timestamp or time.time(), box, players) +
+                     bytes(v for row in puzzle for v in row) +
+                     bytes(v for row in solution for v in row))
+
+    def move(self, cell, digit, player, verdict, timestamp=None):
+        self._append(MOVE_RECORD.pack(MOVE, timestamp or time.time(), cell, digit, player, verdict))
+
+    def flush(self):
+        with self.lock:
+            records, self.pending = self.pending, []
+        if not records:
+            return True
+        last = None
+        try:
+            with open(self.path, "ab") as f:
+                if f.tell() == 0:
+                    f.write(MAGIC)
+                offset = f.tell()
+                for record in records:
+                    if record[0] == GAME:
+                        last = offset, GAME_RECORD.unpack_from(record)[1]
+                    offset += len(record)
+                f.write(b"".join(records))
+        except OSError as e:
+            # Logging is never worth interrupting a game for
+            self.failed = e
+            return False
+        if last is not None:
+            write_last_game(self.path, *last)
+        return True
+
+    def close(self, timeout=2.0):
+        self.stop_event.set()
+        self.wake_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        else:
+            self.flush()
+
+
+def last_game_path(path):
+    return path + ".last"
+
+
+def write_last_game(path, offset, stamp):
+    tmp_path = last_game_path(path) + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(LAST_GAME.pack(LAST_MAGIC, offset, stamp))
+        os.replace(tmp_path, last_game_path(path))
+    except OSError:
+        pass
+
+
+def last_game_offset(path):
+    # Offset of the newest game record, or None when the sidecar is missing
+    # or does not match the log (replaced, truncated, written by a crash)
+    try:
+        with open(last_game_path(path), "rb") as f:
+            magic, offset, stamp = LAST_GAME.unpack(f.read(LAST_GAME.size))
+        with open(path, "rb") as f:
+            f.seek(offset)
+            head = f.read(GAME_RECORD.size)
+    except (OSError, struct.error):
+        return None
+    if magic != LAST_MAGIC or offset < len(MAGIC) or len(head) < GAME_RECORD.size:
+        return None
+    kind, recorded, _, _ = GAME_RECORD.unpack(head)
+    if kind != GAME or recorded != stamp:
+        return None
+    return offset
+
+
+def read_log(path, start=None):
+    # Yields Game and Move records in order, from the record at offset start
+    # if given; a record cut short by a crash mid-write ends the log instead
+    # of raising
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a move log")
+        if start is not None:
+            f.seek(start)
+        data = f.read()
+    offset = 0
+    while offset < len(data):
+        kind = data[offset]
+        if kind == MOVE:
+            if offset + MOVE_RECORD.size > len(data):
+                return
+            _, stamp, cell, digit, player, verdict = MOVE_RECORD.unpack_from(data, offset)
+            offset += MOVE_RECORD.size
+            yield Move(stamp, cell, digit, player, verdict)
+        elif kind == GAME:
+            if offset + GAME_RECORD.size > len(data):
+                return
+            _, stamp, box, players = GAME_RECORD.unpack_from(data, offset)
+            cells = box ** 4
+            start = offset + GAME_RECORD.size
+            if start + 2 * cells > len(data):
+                return
+            size = box * box
+            puzzle = [list(data[start + r * size:start + r * size + size]) for r in range(size)]
+            start += cells
+            solution = [list(data[start + r * size:start + r * size + size]) for r in range(size)]
+            offset = start + cells
+            yield Game(stamp, box, players, puzzle, solution)
+        else:
+            return
+
+
+def replay(records):
+    # Yields (game, board, moves) for every game in the log, with the board
+    # as the moves left it; the last one is the session to restore
+    game, board, moves = None, None, []
+    for record in records:
+        if isinstance(record, Game):
+            if game is not None:
+                yield game, board, moves
+            game, board, moves = record, BoardModel(record.puzzle), []
+        elif game is not None:
+            # Every record carries the digit the cell holds afterwards: the
+            # one played, the one an undo brought back, or 0 once cleared
+            row, col = divmod(record.cell, board.size)
+            board.set(row, col, record.digit)
+            moves.append(record)
+    if game is not None:
+        yield game, board, moves
+
+
+def last_game(path):
+    # (game, board, moves) of the most recent game, or None. Only the records
+    # from the newest game on are read when the sidecar knows where it starts
+    latest = None
+    try:
+        for latest in replay(read_log(path, last_game_offset(path))):
+            pass
+    except (OSError, ValueError):
+        return None
+    return latest
+
+
+def summarize(game, board, moves):
+    mistakes = collections.Counter(m.player for m in moves if m.verdict == WRONG)
+    elapsed = moves[-1].time - game.time if moves else 0.0
+    return {"started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(game.time)),
+            "size": game.box * game.box,
+            "players": game.players,
+            "moves": len(moves),
+            "mistakes": {player: mistakes[player] for player in range(1, game.players + 1)},
+            "seconds": round(elapsed, 1),
+            "solved": board.is_complete()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a move log and summarise each game.")
+    parser.add_argument("path", nargs="?", default=os.path.expanduser("~/.sudoku_moves"))
+    args = parser.parse_args(argv)
+    try:
+        games = list(replay(read_log(args.path)))
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    for game, board, moves in games:
+        print(summarize(game, board, moves))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
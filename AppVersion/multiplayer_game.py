@@ -0,0 +1,104 @@
+import collections
+import json
+import sudoku_solver
+
+# Longest line either side accepts; a join or move is well under 200 bytes
+# and a game message for a 25x25 board about 700
+MAX_LINE = 4096
+
+# The result of one accepted move, as broadcast to the room. mistakes is the
+# count per seat after the move, turn the seat to move next; winner is the
+# winning seat (None if nobody won) and over says whether the game ended
+Verdict = collections.namedtuple("Verdict", "seat cell value correct mistakes turn winner over")
+
+
+class MultiplayerGame:
+    # The hot-seat rules of SudokuGame.check_number, kept server-side: a
+    # correct digit passes the turn, a wrong one costs the mover a mistake
+    # and also passes the turn, and reaching max_mistakes loses the game to
+    # the other player. A filled board ends the game with no winner
+    def __init__(self, puzzle, solution, max_mistakes=3, seats=2):
+        self.size = len(puzzle)
+        self.cells = bytearray(v for row in puzzle for v in row)
+        self.solution = bytes(v for row in solution for v in row)
+        self.remaining = self.cells.count(0)
+        self.max_mistakes = max_mistakes
+        self.seats = seats
+        self.mistakes = [0] * seats
+        self.turn = 1
+        self.winner = None
+        self.over = False
+
+    def check(self, seat, cell, value):
+        # Reason the move is refused, or None when it may be played
+        if self.over:
+            return "game over"
+        if seat != self.turn:
+            return "not your turn"
+        if self.mistakes[seat - 1] >= self.max_mistakes:
+            return "out of mistakes"
+        if type(cell) is not int or not 0 <= cell < len(self.cells):
+            return "bad cell"
+        if type(value) is not int or not 1 <= value <= self.size:
+            return "bad value"
+        if self.cells[cell]:
+            return "cell filled"
+        return None
+
+    def play(self, seat, cell, value):
+        # Only call with a move check() accepted
+        correct = self.solution[cell] == value
+        if correct:
+            self.cells[cell] = value
+            self.remaining -= 1
+            if not self.remaining:
+                self.over = True
+        else:
+            self.mistakes[seat - 1] += 1
+            if self.mistakes[seat - 1] >= self.max_mistakes:
+                self.over = True
+                if self.seats > 1:
+                    self.winner = seat % self.seats + 1
+        if not self.over:
+            self.turn = self.turn % self.seats + 1
+        return Verdict(seat, cell, value, correct, list(self.mistakes), self.turn,
+                       self.winner, self.over)
+
+    def board_string(self):
+        # Givens plus every correct move so far, for players joining mid-game
+        empty = "0" if self.size <= 9 else "."
+        symbols = sudoku_solver.SYMBOLS[self.size]
+        return "".join(symbols[v - 1] if v else empty for v in self.cells)
+
+
+def game_message(game, box):
+    return {"t": "game", "box": box, "board": game.board_string(), "turn": game.turn,
+            "mistakes": game.mistakes, "max": game.max_mistakes, "seats": game.seats}
+
+
+def verdict_message(verdict, move_id=None):
+    # Only the fields a client needs to update one cell and the scores; the
+    # board itself is never resent during a game
+    message = {"t": "move", "seat": verdict.seat, "cell": verdict.cell, "value": verdict.value,
+               "ok": verdict.correct, "mistakes": verdict.mistakes, "turn": verdict.turn}
+    if move_id is not None:
+        message["id"] = move_id
+    if verdict.over:
+        message["over"] = True
+        message["winner"] = verdict.winner
+    return message
+
+
+def encode(message):
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode()
+
+
+def decode(line):
+    # None for anything that is not a JSON object with a string "t"
+    try:
+        message = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(message, dict) or not isinstance(message.get("t"), str):
+        return None
+    return message
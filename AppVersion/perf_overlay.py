@@ -0,0 +1,59 @@
+import tkinter as tk
+
+
+class PerfOverlay:
+    def __init__(self, root, stats, rows=12, font=('Courier', 9)):
+        self.root = root
+        self.stats = stats
+        self.rows = rows
+        self.label = tk.Label(root, justify='left', anchor='nw', font=font,
+                              bg='#000000', fg='#00FF66', padx=6, pady=4)
+        self.visible = False
+        self.last_text = None
+        # Whether collection was on before show() switched it on
+        self.was_enabled = None
+
+    def toggle(self):
+        if self.visible:
+            self.hide()
+        else:
+            self.show()
+        return self.visible
+
+    def show(self):
+        # Collection is only switched on while someone is looking, unless it
+        # was enabled for the whole session from the environment
+        if not self.visible:
+            self.was_enabled = self.stats.enabled
+        self.stats.enabled = True
+        self.visible = True
+        self.label.place(relx=1.0, y=0, anchor='ne')
+        self.label.lift()
+        self.refresh()
+
+    def hide(self):
+        if self.visible and self.was_enabled is not None:
+            self.stats.enabled = self.was_enabled
+        self.visible = False
+        self.label.place_forget()
+
+    def format(self, snapshot):
+        timers = sorted(snapshot["timers"].items(),
+                        key=lambda item: item[1]["mean_ms"] * item[1]["count"], reverse=True)
+        lines = [f"{'timer':<22}{'n':>6}{'p50':>8}{'p99':>8}{'max':>8}"]
+        for name, summary in timers[:self.rows]:
+            lines.append(f"{name[:21]:<22}{summary['count']:>6}{summary['p50_ms']:>8.2f}"
+                         f"{summary['p99_ms']:>8.2f}{summary['max_ms']:>8.2f}")
+        counters = snapshot["counters"]
+        if counters:
+            lines.append("")
+            lines.extend(f"{name[:21]:<22}{value:>6}" for name, value in sorted(counters.items()))
+        return "\n".join(lines)
+
+    def refresh(self):
+        if not self.visible:
+            return
+        text = self.format(self.stats.snapshot())
+        if text != self.last_text:
+            self.last_text = text
+            self.label.config(text=text)
@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+import time
+
+# Histogram buckets are powers of two in microseconds: bucket k holds
+# durations below 2**k us, so 40 buckets reach far past any sane timing
+BUCKETS = 40
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.buckets[min(BUCKETS - 1, int(seconds * 1e6).bit_length())] += 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the requested rank, clamped to
+        # the largest value actually seen
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for k, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(self.max, (1 << k) / 1e6)
+        return self.max
+
+    def summary(self):
+        ms = 1000.0
+        return {"count": self.count,
+                "mean_ms": round(self.total / self.count * ms, 3) if self.count else 0.0,
+                "min_ms": round((self.min or 0.0) * ms, 3),
+                "p50_ms": round(self.percentile(0.5) * ms, 3),
+                "p90_ms": round(self.percentile(0.9) * ms, 3),
+                "p99_ms": round(self.percentile(0.99) * ms, 3),
+                "max_ms": round(self.max * ms, 3)}
+
+
+class Timer:
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class PerfStats:
+    def __init__(self, enabled=False):
+        # Callers check enabled (or go through timer()) before doing any
+        # work, so a disabled instance costs one attribute read per call site
+        self.enabled = enabled
+        self.timers = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def timer(self, name):
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self, name)
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.timers.get(name)
+            if histogram is None:
+                histogram = self.timers[name] = Histogram()
+            histogram.add(seconds)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self):
+        with self.lock:
+            self.timers = {}
+            self.counters = {}
+            self.started = time.time()
+
+    def snapshot(self):
+        with self.lock:
+            return {"time": round(time.time(), 3),
+                    "uptime_s": round(time.time() - self.started, 3),
+                    "counters": dict(self.counters),
+                    "timers": {name: histogram.summary()
+                               for name, histogram in sorted(self.timers.items())}}
+
+    def export(self, path):
+        # One JSON object per line, so a session log can be appended to and
+        # read back with any line-oriented tool
+        try:
+            with open(path, "a") as f:
+                f.write(json.dumps(self.snapshot()) + "\n")
+        except OSError:
+            return False
+        return True
+
+
+# Shared by every module in the process; SUDOKU_PERF=1 turns it on at startup
+stats = PerfStats(enabled=os.environ.get("SUDOKU_PERF", "") not in ("", "0"))
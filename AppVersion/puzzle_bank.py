@@ -0,0 +1,162 @@
+import mmap
+import os
+import random
+import struct
+from array import array
+import sudoku_generator
+
+DIFFICULTIES = tuple(sudoku_generator.DIFFICULTY_SETTINGS)
+
+MAGIC = b"SXSBANK1"
+INDEX_MAGIC = b"SXSIDX01"
+HEADER = struct.Struct("<8sHH4x")
+# difficulty level, rating, seed, puzzle and solution as 81 packed nibbles
+RECORD = struct.Struct("<BHQ41s41s")
+INDEX_HEADER = struct.Struct("<8sI")
+
+
+def pack_grid(grid):
+    flat = [v for row in grid for v in row] + [0]
+    return bytes((flat[k] << 4) | flat[k + 1] for k in range(0, 82, 2))
+
+
+def unpack_grid(data):
+    flat = []
+    for byte in data:
+        flat.append(byte >> 4)
+        flat.append(byte & 0xF)
+    return [flat[r * 9:r * 9 + 9] for r in range(9)]
+
+
+def index_path(path):
+    return path + ".idx"
+
+
+def read_index(path):
+    levels = [array("I") for _ in DIFFICULTIES]
+    try:
+        with open(index_path(path), "rb") as f:
+            magic, level_count = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+            if magic != INDEX_MAGIC:
+                raise ValueError(f"{index_path(path)} is not a puzzle bank index")
+            counts = array("I")
+            counts.frombytes(f.read(4 * level_count))
+            for level, count in enumerate(counts):
+                levels[level].frombytes(f.read(4 * count))
+    except FileNotFoundError:
+        pass
+    return levels
+
+
+def write_index(path, levels):
+    tmp_path = index_path(path) + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, len(levels)))
+        f.write(array("I", [len(records) for records in levels]).tobytes())
+        for records in levels:
+            f.write(records.tobytes())
+    os.replace(tmp_path, index_path(path))
+
+
+def append_puzzles(path, entries):
+    # entries: iterable of (difficulty, puzzle, solution, seed[, rating])
+    levels = read_index(path)
+    with open(path, "ab") as f:
+        if f.tell() == 0:
+            f.write(HEADER.pack(MAGIC, 1, RECORD.size))
+        record_number = (f.tell() - HEADER.size) // RECORD.size
+        # Records only enter the index once their chunk is on disk, and the
+        # index is written however the entries end, so an exception part way
+        # through a long run keeps every record already written visible
+        written = f.tell()
+        chunk, numbers = [], []
+        try:
+            for entry in entries:
+                difficulty, puzzle, solution, seed = entry[:4]
+                rating = entry[4] if len(entry) > 4 else 0
+                level = DIFFICULTIES.index(difficulty)
+                chunk.append(RECORD.pack(level, rating, seed, pack_grid(puzzle), pack_grid(solution)))
+                numbers.append((level, record_number))
+                record_number += 1
+                if len(chunk) >= 4096:
+                    written = flush_chunk(f, chunk, numbers, levels)
+            written = flush_chunk(f, chunk, numbers, levels)
+        except BaseException:
+            # Drop a chunk that was only partly written
+            f.truncate(written)
+            raise
+        finally:
+            write_index(path, levels)
+    return record_number
+
+
+def flush_chunk(f, chunk, numbers, levels):
+    # Writes the chunk, indexes its records and empties both lists; returns
+    # the file size with the chunk in it
+    f.write(b"".join(chunk))
+    f.flush()
+    for level, number in numbers:
+        levels[level].append(number)
+    del chunk[:], numbers[:]
+    return f.tell()
+
+
+class PuzzleBank:
+    def __init__(self, path):
+        self.path = path
+        self.data_file = open(path, "rb")
+        self.index_file = open(index_path(path), "rb")
+        self.data = mmap.mmap(self.data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.index = mmap.mmap(self.index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, _, record_size = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or record_size != RECORD.size:
+            self.close()
+            raise ValueError(f"{path} is not a puzzle bank")
+        magic, level_count = INDEX_HEADER.unpack_from(self.index, 0)
+        if magic != INDEX_MAGIC:
+            self.close()
+            raise ValueError(f"{index_path(path)} is not a puzzle bank index")
+
+        # Offset of each difficulty's block of record numbers in the index
+        counts = struct.unpack_from(f"<{level_count}I", self.index, INDEX_HEADER.size)
+        offset = INDEX_HEADER.size + 4 * level_count
+        self.counts = {}
+        self.offsets = {}
+        for level, count in enumerate(counts[:len(DIFFICULTIES)]):
+            self.counts[DIFFICULTIES[level]] = count
+            self.offsets[DIFFICULTIES[level]] = offset
+            offset += 4 * count
+
+    @classmethod
+    def open(cls, path):
+        try:
+            return cls(path)
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def __len__(self):
+        return (len(self.data) - HEADER.size) // RECORD.size
+
+    def count(self, difficulty):
+        return self.counts.get(difficulty, 0)
+
+    def record(self, number):
+        level, rating, seed, puzzle, solution = RECORD.unpack_from(
+            self.data, HEADER.size + number * RECORD.size)
+        return DIFFICULTIES[level], unpack_grid(puzzle), unpack_grid(solution), seed, rating
+
+    def draw(self, difficulty, rng=None):
+        count = self.count(difficulty)
+        if not count:
+            return None
+        k = (rng or random).randrange(count)
+        number, = struct.unpack_from("<I", self.index, self.offsets[difficulty] + 4 * k)
+        _, puzzle, solution, _, _ = self.record(number)
+        return puzzle, solution
+
+    def close(self):
+        for handle in (getattr(self, "data", None), getattr(self, "index", None),
+                       self.data_file, getattr(self, "index_file", None)):
+            if handle is not None:
+                handle.close()
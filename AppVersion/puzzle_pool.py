@@ -0,0 +1,150 @@
+import collections
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import sudoku_canonical
+import sudoku_generator
+from perf_stats import stats
+
+# Consecutive failed jobs after which a difficulty stops being refilled in
+# the background; get() still generates it on the caller's thread
+MAX_FAILURES = 3
+
+
+def keyed_job(func, *args):
+    # Runs in the worker so canonicalising never costs the UI process
+    puzzle, solution = func(*args)[:2]
+    # Canonical keys are only defined for 9x9 boards
+    key = sudoku_canonical.puzzle_key(puzzle) if len(puzzle) == 9 else None
+    return puzzle, solution, key
+
+
+class PuzzlePool:
+    def __init__(self, difficulty_settings, target_size=3, workers=None,
+                 symmetry="none", time_budget=2.0, score_bands=None, seen=None, box=3,
+                 sync_time_budget=None):
+        self.difficulty_settings = difficulty_settings
+        self.box = box
+        # Optional SeenSet; puzzles already in it are dropped, served ones added
+        self.seen = seen
+        self.score_bands = score_bands
+        self.target_size = target_size
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.symmetry = symmetry
+        self.time_budget = time_budget
+        # Budget when get() has to generate on the caller's thread
+        self.sync_time_budget = time_budget if sync_time_budget is None else sync_time_budget
+
+        self.queues = {name: collections.deque() for name in difficulty_settings}
+        self.pending = {name: 0 for name in difficulty_settings}
+        self.failures = {name: 0 for name in difficulty_settings}
+        self.current = next(iter(difficulty_settings))
+        self.lock = threading.RLock()
+        self.executor = None
+        self.closed = False
+
+    def start(self):
+        try:
+            # Spawned workers never inherit the Tk interpreter of the parent
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                mp_context=multiprocessing.get_context("spawn"))
+        except (OSError, NotImplementedError):
+            self.executor = None
+        self.refill()
+
+    def set_current(self, difficulty):
+        self.current = difficulty
+        self.refill()
+
+    def refill(self):
+        with self.lock:
+            if self.executor is None or self.closed:
+                return
+            # Only keep as many jobs in flight as there are workers so a free
+            # worker always picks up the selected difficulty first
+            in_flight = sum(self.pending.values())
+            order = [self.current] + [name for name in self.queues if name != self.current]
+            for name in order:
+                while (in_flight < self.workers and self.failures[name] < MAX_FAILURES and
+                       len(self.queues[name]) + self.pending[name] < self.target_size):
+                    try:
+                        future = self.executor.submit(keyed_job, *self._job(name, random.getrandbits(64)))
+                    except RuntimeError:
+                        return
+                    self.pending[name] += 1
+                    in_flight += 1
+                    future.add_done_callback(
+                        lambda f, n=name, t=time.perf_counter(): self._on_done(n, f, t))
+
+    def _job(self, name, seed, time_budget=None):
+        holes = sudoku_generator.holes_for(self.difficulty_settings[name], self.box)
+        time_budget = self.time_budget if time_budget is None else time_budget
+        if self.box != 3:
+            # The technique rater only knows 9x9 boards
+            return (sudoku_generator.generate_seeded, holes, seed, self.symmetry, time_budget,
+                    self.box)
+        if self.score_bands:
+            return (sudoku_generator.generate_rated_seeded, self.score_bands[name], holes,
+                    seed, self.symmetry, time_budget)
+        return sudoku_generator.generate_seeded, holes, seed, self.symmetry, time_budget
+
+    def _on_done(self, name, future, submitted):
+        # Submit-to-result latency, including time spent queued in the pool
+        stats.record("pool.job", time.perf_counter() - submitted)
+        with self.lock:
+            self.pending[name] -= 1
+            error = None if future.cancelled() else future.exception()
+            if error is not None:
+                # Reported rather than raised; the slot is refilled below
+                # unless the difficulty keeps failing, so a job that can
+                # never succeed is not resubmitted forever
+                stats.count("pool.error")
+                self.failures[name] += 1
+                if self.failures[name] == MAX_FAILURES:
+                    print(f"Puzzle generation failed {MAX_FAILURES} times in a row for {name}, "
+                          f"no longer generating it in the background: {error!r}",
+                          file=sys.stderr)
+                elif self.failures[name] < MAX_FAILURES:
+                    print(f"Puzzle generation failed: {error!r}", file=sys.stderr)
+            elif not future.cancelled():
+                self.failures[name] = 0
+                entry = future.result()
+                if self.seen is not None and entry[2] is not None and entry[2] in self.seen:
+                    stats.count("pool.duplicate")
+                else:
+                    self.queues[name].append(entry)
+        self.refill()
+
+    def get(self, difficulty):
+        self.current = difficulty
+        entry = None
+        while entry is None:
+            try:
+                entry = self.queues[difficulty].popleft()
+                stats.count("pool.hit")
+            except IndexError:
+                stats.count("pool.miss")
+                with stats.timer("pool.generate_sync"):
+                    entry = keyed_job(*self._job(difficulty, random.getrandbits(64),
+                                                 self.sync_time_budget))
+            # Queued puzzles were checked on arrival, but may since have been
+            # served by another path (a bank draw, say)
+            if self.seen is not None and entry[2] is not None and not self.seen.add(entry[2]):
+                stats.count("pool.duplicate")
+                entry = None
+        self.refill()
+        return entry[:2]
+
+    def ready(self, difficulty):
+        return len(self.queues[difficulty])
+
+    def shutdown(self):
+        with self.lock:
+            self.closed = True
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
@@ -0,0 +1,249 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+import sudoku_generator
+import sudoku_solver
+from benchmarks import summarize
+from multiplayer_game import MAX_LINE, decode, encode
+from sudoku_server import raise_open_file_limit
+
+# Opening thousands of sockets at once overruns the listen backlog
+CONNECT_CONCURRENCY = 200
+
+
+class SimulatedPlayer:
+    # Plays as soon as it is its turn: a random empty cell, usually with the
+    # right digit (solved locally from the dealt board), sometimes a wrong one
+    def __init__(self, room, difficulty, rng, error_rate):
+        self.room = room
+        self.difficulty = difficulty
+        self.rng = rng
+        self.error_rate = error_rate
+        self.seat = None
+        self.full = False
+        self.turn = None
+        self.cells = None
+        self.solution = None
+        self.size = 9
+        self.next_id = 0
+        self.pending = None
+        self.latencies = []
+        self.games = 0
+        self.refused = 0
+
+    async def connect(self, host, port, gate):
+        async with gate:
+            self.reader, self.writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+
+    async def play(self, deadline):
+        self.writer.write(encode({"t": "join", "room": self.room, "difficulty": self.difficulty}))
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    line = await asyncio.wait_for(self.reader.readline(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if not line:
+                    break
+                message = decode(line)
+                if message is not None:
+                    self.handle(message)
+                    self.maybe_move()
+        finally:
+            self.writer.close()
+
+    def handle(self, message):
+        kind = message["t"]
+        if kind == "joined":
+            self.seat = message["seat"]
+        elif kind == "players":
+            self.full = len(message["seated"]) == 2
+        elif kind == "game":
+            grid = sudoku_solver.from_string(message["board"])
+            self.size = len(grid)
+            self.cells = bytearray(v for row in grid for v in row)
+            solved = sudoku_solver.solve(grid)
+            self.solution = [v for row in solved for v in row] if solved else None
+            self.turn = message["turn"]
+            self.games += 1
+        elif kind == "move":
+            if message["ok"]:
+                self.cells[message["cell"]] = message["value"]
+            self.turn = message["turn"]
+            if message["seat"] == self.seat and message.get("id") == self.pending_id():
+                self.latencies.append(time.perf_counter() - self.pending[1])
+                self.pending = None
+            if message.get("over"):
+                self.solution = None
+        elif kind == "error":
+            if self.pending is not None and message.get("id") == self.pending[0]:
+                self.refused += 1
+                self.pending = None
+
+    def pending_id(self):
+        return self.pending[0] if self.pending is not None else None
+
+    def maybe_move(self):
+        if (self.solution is None or not self.full or self.turn != self.seat or
+                self.pending is not None):
+            return
+        empty = [i for i, v in enumerate(self.cells) if not v]
+        if not empty:
+            return
+        cell = self.rng.choice(empty)
+        value = self.solution[cell]
+        if self.rng.random() < self.error_rate:
+            value = value % self.size + 1
+        self.next_id += 1
+        self.pending = (self.next_id, time.perf_counter())
+        self.writer.write(encode({"t": "move", "id": self.next_id, "cell": cell, "value": value}))
+
+
+async def run_players(host, port, rooms, first_room, duration, difficulty, error_rate, seed):
+    rng = random.Random(seed)
+    players = [SimulatedPlayer(f"load-{seed}-{first_room + k // 2}", difficulty,
+                               random.Random(rng.getrandbits(64)), error_rate)
+               for k in range(2 * rooms)]
+    gate = asyncio.Semaphore(CONNECT_CONCURRENCY)
+    await asyncio.gather(*(player.connect(host, port, gate) for player in players))
+    # The clock starts once every socket is open, so connection setup does
+    # not count against the move rate
+    started = time.perf_counter()
+    deadline = asyncio.get_running_loop().time() + duration
+    await asyncio.gather(*(player.play(deadline) for player in players))
+    elapsed = time.perf_counter() - started
+    return {"elapsed": elapsed,
+            "latencies": [t for player in players for t in player.latencies],
+            "games": sum(player.games for player in players),
+            "refused": sum(player.refused for player in players)}
+
+
+def run_share(host, port, rooms, first_room, duration, difficulty, error_rate, seed):
+    # One client process; module level so spawned workers can import it
+    raise_open_file_limit()
+    return asyncio.run(run_players(host, port, rooms, first_room, duration, difficulty,
+                                   error_rate, seed))
+
+
+def start_server(bank=None):
+    # Runs the server in its own process so clients and server do not share
+    # a CPU; returns the process and the port it picked
+    server = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sudoku_server.py")
+    command = [sys.executable, server, "--port", "0", "--perf"]
+    if bank:
+        command += ["--bank", bank]
+    process = subprocess.Popen(command, stderr=subprocess.PIPE, text=True,
+                               cwd=os.path.dirname(server))
+    for line in process.stderr:
+        match = re.search(r"Listening on .*:(\d+)", line)
+        if match:
+            return process, int(match.group(1))
+    process.wait()
+    raise RuntimeError(f"server exited with status {process.returncode}")
+
+
+async def query_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port, limit=1 << 20)
+    writer.write(encode({"t": "stats"}))
+    reply = decode(await reader.readline())
+    writer.close()
+    return reply
+
+
+def run(rooms=500, duration=10.0, host="127.0.0.1", port=None, procs=1, difficulty="Easy",
+        error_rate=0.05, seed=0, bank=None):
+    process = None
+    if port is None:
+        process, port = start_server(bank)
+    try:
+        shares = [rooms // procs + (1 if k < rooms % procs else 0) for k in range(procs)]
+        firsts = [sum(shares[:k]) for k in range(procs)]
+        jobs = [(host, port, share, first, duration, difficulty, error_rate, seed + k)
+                for k, (share, first) in enumerate(zip(shares, firsts)) if share]
+        if len(jobs) == 1:
+            outcomes = [run_share(*jobs[0])]
+        else:
+            with multiprocessing.get_context("spawn").Pool(len(jobs)) as pool:
+                outcomes = pool.starmap(run_share, jobs)
+        server_stats = asyncio.run(query_stats(host, port))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    latencies = [t for outcome in outcomes for t in outcome["latencies"]]
+    results = {"server": {
+        "rooms": rooms,
+        "players": 2 * rooms,
+        # Each client process measured its own window; their rates add up
+        "moves_per_sec": round(sum(len(outcome["latencies"]) / outcome["elapsed"]
+                                   for outcome in outcomes), 1),
+        "moves": len(latencies),
+        "games": sum(outcome["games"] for outcome in outcomes),
+        "refused": sum(outcome["refused"] for outcome in outcomes)}}
+    if latencies:
+        # Send to verdict received, as the moving client sees it
+        results["server.move_latency"] = summarize(latencies)
+    handling = ((server_stats or {}).get("perf") or {}).get("timers", {}).get("server.move")
+    if handling:
+        # Time the server spent handling a move, from its own histogram
+        results["server.move_handling"] = handling
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the multiplayer server with simulated "
+                                                 "players on loopback.")
+    parser.add_argument("-r", "--rooms", type=int, default=500, help="rooms, two players each")
+    parser.add_argument("-t", "--duration", type=float, default=10.0, help="seconds of play")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("-p", "--port", type=int,
+                        help="existing server to test (default: start one on a free port)")
+    parser.add_argument("--procs", type=int, default=1, help="client processes")
+    parser.add_argument("-d", "--difficulty", choices=list(sudoku_generator.DIFFICULTY_SETTINGS),
+                        default="Easy")
+    parser.add_argument("--error-rate", type=float, default=0.05,
+                        help="share of moves deliberately wrong")
+    parser.add_argument("--bank", help="puzzle bank for a server started here")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    raise_open_file_limit()
+    results = run(args.rooms, args.duration, args.host, args.port, args.procs, args.difficulty,
+                  args.error_rate, args.seed, args.bank)
+    report = {"meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "python": platform.python_version(),
+                       "platform": platform.platform(),
+                       "args": {key: value for key, value in vars(args).items() if key != "output"}},
+              "results": results}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    server = results["server"]
+    latency = results.get("server.move_latency", {})
+    print(f"{server['moves_per_sec']} moves/sec over {server['rooms']} rooms, "
+          f"p99 move latency {latency.get('p99_ms', 0.0):.2f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import math
+import random
+
+# A handful of unrelated solved grids. Every transform below maps a valid
+# grid to a valid grid, and each seed has about 1.2e12 distinct images, so
+# a new solution costs one pass over 81 cells instead of a search
+SEED_GRIDS = (
+    "872593146346821597195746823428937615659418372713265489231689754584372961967154238",
+    "639251748458367219172948536913574682527683194864192357791425863245836971386719425",
+    "491827563723569184586134279852941637367285941914376852275613498149758326638492715",
+    "214879356673125849589436217362954781497281635851367924748612593126593478935748162",
+    "293681745578234619416975823145327968637849251982516374821463597769158432354792186",
+    "365897241784215639192634578937458162546129387821763495418576923279341856653982714",
+    "658492731974613582132875694581734926396251478247986315419527863863149257725368149",
+    "254367198376189425189542673492736581617895342835214769563428917921673854748951236",
+)
+
+SEED_CELLS = [[int(ch) for ch in grid] for grid in SEED_GRIDS]
+
+ROTATIONS = {}
+
+
+def rotations(size):
+    # rotations(size)[k][i] is the cell that lands on cell i after k quarter
+    # turns clockwise
+    maps = ROTATIONS.get(size)
+    if maps is None:
+        cells = size * size
+        maps = [list(range(cells))]
+        for _ in range(3):
+            previous = maps[-1]
+            maps.append([previous[(size - 1 - i % size) * size + i // size] for i in range(cells)])
+        ROTATIONS[size] = maps
+    return maps
+
+
+def pattern_cells(box):
+    # The textbook valid grid: each row is the one above shifted by a box
+    # width, and each band shifted by one more
+    size = box * box
+    return [(box * (r % box) + r // box + c) % size + 1 for r in range(size) for c in range(size)]
+
+
+def line_order(rng, box=3):
+    # Shuffles the bands (or stacks) and the lines inside each
+    groups = list(range(box))
+    rng.shuffle(groups)
+    order = []
+    for group in groups:
+        lines = list(range(box * group, box * group + box))
+        rng.shuffle(lines)
+        order.extend(lines)
+    return order
+
+
+def permute_grid(cells, rng, transpose=None, rotation=None):
+    # cells is a flat solved grid; digits are relabelled, rows and columns
+    # permuted within bands and stacks, bands and stacks permuted, then the
+    # grid is optionally transposed and rotated
+    count = len(cells)
+    size = math.isqrt(count)
+    box = math.isqrt(size)
+    labels = list(range(1, size + 1))
+    rng.shuffle(labels)
+    labels.insert(0, 0)
+    rows = line_order(rng, box)
+    cols = line_order(rng, box)
+    if transpose is None:
+        transpose = rng.random() < 0.5
+    if rotation is None:
+        rotation = rng.randrange(4)
+
+    if transpose:
+        source = [cols[i % size] * size + rows[i // size] for i in range(count)]
+    else:
+        source = [rows[i // size] * size + cols[i % size] for i in range(count)]
+    turn = rotations(size)[rotation]
+    return [labels[cells[source[turn[i]]]] for i in range(count)]
+
+
+def random_grid(rng=None, seeds=None, box=3):
+    # Other sizes start from the pattern grid; relabelling and line swaps
+    # alone already reach more grids than could ever be played
+    rng = rng or random.Random()
+    if box == 3:
+        seeds = seeds or SEED_CELLS
+        base = seeds[rng.randrange(len(seeds))]
+    else:
+        base = pattern_cells(box)
+    cells = permute_grid(base, rng)
+    size = box * box
+    return [cells[r * size:r * size + size] for r in range(size)]
+
+
+def random_grid_seeded(seed, box=3):
+    return random_grid(random.Random(seed), box=box)
+
+
+def permute_puzzle(puzzle, solution, rng=None):
+    # The same random transform applied to a puzzle and its solution; empty
+    # cells stay empty and a unique puzzle stays unique, so one generated
+    # puzzle can be dealt many times without players recognising it
+    rng = rng or random.Random()
+    seed = rng.getrandbits(64)
+    size = len(puzzle)
+    grids = []
+    for grid in (puzzle, solution):
+        cells = permute_grid([v for row in grid for v in row], random.Random(seed))
+        grids.append([cells[r * size:r * size + size] for r in range(size)])
+    return grids[0], grids[1]
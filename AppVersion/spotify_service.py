@@ -0,0 +1,195 @@
+import collections
+import queue
+import random
+import threading
+import time
+from audio_features import SpotifyFeatureSource
+from perf_stats import stats
+
+Playback = collections.namedtuple(
+    "Playback", "track_id artist song is_playing progress_ms duration_ms received_at tempo energy",
+    defaults=(None, None))
+
+
+def playback_from_response(current, received_at):
+    if not current or not current.get('item'):
+        return None
+    track = current['item']
+    return Playback(track['id'], track['artists'][0]['name'], track['name'],
+                    current['is_playing'], current.get('progress_ms') or 0,
+                    track.get('duration_ms') or 0, received_at)
+
+
+def spotify_client_factory(client_id, client_secret, redirect_uri, cache_path, scope,
+                           timeout=5.0, api_base=None, access_token=None):
+    # Builds the client inside the worker thread, so the OAuth flow (which
+    # may open a browser and wait for the redirect) never blocks Tk
+    def factory():
+        import requests
+        import spotipy
+        # A plain session never retries on its own, so a 429 reaches
+        # PollScheduler with its Retry-After header (spotipy's own session
+        # turns an exhausted 429 retry into an error without headers)
+        session = requests.Session()
+        if access_token:
+            client = spotipy.Spotify(auth=access_token, requests_timeout=timeout,
+                                     requests_session=session)
+        else:
+            from spotipy.oauth2 import SpotifyOAuth
+            auth_manager = SpotifyOAuth(client_id=client_id,
+                                        client_secret=client_secret,
+                                        redirect_uri=redirect_uri,
+                                        scope=scope,
+                                        cache_path=cache_path,
+                                        open_browser=True,
+                                        requests_timeout=timeout)
+            client = spotipy.Spotify(auth_manager=auth_manager, requests_timeout=timeout,
+                                     requests_session=session)
+        if api_base:
+            # Lets a local stub server stand in for api.spotify.com
+            client.prefix = api_base.rstrip('/') + '/'
+        return client
+    return factory
+
+
+class PollScheduler:
+    def __init__(self, min_interval=1.0, max_playing_interval=15.0, paused_interval=10.0,
+                 idle_interval=15.0, boundary_slack=0.5, backoff_base=2.0, backoff_max=120.0,
+                 rng=None):
+        self.min_interval = min_interval
+        self.max_playing_interval = max_playing_interval
+        self.paused_interval = paused_interval
+        self.idle_interval = idle_interval
+        self.boundary_slack = boundary_slack
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rng = rng or random.Random()
+        self.failures = 0
+        self.counters = collections.Counter()
+
+    def after_success(self, playback):
+        self.counters["requests"] += 1
+        self.counters["successes"] += 1
+        self.failures = 0
+        if playback is None:
+            return self.idle_interval
+        if not playback.is_playing:
+            return self.paused_interval
+        # Poll again just after the current track should end; the cap keeps a
+        # manual skip from going unnoticed for a whole song
+        remaining = (playback.duration_ms - playback.progress_ms) / 1000.0 + self.boundary_slack
+        return max(self.min_interval, min(self.max_playing_interval, remaining))
+
+    def after_error(self, error):
+        self.counters["requests"] += 1
+        self.counters["errors"] += 1
+        self.failures += 1
+        if getattr(error, 'http_status', None) == 429:
+            self.counters["rate_limited"] += 1
+            headers = getattr(error, 'headers', None) or {}
+            try:
+                return max(self.min_interval, float(headers.get('Retry-After')))
+            except (TypeError, ValueError):
+                pass
+        # Exponential backoff, jittered over the upper half of the window
+        ceiling = min(self.backoff_max, self.backoff_base * 2 ** (self.failures - 1))
+        return self.rng.uniform(ceiling / 2, ceiling)
+
+
+class PlaybackService:
+    def __init__(self, client_factory, scheduler=None, feature_provider=None):
+        self.client_factory = client_factory
+        self.scheduler = scheduler or PollScheduler()
+        self.feature_provider = feature_provider
+        self.client = None
+        # spotipy only authenticates on the first request, so the service
+        # counts as connected once a playback call has gone through
+        self.connected = False
+        # Messages for the UI thread: ("connected", None), ("failed", error),
+        # ("playback", Playback or None), ("features", (track_id, AudioFeatures))
+        # when they arrive after the snapshot, and ("error", error)
+        self.updates = queue.Queue()
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="spotify-playback", daemon=True)
+            self.thread.start()
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        self.wake_event.set()
+        if timeout is not None and self.thread is not None:
+            self.thread.join(timeout)
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def run(self):
+        try:
+            self.client = self.client_factory()
+        except Exception as e:
+            self.updates.put(("failed", e))
+            return
+        if self.feature_provider is not None and self.feature_provider.source is None:
+            self.feature_provider.source = SpotifyFeatureSource(self.client)
+
+        while not self.stop_event.is_set():
+            delay = self.poll_once()
+            if delay is None:
+                return
+            self.wake_event.wait(delay)
+            self.wake_event.clear()
+
+    def poke(self):
+        # Poll right away instead of waiting out the scheduled delay
+        self.wake_event.set()
+
+    def poll_once(self):
+        started = time.perf_counter()
+        try:
+            current = self.client.current_playback()
+        except Exception as e:
+            stats.count("spotify.errors")
+            if not self.connected:
+                # Never got through (declined login, bad token, no network):
+                # the connection failed rather than dropped, and polling ends
+                self.updates.put(("failed", e))
+                return None
+            self.updates.put(("error", e))
+            return self.scheduler.after_error(e)
+        finally:
+            stats.record("spotify.poll", time.perf_counter() - started)
+        if not self.connected:
+            self.connected = True
+            self.updates.put(("connected", None))
+        playback = playback_from_response(current, time.time())
+        provider = self.feature_provider
+        if playback is not None and provider is not None:
+            cached = provider.get(playback.track_id)
+            if cached is not None:
+                playback = playback._replace(tempo=cached.tempo, energy=cached.energy)
+        # The snapshot goes out before any feature request, so the song label
+        # never waits on the queue or audio-features round-trips
+        self.updates.put(("playback", playback))
+        if playback is not None and provider is not None:
+            with stats.timer("spotify.features"):
+                features = provider.features(playback.track_id)
+            if features is not None and playback.tempo is None:
+                self.updates.put(("features", (playback.track_id, features)))
+        return self.scheduler.after_success(playback)
+
+    @property
+    def counters(self):
+        return dict(self.scheduler.counters)
+
+    def drain(self):
+        messages = []
+        while True:
+            try:
+                messages.append(self.updates.get_nowait())
+            except queue.Empty:
+                return messages
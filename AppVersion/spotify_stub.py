@@ -0,0 +1,141 @@
+import argparse
+import collections
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PLAYER = "/v1/me/player"
+QUEUE = "/v1/me/player/queue"
+FEATURES = "/v1/audio-features"
+# spotipy only accepts 22-character base62 track ids
+DEMO_TRACK = "4uLU6hMCjMI75M1A2tKUQC"
+
+
+def track(track_id, song="Stub Song", artist="Stub Artist", duration_ms=180000):
+    return {"id": track_id, "name": song, "artists": [{"name": artist}],
+            "duration_ms": duration_ms}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        stub = self.server.stub
+        parts = urlsplit(self.path)
+        status, headers, body = stub.respond(parts.path.rstrip("/"), parse_qs(parts.query))
+        try:
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            data = json.dumps(body).encode() if body is not None else b""
+            if data:
+                self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up first, which is what a stall is for
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SpotifyStub:
+    # Small stand-in for the parts of api.spotify.com the playback service
+    # uses, served from a background thread. Point the client at base_url
+    # (SPOTIFY_API_BASE) with any access token. Failures and stalls are
+    # scripted per path and used up in order, one per request
+    def __init__(self, host="127.0.0.1", port=0):
+        self.playing = None
+        self.is_playing = True
+        self.progress_ms = 0
+        self.queue = []
+        self.features = {}
+        self.scripted = collections.defaultdict(collections.deque)
+        # (path, query) of every request, in arrival order
+        self.requests = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), StubHandler)
+        self.server.stub = self
+        # A stalled handler must not hold up close()
+        self.server.daemon_threads = True
+        self.server.block_on_close = False
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1/"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="spotify-stub",
+                                       daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def play(self, item, progress_ms=0, is_playing=True):
+        # item from track(), or None for nothing playing (a 204)
+        with self.lock:
+            self.playing, self.progress_ms, self.is_playing = item, progress_ms, is_playing
+
+    def fail(self, status, headers=None, path=PLAYER, times=1):
+        with self.lock:
+            self.scripted[path].extend([("fail", status, headers or {})] * times)
+
+    def stall(self, seconds, path=PLAYER, times=1):
+        with self.lock:
+            self.scripted[path].extend([("stall", seconds, None)] * times)
+
+    def count(self, path=PLAYER):
+        with self.lock:
+            return sum(1 for p, _ in self.requests if p == path)
+
+    def respond(self, path, query):
+        with self.lock:
+            self.requests.append((path, query))
+            action = self.scripted[path].popleft() if self.scripted[path] else None
+        if action is not None:
+            kind, value, headers = action
+            if kind == "fail":
+                return value, headers, {"error": {"status": value, "message": "stubbed failure"}}
+            time.sleep(value)
+
+        with self.lock:
+            if path == PLAYER:
+                if self.playing is None:
+                    return 204, {}, None
+                return 200, {}, {"item": self.playing, "is_playing": self.is_playing,
+                                 "progress_ms": self.progress_ms}
+            if path == QUEUE:
+                return 200, {}, {"currently_playing": self.playing, "queue": list(self.queue)}
+            if path == FEATURES:
+                ids = ",".join(query.get("ids", [])).split(",")
+                return 200, {}, {"audio_features": [self.features.get(i) for i in ids]}
+        return 404, {}, {"error": {"status": 404, "message": "no such endpoint"}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a stub Spotify Web API for the app.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tempo", type=float, default=128.0)
+    args = parser.parse_args(argv)
+    stub = SpotifyStub(port=args.port)
+    stub.play(track(DEMO_TRACK), progress_ms=0)
+    stub.features[DEMO_TRACK] = {"id": DEMO_TRACK, "tempo": args.tempo, "energy": 0.8}
+    print(f"SPOTIFY_API_BASE={stub.base_url} SPOTIFY_ACCESS_TOKEN=stub", file=sys.stderr)
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    stub.server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
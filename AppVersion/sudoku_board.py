@@ -0,0 +1,91 @@
+from array import array
+import sudoku_solver
+
+
+class BoardModel:
+    # Flat byte arrays and no per-instance dict: a 9x9 board takes about a
+    # kilobyte against some 6 KB as lists, so thousands fit in one process.
+    # The geometry tables are shared by every board of a size
+    __slots__ = ("geo", "size", "cells", "given", "counts", "filled", "duplicates", "history")
+
+    def __init__(self, grid=None, box=3):
+        if grid:
+            box = sudoku_solver.box_of_grid(grid)
+        self.load(grid or [[0] * box * box for _ in range(box * box)])
+
+    def load(self, grid):
+        geo = self.geo = sudoku_solver.geometry(sudoku_solver.box_of_grid(grid))
+        self.size = geo.size
+        self.cells = bytearray(geo.cells)
+        self.given = bytearray(geo.cells)
+        # counts[unit * (size + 1) + digit] is how many times digit appears
+        # in that unit, for each of the 3 * size units
+        self.counts = bytearray(3 * geo.size * (geo.size + 1))
+        self.filled = 0
+        self.duplicates = 0
+        # Undo stack, one entry per change: cell * 32 + the digit it replaced
+        self.history = array("H")
+        for i, num in enumerate(v for row in grid for v in row):
+            if num:
+                self._add(i, num)
+                self.given[i] = 1
+
+    def _add(self, i, num):
+        self.cells[i] = num
+        self.filled += 1
+        stride = self.size + 1
+        counts = self.counts
+        for unit in self.geo.units_of[i]:
+            k = unit * stride + num
+            if counts[k]:
+                self.duplicates += 1
+            counts[k] += 1
+
+    def _remove(self, i):
+        num = self.cells[i]
+        self.cells[i] = 0
+        self.filled -= 1
+        stride = self.size + 1
+        counts = self.counts
+        for unit in self.geo.units_of[i]:
+            k = unit * stride + num
+            counts[k] -= 1
+            if counts[k]:
+                self.duplicates -= 1
+
+    def _put(self, i, num):
+        if self.cells[i]:
+            self._remove(i)
+        if num:
+            self._add(i, num)
+
+    def get(self, row, col):
+        return self.cells[row * self.size + col]
+
+    def set(self, row, col, num):
+        i = row * self.size + col
+        previous = self.cells[i]
+        if self.given[i] or previous == num:
+            return
+        self.history.append(i << 5 | previous)
+        self._put(i, num)
+
+    def clear(self, row, col):
+        self.set(row, col, 0)
+
+    def undo(self):
+        # Reverts the latest set() or clear(); returns (row, col, digit the
+        # cell holds again), or None when there is nothing left to undo
+        if not self.history:
+            return None
+        entry = self.history.pop()
+        i, previous = entry >> 5, entry & 31
+        self._put(i, previous)
+        return i // self.size, i % self.size, previous
+
+    def is_complete(self):
+        return self.filled == self.geo.cells and not self.duplicates
+
+    def to_rows(self):
+        size = self.size
+        return [list(self.cells[r * size:r * size + size]) for r in range(size)]
@@ -0,0 +1,206 @@
+import hashlib
+import itertools
+import math
+import os
+import struct
+
+# Column (or row) orders that keep the three stacks intact: a stack order
+# followed by an order inside each stack, 6 * 6**3 = 1296 in all
+TRIPLE_ORDERS = list(itertools.permutations(range(3)))
+LINE_ORDERS = [(stacks, inner) for stacks in TRIPLE_ORDERS
+               for inner in itertools.product(range(6), repeat=3)]
+LINE_INDEXES = [tuple(3 * s + TRIPLE_ORDERS[p][k] for s, p in zip(stacks, inner) for k in range(3))
+                for stacks, inner in LINE_ORDERS]
+
+
+def flatten(grid):
+    if len(grid) == 81:
+        return list(grid)
+    return [v for row in grid for v in row]
+
+
+def transpose(cells):
+    return [cells[c * 9 + r] for r in range(9) for c in range(9)]
+
+
+def stack_chunks(cells):
+    # chunks[r][s][p] is the 3-bit given pattern of row r in stack s under
+    # order p of the stack's columns (leftmost column highest)
+    chunks = []
+    for r in range(9):
+        row = cells[r * 9:r * 9 + 9]
+        chunks.append([[sum(1 << (2 - k) for k in range(3) if row[3 * s + order[k]])
+                        for order in TRIPLE_ORDERS] for s in range(3)])
+    return chunks
+
+
+def minimal_orders(chunk):
+    # Indexes into LINE_ORDERS of every column order that gives this row
+    # its smallest pattern: givens last inside each stack, and stacks
+    # sorted by how many givens they hold
+    best = [min(options) for options in chunk]
+    inner = [[p for p, value in enumerate(options) if value == best[s]]
+             for s, options in enumerate(chunk)]
+    low = sorted(best)
+    orders = []
+    for stack_index, stacks in enumerate(TRIPLE_ORDERS):
+        if [best[s] for s in stacks] != low:
+            continue
+        for p0, p1, p2 in itertools.product(*(inner[s] for s in stacks)):
+            orders.append(stack_index * 216 + p0 * 36 + p1 * 6 + p2)
+    return (low[0] << 6 | low[1] << 3 | low[2]), orders
+
+
+def mask_key(row_values):
+    # Smallest row sequence reachable by reordering rows inside bands and
+    # the bands themselves: sort each band, then sort the bands
+    return sorted(tuple(sorted(row_values[3 * b:3 * b + 3])) for b in range(3))
+
+
+def candidate_orders(cells):
+    # First pass: minimise the pattern of givens, which does not depend on
+    # the digits. The smallest first row must be the best pattern some row
+    # can reach, so only column orders reaching it for such a row are
+    # scored; of those, the (transposed, column order) pairs that reach the
+    # minimal pattern survive, which for real puzzles is a handful
+    grids, minima = [], []
+    for transposed in (False, True):
+        grid = transpose(cells) if transposed else cells
+        chunks = stack_chunks(grid)
+        grids.append((grid, chunks))
+        minima.append([minimal_orders(chunk) for chunk in chunks])
+    first = min(value for rows in minima for value, _ in rows)
+
+    best, survivors = None, []
+    for (grid, chunks), rows in zip(grids, minima):
+        orders = sorted({k for value, ks in rows if value == first for k in ks})
+        for k in orders:
+            (s0, s1, s2), (p0, p1, p2) = LINE_ORDERS[k]
+            row_values = [c[s0][p0] << 6 | c[s1][p1] << 3 | c[s2][p2] for c in chunks]
+            key = mask_key(row_values)
+            if best is None or key < best:
+                best, survivors = key, []
+            if key == best:
+                survivors.append((grid, k, row_values))
+    target = [v for band in best for v in band]
+    return target, survivors
+
+
+def canonical_cells(grid):
+    # Lexicographically smallest form under band/stack, row/column and
+    # transposition symmetries, first by the pattern of givens and then by
+    # digits relabelled in order of first appearance (0 stays 0).
+    # Ties are followed in parallel, one row at a time, so a choice is only
+    # committed once a later row tells the candidates apart
+    cells = flatten(grid)
+    target, survivors = candidate_orders(cells)
+
+    # state: (grid, column indexes, row values, rows used, relabel map)
+    states = [(g, LINE_INDEXES[k], values, (), {}) for g, k, values in survivors]
+    result = []
+    for position in range(9):
+        best, next_states = None, []
+        for g, columns, values, used, labels in states:
+            if position % 3:
+                choices = [r for r in range(3 * (used[-1] // 3), 3 * (used[-1] // 3) + 3)
+                           if r not in used]
+            else:
+                # A band can only open here if all three of its rows can
+                # follow, i.e. its sorted pattern is the target band's
+                taken = {r // 3 for r in used}
+                band = sorted(target[position:position + 3])
+                choices = [r for r in range(9) if r // 3 not in taken and
+                           sorted(values[3 * (r // 3):3 * (r // 3) + 3]) == band]
+            for r in choices:
+                if values[r] != target[position]:
+                    continue
+                relabel = dict(labels)
+                row = []
+                for c in columns:
+                    v = g[r * 9 + c]
+                    if v:
+                        v = relabel.setdefault(v, len(relabel) + 1)
+                    row.append(v)
+                if best is None or row < best:
+                    best, next_states = row, []
+                if row == best:
+                    next_states.append((g, columns, values, used + (r,), relabel))
+        result.extend(best)
+        states = next_states
+    return result
+
+
+def canonical_string(grid):
+    return "".join(str(v) for v in canonical_cells(grid))
+
+
+def puzzle_key(grid):
+    # 8-byte digest of the canonical form; equal for every relabelled,
+    # reflected, rotated or line-swapped copy of the same puzzle
+    return hashlib.blake2b(canonical_string(grid).encode(), digest_size=8).digest()
+
+
+class SeenSet:
+    # Bloom filter over puzzle keys, persisted as a small header plus the
+    # raw bit array. False positives only ever skip a puzzle that was not
+    # really seen; a seen puzzle is never reported as new
+    HEADER = struct.Struct("<8sQIQ")
+    MAGIC = b"SXSSEEN1"
+
+    def __init__(self, capacity=1000000, error_rate=0.001, path=None):
+        self.path = path
+        self.bits = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+        self.dirty = False
+
+    @classmethod
+    def open(cls, path, capacity=1000000, error_rate=0.001):
+        seen = cls(capacity, error_rate, path)
+        try:
+            with open(path, "rb") as f:
+                magic, bits, hashes, count = cls.HEADER.unpack(f.read(cls.HEADER.size))
+                array = bytearray(f.read())
+        except (OSError, struct.error):
+            return seen
+        if magic == cls.MAGIC and len(array) == (bits + 7) // 8:
+            seen.bits, seen.hashes, seen.count, seen.array = bits, hashes, count, array
+        return seen
+
+    def positions(self, key):
+        # Double hashing from the two halves of the 8-byte key
+        h1, h2 = struct.unpack("<II", key[:8])
+        h2 |= 1
+        return [(h1 + k * h2) % self.bits for k in range(self.hashes)]
+
+    def __contains__(self, key):
+        array = self.array
+        return all(array[p >> 3] & (1 << (p & 7)) for p in self.positions(key))
+
+    def add(self, key):
+        # Returns True when the key was not (probably) present before
+        new = False
+        array = self.array
+        for p in self.positions(key):
+            bit = 1 << (p & 7)
+            if not array[p >> 3] & bit:
+                array[p >> 3] |= bit
+                new = True
+        if new:
+            self.count += 1
+            self.dirty = True
+        return new
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(self.HEADER.pack(self.MAGIC, self.bits, self.hashes, self.count))
+                f.write(self.array)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            return
+        self.dirty = False
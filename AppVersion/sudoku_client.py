@@ -0,0 +1,95 @@
+import queue
+import socket
+import threading
+from multiplayer_game import MAX_LINE, decode, encode
+
+
+def parse_address(text, default_port=8765):
+    host, _, port = text.rpartition(":")
+    if not host:
+        return text, default_port
+    return host, int(port)
+
+
+class GameClient:
+    # Blocking socket on a worker thread, in the style of PlaybackService:
+    # the Tk side sends from its own thread and drains updates from a task
+    def __init__(self, host, port, timeout=5.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.sock = None
+        # Messages for the UI thread: ("connected", None), ("failed", error),
+        # ("message", dict) and ("closed", error or None)
+        self.updates = queue.Queue()
+        self.send_lock = threading.Lock()
+        self.thread = None
+        self.next_id = 0
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="sudoku-client", daemon=True)
+            self.thread.start()
+
+    def run(self):
+        try:
+            sock = socket.create_connection((self.host, self.port), self.timeout)
+            sock.settimeout(None)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as e:
+            self.updates.put(("failed", e))
+            return
+        self.sock = sock
+        self.updates.put(("connected", None))
+        error = None
+        try:
+            with sock.makefile("rb") as lines:
+                for line in lines:
+                    if len(line) > MAX_LINE:
+                        continue
+                    message = decode(line)
+                    if message is not None:
+                        self.updates.put(("message", message))
+        except OSError as e:
+            error = e
+        self.updates.put(("closed", error))
+
+    def send(self, message):
+        sock = self.sock
+        if sock is None:
+            return False
+        try:
+            with self.send_lock:
+                sock.sendall(encode(message))
+        except OSError:
+            return False
+        return True
+
+    def join(self, room, difficulty="Easy", box=3, seats=2):
+        return self.send({"t": "join", "room": room, "difficulty": difficulty, "box": box,
+                          "seats": seats})
+
+    def move(self, cell, value):
+        # Returns the id the server echoes in its verdict or error, or None
+        # when the move could not be sent
+        self.next_id += 1
+        if not self.send({"t": "move", "id": self.next_id, "cell": cell, "value": value}):
+            return None
+        return self.next_id
+
+    def close(self):
+        sock, self.sock = self.sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def drain(self):
+        messages = []
+        while True:
+            try:
+                messages.append(self.updates.get_nowait())
+            except queue.Empty:
+                return messages
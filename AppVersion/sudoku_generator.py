@@ -0,0 +1,208 @@
+import math
+import random
+import time
+import solution_grids
+import sudoku_rater
+import sudoku_solver
+
+DIFFICULTY_SETTINGS = {
+    "Easy": 35,
+    "Medium": 45,
+    "Hard": 55,
+    "Stupidly Hard": 60,
+    "Impossibly Hard": 70
+}
+
+# Rating bands used when generating by technique score instead of hole count
+DIFFICULTY_SCORE_BANDS = {
+    "Easy": (0.0, 1.5),
+    "Medium": (2.3, 2.8),
+    "Hard": (2.8, 3.4),
+    "Stupidly Hard": (3.4, 4.0),
+    "Impossibly Hard": (10.0, 10.0)
+}
+
+SYMMETRIES = ("none", "rotational", "mirror", "diagonal")
+
+
+def holes_for(holes, box=3):
+    # DIFFICULTY_SETTINGS count holes on a 9x9 board; other sizes keep the
+    # same fraction of empty cells
+    if box == 3:
+        return holes
+    return round(holes * box ** 4 / 81)
+
+
+def symmetric_cells(i, symmetry, size=9):
+    row, col = divmod(i, size)
+    last = size - 1
+    if symmetry == "rotational":
+        mates = [(last - row) * size + (last - col)]
+    elif symmetry == "mirror":
+        mates = [row * size + (last - col)]
+    elif symmetry == "diagonal":
+        mates = [col * size + row]
+    else:
+        mates = []
+    return sorted(set([i] + mates))
+
+
+class GivenMasks:
+    # Row/column/box digit masks of the givens, kept in step with the puzzle
+    # while digging so a removal can be checked for forcedness cheaply
+    def __init__(self, puzzle, geo):
+        self.geo = geo
+        self.puzzle = puzzle
+        self.rows = [0] * geo.size
+        self.cols = [0] * geo.size
+        self.boxes = [0] * geo.size
+        for i, num in enumerate(puzzle):
+            if num:
+                self.toggle(i, num)
+
+    def toggle(self, i, num):
+        geo = self.geo
+        bit = geo.bit[num]
+        self.rows[geo.row_of[i]] ^= bit
+        self.cols[geo.col_of[i]] ^= bit
+        self.boxes[geo.box_of[i]] ^= bit
+
+    def candidates(self, i):
+        geo = self.geo
+        return geo.all_digits & ~(self.rows[geo.row_of[i]] | self.cols[geo.col_of[i]] |
+                                  self.boxes[geo.box_of[i]])
+
+    def forced(self, i, num):
+        # True when the blank cell i can only be num given the other givens:
+        # a naked single, or a hidden single in one of its units
+        bit = self.geo.bit[num]
+        if self.candidates(i) == bit:
+            return True
+        puzzle = self.puzzle
+        for unit in self.geo.units_of[i]:
+            if not any(j != i and not puzzle[j] and self.candidates(j) & bit
+                       for j in self.geo.units[unit]):
+                return True
+        return False
+
+
+def unique_after_removal(puzzle, size):
+    if size <= 9:
+        return sudoku_solver.count_solutions(puzzle, 2) == 1
+    return sudoku_solver.SudokuSolver(puzzle).propagate() == sudoku_solver.SOLVED
+
+
+def dig_holes(solution, holes, rng=None, symmetry="none", time_budget=2.0):
+    # Blank cells one symmetry group at a time, keeping a removal only while
+    # the puzzle still has exactly one solution. Stops at the requested hole
+    # count or when the time budget runs out, whichever comes first.
+    # A removal whose cells are all single-forced by the remaining givens
+    # keeps the solution unique without a search. On 16x16 and 25x25 boards,
+    # where a full search is costly, those are taken in a first sweep; the
+    # rest are then kept if singles propagation alone still solves the
+    # puzzle, which also proves uniqueness at a fraction of a search
+    rng = rng or random.Random()
+    size = len(solution)
+    geo = sudoku_solver.geometry(math.isqrt(size))
+    puzzle = [v for row in solution for v in row]
+    masks = GivenMasks(puzzle, geo)
+    deadline = time.perf_counter() + time_budget
+
+    positions = list(range(geo.cells))
+    rng.shuffle(positions)
+
+    removed = 0
+    for searching in ((False, True) if size > 9 else (True,)):
+        retry = []
+        for i in positions:
+            if removed >= holes or time.perf_counter() > deadline:
+                break
+            group = [j for j in symmetric_cells(i, symmetry, size) if puzzle[j]]
+            if not group or removed + len(group) > holes:
+                continue
+
+            saved = [puzzle[j] for j in group]
+            for j, num in zip(group, saved):
+                puzzle[j] = 0
+                masks.toggle(j, num)
+            if (all(masks.forced(j, num) for j, num in zip(group, saved)) or
+                    searching and unique_after_removal(puzzle, size)):
+                removed += len(group)
+            else:
+                for j, num in zip(group, saved):
+                    puzzle[j] = num
+                    masks.toggle(j, num)
+                retry.append(i)
+        positions = retry
+
+    return sudoku_solver.to_rows(puzzle, size), removed
+
+
+def dig_to_score(solution, band, holes=81, rng=None, symmetry="none", time_budget=2.0):
+    # Like dig_holes, but also refuses removals that would push the rating
+    # above the band. Only the upper bound applies here: a dig can only get
+    # harder, so one that ends below the band is generate_rated's to retry
+    rng = rng or random.Random()
+    high = band[1]
+    puzzle = [v for row in solution for v in row]
+    deadline = time.perf_counter() + time_budget
+    rating = sudoku_rater.rate(puzzle)
+
+    positions = list(range(81))
+    rng.shuffle(positions)
+
+    removed = 0
+    for i in positions:
+        if removed >= holes or time.perf_counter() > deadline:
+            break
+        group = [j for j in symmetric_cells(i, symmetry) if puzzle[j]]
+        if not group or removed + len(group) > holes:
+            continue
+
+        saved = [puzzle[j] for j in group]
+        for j in group:
+            puzzle[j] = 0
+        if sudoku_solver.count_solutions(puzzle, 2) == 1:
+            candidate = sudoku_rater.rate(puzzle)
+            if candidate.score <= high:
+                rating = candidate
+                removed += len(group)
+                continue
+        for j, num in zip(group, saved):
+            puzzle[j] = num
+
+    return sudoku_solver.to_rows(puzzle), rating
+
+
+def generate_rated(band, holes=81, rng=None, symmetry="none", time_budget=2.0):
+    # Retries with fresh solutions until a puzzle lands in the band, returning
+    # the closest one found if the time budget runs out first
+    rng = rng or random.Random()
+    low, high = band
+    deadline = time.perf_counter() + time_budget
+    best = None
+    while True:
+        solution = solution_grids.random_grid(rng)
+        remaining = max(0.0, deadline - time.perf_counter())
+        puzzle, rating = dig_to_score(solution, band, holes, rng, symmetry, remaining)
+        distance = max(low - rating.score, rating.score - high, 0.0)
+        if best is None or distance < best[0]:
+            best = (distance, puzzle, solution, rating)
+        if distance == 0.0 or time.perf_counter() > deadline:
+            break
+    return best[1], best[2], best[3]
+
+
+def generate(holes, rng=None, symmetry="none", time_budget=2.0, box=3):
+    rng = rng or random.Random()
+    solution = solution_grids.random_grid(rng, box=box)
+    puzzle, _ = dig_holes(solution, holes, rng, symmetry, time_budget)
+    return puzzle, solution
+
+
+def generate_seeded(holes, seed, symmetry="none", time_budget=2.0, box=3):
+    return generate(holes, random.Random(seed), symmetry, time_budget, box)
+
+
+def generate_rated_seeded(band, holes, seed, symmetry="none", time_budget=2.0):
+    return generate_rated(band, holes, random.Random(seed), symmetry, time_budget)
@@ -0,0 +1,224 @@
+import collections
+from itertools import combinations
+from sudoku_solver import (ALL_DIGITS, BIT, DIGIT_OF, PEERS, POPCOUNT,
+                           UNITS, ROW_OF, COL_OF, BOX_OF)
+
+# Techniques in the order a human would reach for them, with a
+# SudokuExplainer-style weight; the score of a puzzle is the weight of the
+# hardest technique it needs
+TECHNIQUES = (
+    ("Hidden Single", 1.5),
+    ("Naked Single", 2.3),
+    ("Pointing/Claiming", 2.8),
+    ("Naked Pair", 3.0),
+    ("X-Wing", 3.2),
+    ("Hidden Pair", 3.4),
+    ("Naked Triple", 3.6),
+    ("Swordfish", 3.8),
+    ("Hidden Triple", 4.0),
+)
+TRIAL_AND_ERROR = ("Trial and Error", 10.0)
+
+Rating = collections.namedtuple("Rating", "score hardest solved counts")
+
+ROWS = UNITS[:9]
+COLS = UNITS[9:18]
+BOXES = UNITS[18:]
+
+
+class HumanSolver:
+    def __init__(self, grid):
+        self.cells = [v for row in grid for v in row] if len(grid) == 9 else list(grid)
+        self.cands = [0] * 81
+        self.valid = True
+        self.counts = collections.Counter()
+
+        for i in range(81):
+            if not self.cells[i]:
+                used = 0
+                for p in PEERS[i]:
+                    used |= BIT[self.cells[p]]
+                self.cands[i] = ALL_DIGITS & ~used
+        for i in range(81):
+            num = self.cells[i]
+            if num and any(self.cells[p] == num for p in PEERS[i]):
+                self.valid = False
+
+        self.techniques = (
+            self.hidden_single,
+            self.naked_single,
+            self.pointing_claiming,
+            lambda: self.naked_subset(2),
+            lambda: self.fish(2),
+            lambda: self.hidden_subset(2),
+            lambda: self.naked_subset(3),
+            lambda: self.fish(3),
+            lambda: self.hidden_subset(3),
+        )
+
+    def assign(self, i, num):
+        bit = BIT[num]
+        self.cells[i] = num
+        self.cands[i] = 0
+        cands = self.cands
+        for p in PEERS[i]:
+            cands[p] &= ~bit
+
+    def eliminate(self, cells, mask):
+        changed = False
+        cands = self.cands
+        for i in cells:
+            if cands[i] & mask:
+                cands[i] &= ~mask
+                changed = True
+        return changed
+
+    def hidden_single(self):
+        # Singles are applied in a full sweep rather than one at a time; each
+        # placement still counts as one use of the technique
+        cands = self.cands
+        placed = 0
+        for unit in UNITS:
+            once = twice = 0
+            for i in unit:
+                mask = cands[i]
+                twice |= once & mask
+                once |= mask
+            hidden = once & ~twice
+            while hidden:
+                bit = hidden & -hidden
+                hidden ^= bit
+                for i in unit:
+                    if cands[i] & bit:
+                        self.assign(i, DIGIT_OF[bit])
+                        placed += 1
+                        break
+        return placed
+
+    def naked_single(self):
+        cands = self.cands
+        placed = 0
+        for i in range(81):
+            mask = cands[i]
+            if mask and not mask & (mask - 1):
+                self.assign(i, DIGIT_OF[mask])
+                placed += 1
+        return placed
+
+    def pointing_claiming(self):
+        cands = self.cands
+        for box in BOXES:
+            for num in range(1, 10):
+                bit = BIT[num]
+                spots = [i for i in box if cands[i] & bit]
+                if len(spots) < 2:
+                    continue
+                rows = {ROW_OF[i] for i in spots}
+                cols = {COL_OF[i] for i in spots}
+                if len(rows) == 1 and self.eliminate(
+                        [i for i in ROWS[rows.pop()] if i not in box], bit):
+                    return True
+                if len(cols) == 1 and self.eliminate(
+                        [i for i in COLS[cols.pop()] if i not in box], bit):
+                    return True
+        for line in ROWS + COLS:
+            for num in range(1, 10):
+                bit = BIT[num]
+                boxes = {BOX_OF[i] for i in line if cands[i] & bit}
+                if len(boxes) == 1:
+                    box = BOXES[boxes.pop()]
+                    if self.eliminate([i for i in box if i not in line], bit):
+                        return True
+        return False
+
+    def naked_subset(self, size):
+        cands = self.cands
+        for unit in UNITS:
+            open_cells = [i for i in unit if cands[i] and POPCOUNT[cands[i]] <= size]
+            if len(open_cells) < size:
+                continue
+            for group in combinations(open_cells, size):
+                union = 0
+                for i in group:
+                    union |= cands[i]
+                if POPCOUNT[union] == size and self.eliminate(
+                        [i for i in unit if i not in group], union):
+                    return True
+        return False
+
+    def hidden_subset(self, size):
+        cands = self.cands
+        for unit in UNITS:
+            spots = {}
+            for num in range(1, 10):
+                where = [i for i in unit if cands[i] & BIT[num]]
+                if 2 <= len(where) <= size:
+                    spots[num] = where
+            if len(spots) < size:
+                continue
+            for digits in combinations(spots, size):
+                where = set()
+                for num in digits:
+                    where.update(spots[num])
+                if len(where) == size:
+                    keep = 0
+                    for num in digits:
+                        keep |= BIT[num]
+                    if self.eliminate(where, ALL_DIGITS & ~keep):
+                        return True
+        return False
+
+    def fish(self, size):
+        cands = self.cands
+        for bases, covers, cover_of in ((ROWS, COLS, COL_OF), (COLS, ROWS, ROW_OF)):
+            for num in range(1, 10):
+                bit = BIT[num]
+                lines = []
+                for base in bases:
+                    positions = {cover_of[i] for i in base if cands[i] & bit}
+                    if 2 <= len(positions) <= size:
+                        lines.append((base, positions))
+                for group in combinations(lines, size):
+                    cover = set()
+                    for _, positions in group:
+                        cover |= positions
+                    if len(cover) == size:
+                        base_cells = set()
+                        for base, _ in group:
+                            base_cells.update(base)
+                        targets = [i for k in cover for i in covers[k] if i not in base_cells]
+                        if self.eliminate(targets, bit):
+                            return True
+        return False
+
+    def stuck(self):
+        cells, cands = self.cells, self.cands
+        return any(not cells[i] and not cands[i] for i in range(81))
+
+    def run(self):
+        hardest = 0
+        while self.valid and 0 in self.cells:
+            for index, technique in enumerate(self.techniques):
+                uses = technique()
+                if uses:
+                    self.counts[TECHNIQUES[index][0]] += uses
+                    hardest = max(hardest, index)
+                    break
+            else:
+                return hardest, False
+            if self.stuck():
+                self.valid = False
+        return hardest, self.valid
+
+
+def rate(grid):
+    solver = HumanSolver(grid)
+    hardest, solved = solver.run()
+    if not solved:
+        name, score = TRIAL_AND_ERROR
+    elif not solver.counts:
+        name, score = "Given", 0.0
+    else:
+        name, score = TECHNIQUES[hardest]
+    return Rating(score, name, solved, dict(solver.counts))
+
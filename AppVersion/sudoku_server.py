@@ -0,0 +1,348 @@
+import argparse
+import asyncio
+import random
+import signal
+import sys
+import time
+import solution_grids
+import sudoku_generator
+import sudoku_solver
+from multiplayer_game import MAX_LINE, MultiplayerGame, decode, encode, game_message, verdict_message
+from perf_stats import stats
+from puzzle_bank import PuzzleBank
+from puzzle_pool import PuzzlePool
+
+# A client that lets this much unsent output pile up is dropped rather than
+# buffered without limit
+MAX_BUFFERED = 256 * 1024
+MAX_ROOM_NAME = 64
+# A failed deal is retried after this many seconds, doubling each time
+DEAL_RETRY = 1.0
+MAX_DEAL_RETRY = 30.0
+
+
+class PuzzleDealer:
+    # Every generated (or banked) puzzle is dealt up to `reuse` times, each
+    # time under a fresh random symmetry transform, so thousands of rooms
+    # only need a trickle of real generation from the worker processes
+    def __init__(self, difficulty_settings, bank=None, reuse=64, workers=None, time_budget=2.0):
+        self.difficulty_settings = difficulty_settings
+        self.bank = bank
+        self.reuse = reuse
+        self.workers = workers
+        self.time_budget = time_budget
+        self.pools = {}
+        # (box, difficulty) -> [puzzle, solution, times dealt]
+        self.stock = {}
+        self.fetching = {}
+        self.rng = random.Random()
+
+    def pool(self, box):
+        pool = self.pools.get(box)
+        if pool is None:
+            pool = self.pools[box] = PuzzlePool(self.difficulty_settings, workers=self.workers,
+                                                time_budget=self.time_budget, box=box)
+            pool.start()
+        return pool
+
+    async def fetch(self, box, difficulty):
+        if box == 3 and self.bank is not None:
+            banked = self.bank.draw(difficulty)
+            if banked is not None:
+                return banked
+        # get() may have to generate synchronously, so it never runs on the loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.pool(box).get, difficulty)
+
+    async def deal(self, box, difficulty):
+        key = (box, difficulty)
+        entry = self.stock.get(key)
+        if entry is None or entry[2] >= self.reuse:
+            # Rooms asking at the same time share one fetch
+            task = self.fetching.get(key)
+            if task is None:
+                task = self.fetching[key] = asyncio.ensure_future(self.fetch(box, difficulty))
+                task.add_done_callback(lambda _: self.fetching.pop(key, None))
+            puzzle, solution = await asyncio.shield(task)
+            if self.stock.get(key) is entry:
+                self.stock[key] = [puzzle, solution, 0]
+            entry = self.stock[key]
+        entry[2] += 1
+        return solution_grids.permute_puzzle(entry[0], entry[1], self.rng)
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.shutdown()
+        if self.bank is not None:
+            self.bank.close()
+
+
+class Room:
+    def __init__(self, name, box, difficulty, seats):
+        self.name = name
+        self.box = box
+        self.difficulty = difficulty
+        # Connection in each seat, None while it is free
+        self.members = [None] * seats
+        self.game = None
+        self.dealing = False
+
+    def seated(self):
+        return [seat for seat, member in enumerate(self.members, 1) if member is not None]
+
+
+class Connection:
+    def __init__(self, writer):
+        self.writer = writer
+        self.room = None
+        self.seat = None
+
+
+class GameServer:
+    # One asyncio task per connection and a dict of rooms; a move costs a
+    # parse, a check against the stored solution and one small broadcast
+    def __init__(self, dealer, max_mistakes=3, max_rooms=100000, deal_retry=DEAL_RETRY):
+        self.dealer = dealer
+        self.deal_retry = deal_retry
+        self.max_mistakes = max_mistakes
+        self.max_rooms = max_rooms
+        self.rooms = {}
+        self.connections = 0
+        self.tasks = set()
+        self.handlers = {"join": self.on_join, "move": self.on_move, "leave": self.on_leave,
+                         "stats": self.on_stats}
+
+    async def start(self, host, port):
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_LINE, backlog=1024)
+
+    def write(self, conn, data):
+        transport = conn.writer.transport
+        if transport.is_closing():
+            return
+        conn.writer.write(data)
+        if transport.get_write_buffer_size() > MAX_BUFFERED:
+            stats.count("server.dropped")
+            transport.abort()
+
+    def send(self, conn, message):
+        self.write(conn, encode(message))
+
+    def broadcast(self, room, message):
+        data = encode(message)
+        for member in room.members:
+            if member is not None:
+                self.write(member, data)
+
+    def error(self, conn, text, move_id=None):
+        message = {"t": "error", "error": text}
+        if move_id is not None:
+            message["id"] = move_id
+        self.send(conn, message)
+
+    async def handle(self, reader, writer):
+        conn = Connection(writer)
+        self.connections += 1
+        stats.count("server.connections")
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    # Over-long line or reset connection
+                    break
+                if not line:
+                    break
+                message = decode(line)
+                handler = self.handlers.get(message["t"]) if message else None
+                if handler is None:
+                    self.error(conn, "bad message")
+                else:
+                    handler(conn, message)
+        finally:
+            self.leave(conn)
+            self.connections -= 1
+            writer.close()
+
+    def on_join(self, conn, message):
+        name = message.get("room")
+        difficulty = message.get("difficulty", "Easy")
+        box = message.get("box", 3)
+        seats = message.get("seats", 2)
+        if not isinstance(name, str) or not 0 < len(name) <= MAX_ROOM_NAME:
+            return self.error(conn, "bad room name")
+        if not isinstance(difficulty, str) or difficulty not in self.dealer.difficulty_settings:
+            return self.error(conn, "unknown difficulty")
+        if type(box) is not int or box not in sudoku_solver.BOX_SIZES or \
+           type(seats) is not int or seats not in (1, 2):
+            return self.error(conn, "bad board size or seat count")
+
+        self.leave(conn)
+        room = self.rooms.get(name)
+        if room is None:
+            if len(self.rooms) >= self.max_rooms:
+                return self.error(conn, "server full")
+            # The first player in sets the room up; later ones get its game
+            room = self.rooms[name] = Room(name, box, difficulty, seats)
+        seated = room.seated()
+        if len(seated) == len(room.members):
+            return self.error(conn, "room full")
+        seat = next(s for s in range(1, len(room.members) + 1) if s not in seated)
+        room.members[seat - 1] = conn
+        conn.room, conn.seat = room, seat
+
+        self.send(conn, {"t": "joined", "room": name, "seat": seat, "difficulty": room.difficulty})
+        self.broadcast(room, {"t": "players", "seated": room.seated()})
+        if room.game is not None:
+            self.send(conn, game_message(room.game, room.box))
+        elif not room.dealing:
+            self.start_deal(room)
+
+    def on_move(self, conn, message):
+        started = time.perf_counter()
+        move_id = message.get("id")
+        if type(move_id) is not int:
+            move_id = None
+        room = conn.room
+        if room is None:
+            return self.error(conn, "not in a room", move_id)
+        game = room.game
+        if game is None:
+            return self.error(conn, "no game yet", move_id)
+        if None in room.members:
+            return self.error(conn, "waiting for players", move_id)
+        cell, value = message.get("cell"), message.get("value")
+        refused = game.check(conn.seat, cell, value)
+        if refused:
+            stats.count("server.refused")
+            return self.error(conn, refused, move_id)
+
+        verdict = game.play(conn.seat, cell, value)
+        self.broadcast(room, verdict_message(verdict, move_id))
+        if verdict.over:
+            # As in the hot-seat game, the next puzzle is dealt straight away
+            room.game = None
+            self.start_deal(room)
+        stats.count("server.moves")
+        stats.record("server.move", time.perf_counter() - started)
+
+    def on_leave(self, conn, message):
+        self.leave(conn)
+        self.send(conn, {"t": "left"})
+
+    def on_stats(self, conn, message):
+        self.send(conn, {"t": "stats", "rooms": len(self.rooms), "connections": self.connections,
+                         "perf": stats.snapshot()})
+
+    def leave(self, conn):
+        room = conn.room
+        if room is None:
+            return
+        room.members[conn.seat - 1] = None
+        conn.room = conn.seat = None
+        if room.seated():
+            self.broadcast(room, {"t": "players", "seated": room.seated()})
+        elif self.rooms.get(room.name) is room:
+            del self.rooms[room.name]
+
+    def start_deal(self, room):
+        room.dealing = True
+        task = asyncio.ensure_future(self.deal(room))
+        # The loop only keeps weak references to tasks
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def deal(self, room):
+        # Retried with a growing delay while anyone is still in the room, so a
+        # passing pool failure does not leave the seated players without a game
+        delay = self.deal_retry
+        try:
+            while True:
+                try:
+                    puzzle, solution = await self.dealer.deal(room.box, room.difficulty)
+                    break
+                except Exception as e:
+                    stats.count("server.deal_error")
+                    self.broadcast(room, {"t": "error", "error": f"could not deal a puzzle: {e}; "
+                                                                 f"retrying in {delay:g}s"})
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_DEAL_RETRY)
+                if self.rooms.get(room.name) is not room:
+                    return
+        finally:
+            room.dealing = False
+        if self.rooms.get(room.name) is not room:
+            return
+        room.game = MultiplayerGame(puzzle, solution, self.max_mistakes, len(room.members))
+        stats.count("server.games")
+        self.broadcast(room, game_message(room.game, room.box))
+
+
+def raise_open_file_limit():
+    # Every player is a socket; the usual soft limit of 1024 caps a server
+    # at about 500 rooms
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = max(soft, 65536) if hard == resource.RLIM_INFINITY else hard
+    if target > soft:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        except (ValueError, OSError):
+            pass
+
+
+async def serve(args):
+    bank = PuzzleBank.open(args.bank) if args.bank else None
+    dealer = PuzzleDealer(dict(sudoku_generator.DIFFICULTY_SETTINGS), bank=bank, reuse=args.reuse,
+                          workers=args.workers)
+    server = GameServer(dealer, max_mistakes=args.max_mistakes, max_rooms=args.max_rooms)
+    listener = await server.start(args.host, args.port)
+    host, port = listener.sockets[0].getsockname()[:2]
+    # Parsed by server_loadtest when it starts a server on port 0
+    print(f"Listening on {host}:{port}", file=sys.stderr, flush=True)
+    # A terminated server still shuts its generator processes down, which
+    # would otherwise outlive it
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for name in ("SIGTERM", "SIGINT"):
+        try:
+            loop.add_signal_handler(getattr(signal, name), stop.set)
+        except (AttributeError, NotImplementedError, RuntimeError):
+            pass
+    try:
+        async with listener:
+            await stop.wait()
+    finally:
+        dealer.shutdown()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Host networked multiplayer Sudoku games.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("-p", "--port", type=int, default=8765, help="port to listen on (0 = any)")
+    parser.add_argument("--bank", help="puzzle bank to deal 9x9 puzzles from")
+    parser.add_argument("--reuse", type=int, default=64,
+                        help="deals per generated puzzle, each under a new transform")
+    parser.add_argument("-w", "--workers", type=int, help="puzzle generator processes")
+    parser.add_argument("--max-mistakes", type=int, default=3)
+    parser.add_argument("--max-rooms", type=int, default=100000)
+    parser.add_argument("--perf", action="store_true", help="collect move timings for 'stats'")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.perf:
+        stats.enabled = True
+    raise_open_file_limit()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
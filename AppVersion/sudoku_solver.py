@@ -0,0 +1,288 @@
+import math
+import random
+
+# Symbols shown for each board size, value v being SYMBOLS[size][v - 1]
+SYMBOLS = {
+    4: "1234",
+    9: "123456789",
+    16: "0123456789ABCDEF",
+    25: "ABCDEFGHIJKLMNOPQRSTUVWXY",
+}
+BOX_SIZES = (2, 3, 4, 5)
+
+SOLVED = -2
+CONTRADICTION = -1
+
+
+class Geometry:
+    # Cell/unit tables for a board of box x box boxes, built once per size
+    def __init__(self, box):
+        size = box * box
+        cells = size * size
+        self.box = box
+        self.size = size
+        self.cells = cells
+        self.all_digits = (1 << size) - 1
+        self.symbols = SYMBOLS[size]
+
+        self.row_of = [i // size for i in range(cells)]
+        self.col_of = [i % size for i in range(cells)]
+        self.box_of = [box * (i // (size * box)) + (i % size) // box for i in range(cells)]
+        self.units = ([[r * size + c for c in range(size)] for r in range(size)] +
+                      [[r * size + c for r in range(size)] for c in range(size)] +
+                      [[(box * (b // box) + k // box) * size + box * (b % box) + k % box
+                        for k in range(size)] for b in range(size)])
+        self.units_of = [[self.row_of[i], size + self.col_of[i], 2 * size + self.box_of[i]]
+                         for i in range(cells)]
+        self.peers = [sorted(set(self.units[u[0]] + self.units[u[1]] + self.units[u[2]]) - {i})
+                      for i, u in enumerate(self.units_of)]
+
+        self.bit = [0] + [1 << (d - 1) for d in range(1, size + 1)]
+        self.digit_of = {1 << (d - 1): d for d in range(1, size + 1)}
+        if size <= 9:
+            # Small enough to tabulate every mask
+            self.popcount_table = [bin(m).count('1') for m in range(self.all_digits + 1)]
+            self.digits_table = [[d for d in range(1, size + 1) if m & self.bit[d]]
+                                 for m in range(self.all_digits + 1)]
+            self.popcount = self.popcount_table.__getitem__
+            self.digits_of_mask = self.digits_table.__getitem__
+        else:
+            self.popcount = lambda mask: bin(mask).count('1')
+            self.digits_of_mask = lambda mask: [d for d in range(1, size + 1) if mask & self.bit[d]]
+
+
+GEOMETRIES = {}
+
+
+def geometry(box=3):
+    geo = GEOMETRIES.get(box)
+    if geo is None:
+        geo = GEOMETRIES[box] = Geometry(box)
+    return geo
+
+
+def box_of_grid(grid):
+    # Box size of a grid given as rows or as a flat cell list
+    size = len(grid) if grid and not isinstance(grid[0], int) else math.isqrt(len(grid))
+    return math.isqrt(size)
+
+
+# The classic 9x9 tables, used directly by modules that only know 9x9
+GEO_9 = geometry(3)
+ALL_DIGITS = GEO_9.all_digits
+ROW_OF = GEO_9.row_of
+COL_OF = GEO_9.col_of
+BOX_OF = GEO_9.box_of
+UNITS = GEO_9.units
+UNITS_OF = GEO_9.units_of
+PEERS = GEO_9.peers
+BIT = GEO_9.bit
+DIGIT_OF = GEO_9.digit_of
+POPCOUNT = GEO_9.popcount_table
+DIGITS_OF_MASK = GEO_9.digits_table
+
+
+class SudokuSolver:
+    def __init__(self, grid=None, box=None):
+        if box is None:
+            box = box_of_grid(grid) if grid else 3
+        geo = self.geo = geometry(box)
+        self.cells = [0] * geo.cells
+        self.rows = [0] * geo.size
+        self.cols = [0] * geo.size
+        self.boxes = [0] * geo.size
+        self.valid = True
+        self.nodes = 0
+
+        if grid is not None:
+            flat = grid if len(grid) == geo.cells else [v for row in grid for v in row]
+            for i, num in enumerate(flat):
+                if num:
+                    if not self.candidates(i) & geo.bit[num]:
+                        self.valid = False
+                        return
+                    self.place(i, num)
+
+    def copy(self):
+        other = SudokuSolver.__new__(SudokuSolver)
+        other.geo = self.geo
+        other.cells = self.cells[:]
+        other.rows = self.rows[:]
+        other.cols = self.cols[:]
+        other.boxes = self.boxes[:]
+        other.valid = self.valid
+        other.nodes = 0
+        return other
+
+    def candidates(self, i):
+        geo = self.geo
+        return geo.all_digits & ~(self.rows[geo.row_of[i]] | self.cols[geo.col_of[i]] |
+                                  self.boxes[geo.box_of[i]])
+
+    def place(self, i, num):
+        geo = self.geo
+        bit = geo.bit[num]
+        self.cells[i] = num
+        self.rows[geo.row_of[i]] |= bit
+        self.cols[geo.col_of[i]] |= bit
+        self.boxes[geo.box_of[i]] |= bit
+
+    def propagate(self):
+        # Fill naked and hidden singles until stuck; returns the most
+        # constrained empty cell, SOLVED or CONTRADICTION
+        geo = self.geo
+        cells = self.cells
+        rows, cols, boxes = self.rows, self.cols, self.boxes
+        row_of, col_of, box_of = geo.row_of, geo.col_of, geo.box_of
+        all_digits, bits, digit_of, popcount = geo.all_digits, geo.bit, geo.digit_of, geo.popcount
+        while True:
+            progress = False
+            best = SOLVED
+            best_count = geo.size + 1
+            for i in range(geo.cells):
+                if cells[i]:
+                    continue
+                mask = all_digits & ~(rows[row_of[i]] | cols[col_of[i]] | boxes[box_of[i]])
+                if not mask:
+                    return CONTRADICTION
+                if not mask & (mask - 1):
+                    num = digit_of[mask]
+                    cells[i] = num
+                    rows[row_of[i]] |= mask
+                    cols[col_of[i]] |= mask
+                    boxes[box_of[i]] |= mask
+                    progress = True
+                else:
+                    count = popcount(mask)
+                    if count < best_count:
+                        best = i
+                        best_count = count
+            if progress:
+                continue
+            if best == SOLVED:
+                return SOLVED
+
+            for unit in geo.units:
+                once = twice = placed = 0
+                for i in unit:
+                    if cells[i]:
+                        placed |= bits[cells[i]]
+                    else:
+                        mask = all_digits & ~(rows[row_of[i]] | cols[col_of[i]] | boxes[box_of[i]])
+                        twice |= once & mask
+                        once |= mask
+                if (once | placed) != all_digits:
+                    return CONTRADICTION
+                hidden = once & ~twice & ~placed
+                while hidden:
+                    bit = hidden & -hidden
+                    hidden ^= bit
+                    for i in unit:
+                        if not cells[i] and self.candidates(i) & bit:
+                            self.place(i, digit_of[bit])
+                            progress = True
+                            break
+                    else:
+                        return CONTRADICTION
+            if not progress:
+                return best
+
+    def search(self, limit=1, rng=None, found=None):
+        self.nodes += 1
+        cell = self.propagate()
+        if cell == CONTRADICTION:
+            return 0
+        if cell == SOLVED:
+            if found is not None:
+                found.append(self.cells[:])
+            return 1
+
+        digits = self.geo.digits_of_mask(self.candidates(cell))
+        if rng is not None:
+            digits = digits[:]
+            rng.shuffle(digits)
+
+        count = 0
+        for num in digits:
+            child = self.copy()
+            child.place(cell, num)
+            count += child.search(limit - count, rng, found)
+            self.nodes += child.nodes
+            if count >= limit:
+                break
+        return count
+
+
+def to_rows(flat, size=None):
+    size = size or math.isqrt(len(flat))
+    return [flat[r * size:r * size + size] for r in range(size)]
+
+
+def to_string(grid):
+    # 9x9 and smaller boards write empty cells as 0; larger boards use 0 as
+    # a symbol, so empties are written as '.'
+    flat = grid if isinstance(grid[0], int) else [v for row in grid for v in row]
+    size = math.isqrt(len(flat))
+    symbols = SYMBOLS[size]
+    empty = "0" if size <= 9 else "."
+    return "".join(symbols[v - 1] if v else empty for v in flat)
+
+
+def from_string(text):
+    text = text.strip()
+    size = math.isqrt(len(text))
+    symbols = SYMBOLS[size]
+    return to_rows([symbols.index(ch) + 1 if ch in symbols else 0 for ch in text.upper()], size)
+
+
+def symbol_value(text, size=9):
+    # Cell value typed as text, or None when it is not one of the board's
+    # symbols
+    if len(text) != 1:
+        return None
+    index = SYMBOLS[size].find(text.upper())
+    return index + 1 if index >= 0 else None
+
+
+def is_valid(grid, row, col, num):
+    size = len(grid)
+    box = math.isqrt(size)
+    for j in range(size):
+        if grid[row][j] == num:
+            return False
+
+    for i in range(size):
+        if grid[i][col] == num:
+            return False
+
+    start_row, start_col = box * (row // box), box * (col // box)
+    for i in range(start_row, start_row + box):
+        for j in range(start_col, start_col + box):
+            if grid[i][j] == num:
+                return False
+
+    return True
+
+
+def solve(grid, rng=None):
+    solver = SudokuSolver(grid)
+    if not solver.valid:
+        return None
+    found = []
+    solver.search(1, rng, found)
+    return to_rows(found[0]) if found else None
+
+
+def count_solutions(grid, limit=2):
+    solver = SudokuSolver(grid)
+    if not solver.valid:
+        return 0
+    return solver.search(limit)
+
+
+def has_unique_solution(grid):
+    return count_solutions(grid, 2) == 1
+
+
+def random_solution(rng=None, box=3):
+    return solve([0] * geometry(box).cells, rng or random.Random())
@@ -0,0 +1,56 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import move_log
+import sudoku_generator
+from move_log import CORRECT, WRONG
+
+
+class LastGameTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "moves")
+        rng = random.Random(0)
+        self.games = [sudoku_generator.generate(40, rng) for _ in range(3)]
+        log = move_log.MoveLog(self.path)
+        for n, (puzzle, solution) in enumerate(self.games):
+            log.game(puzzle, solution, timestamp=1000.0 + n)
+            empty = [r * 9 + c for r in range(9) for c in range(9) if not puzzle[r][c]]
+            for cell in empty[:n + 2]:
+                log.move(cell, solution[cell // 9][cell % 9], 1, CORRECT, timestamp=1000.5 + n)
+            # One flush per game, so the sidecar moves on each time
+            log.flush()
+        log.move(empty[-1], 0, 1, WRONG, timestamp=1003.0)
+        log.flush()
+
+    def assert_last_game(self, latest):
+        game, board, moves = latest
+        self.assertEqual(game.puzzle, self.games[-1][0])
+        self.assertEqual(game.time, 1002.0)
+        self.assertEqual(len(moves), 5)
+
+    def test_resume_reads_from_the_newest_game(self):
+        offset = move_log.last_game_offset(self.path)
+        self.assertIsNotNone(offset)
+        first = next(move_log.read_log(self.path, offset))
+        self.assertEqual(first.time, 1002.0)
+        self.assert_last_game(move_log.last_game(self.path))
+        self.assertEqual(len(list(move_log.replay(move_log.read_log(self.path)))), 3)
+
+    def test_stale_sidecar_falls_back_to_a_full_scan(self):
+        with open(move_log.last_game_path(self.path), "r+b") as f:
+            f.seek(8)
+            f.write((5).to_bytes(8, "little"))
+        self.assertIsNone(move_log.last_game_offset(self.path))
+        self.assert_last_game(move_log.last_game(self.path))
+
+    def test_missing_sidecar_falls_back_to_a_full_scan(self):
+        os.remove(move_log.last_game_path(self.path))
+        self.assert_last_game(move_log.last_game(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import contextlib
+import io
+import unittest
+from concurrent.futures import Future
+import puzzle_pool
+import sudoku_generator
+
+
+class FailingExecutor:
+    # Every job fails at once, as one would with a broken worker import
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, func, *args):
+        self.submitted += 1
+        future = Future()
+        future.set_exception(ImportError("no module named 'sudoku_solver'"))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+class PuzzlePoolFailureTest(unittest.TestCase):
+    def test_failing_difficulty_stops_refilling(self):
+        pool = puzzle_pool.PuzzlePool({"Easy": 30, "Hard": 55}, workers=2)
+        pool.executor = executor = FailingExecutor()
+        with contextlib.redirect_stderr(io.StringIO()):
+            pool.refill()
+        self.assertEqual(executor.submitted, 2 * puzzle_pool.MAX_FAILURES)
+        self.assertEqual(pool.pending, {"Easy": 0, "Hard": 0})
+
+    def test_success_resets_the_count(self):
+        pool = puzzle_pool.PuzzlePool({"Easy": 30}, workers=1, target_size=1)
+        pool.failures["Easy"] = puzzle_pool.MAX_FAILURES - 1
+        future = Future()
+        future.set_result(sudoku_generator.generate_seeded(30, 1) + (None,))
+        pool.pending["Easy"] += 1
+        pool._on_done("Easy", future, 0.0)
+        self.assertEqual(pool.failures["Easy"], 0)
+        self.assertEqual(pool.ready("Easy"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
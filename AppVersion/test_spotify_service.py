@@ -0,0 +1,135 @@
+import queue
+import random
+import unittest
+import spotify_stub
+from audio_features import AudioFeatureProvider, AudioFeatures, SpotifyFeatureSource
+from spotify_service import PlaybackService, PollScheduler, spotify_client_factory
+
+try:
+    import spotipy
+except ImportError:
+    spotipy = None
+
+TRACK = spotify_stub.DEMO_TRACK
+
+
+@unittest.skipIf(spotipy is None, "spotipy is not installed")
+class PlaybackServiceStubTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = spotify_stub.SpotifyStub().start()
+        self.addCleanup(self.stub.close)
+        self.stub.play(spotify_stub.track(TRACK, song="First", duration_ms=60000),
+                       progress_ms=20000)
+
+    def service(self, timeout=2.0, feature_provider=None, **scheduler):
+        factory = spotify_client_factory(None, None, None, None, None, timeout=timeout,
+                                         api_base=self.stub.base_url, access_token="stub")
+        service = PlaybackService(factory, PollScheduler(rng=random.Random(0), **scheduler),
+                                  feature_provider=feature_provider)
+        self.addCleanup(service.stop, 2.0)
+        return service
+
+    def connect(self, service):
+        # Runs the first poll on the test thread, as the worker would
+        service.client = service.client_factory()
+        service.poll_once()
+        self.assertEqual(service.drain()[0], ("connected", None))
+
+    def next_update(self, service):
+        return service.updates.get(timeout=5.0)
+
+    def test_connected_only_after_first_successful_poll(self):
+        service = self.service()
+        service.start()
+        kind, payload = self.next_update(service)
+        self.assertEqual(kind, "connected")
+        self.assertEqual(self.stub.count(), 1)
+        kind, playback = self.next_update(service)
+        self.assertEqual(kind, "playback")
+        self.assertEqual((playback.track_id, playback.song, playback.progress_ms),
+                         (TRACK, "First", 20000))
+
+    def test_rejected_first_poll_fails_without_connecting(self):
+        self.stub.fail(401)
+        service = self.service()
+        service.start()
+        kind, error = self.next_update(service)
+        self.assertEqual(kind, "failed")
+        self.assertEqual(error.http_status, 401)
+        service.thread.join(5.0)
+        self.assertFalse(service.running)
+        self.assertEqual(service.drain(), [])
+
+    def test_nothing_playing(self):
+        self.stub.play(None)
+        service = self.service(idle_interval=30.0)
+        self.connect(service)
+        self.assertEqual(service.poll_once(), 30.0)
+        self.assertEqual(service.drain(), [("playback", None)])
+
+    def test_retry_after_is_honoured(self):
+        service = self.service()
+        self.connect(service)
+        self.stub.fail(429, {"Retry-After": "7"})
+        self.assertEqual(service.poll_once(), 7.0)
+        (kind, error), = service.drain()
+        self.assertEqual((kind, error.http_status), ("error", 429))
+        self.assertEqual(service.counters["rate_limited"], 1)
+        # One request per poll: nothing retried behind the scheduler's back
+        self.assertEqual(self.stub.count(), 2)
+
+    def test_backoff_grows_on_server_errors(self):
+        service = self.service(backoff_base=2.0, backoff_max=120.0)
+        self.connect(service)
+        self.stub.fail(503, times=4)
+        for failures in range(1, 5):
+            ceiling = 2.0 * 2 ** (failures - 1)
+            delay = service.poll_once()
+            self.assertTrue(ceiling / 2 <= delay <= ceiling, (failures, delay))
+        self.assertEqual(self.stub.count(), 5)
+        # A success clears the backoff
+        self.assertEqual(service.poll_once(), 15.0)
+        self.assertEqual(service.scheduler.failures, 0)
+
+    def test_timeout_is_reported_and_backed_off(self):
+        service = self.service(timeout=0.2, backoff_base=2.0)
+        self.connect(service)
+        self.stub.stall(1.0)
+        delay = service.poll_once()
+        self.assertTrue(1.0 <= delay <= 2.0)
+        (kind, error), = service.drain()
+        self.assertEqual(kind, "error")
+        self.assertIn("timed out", str(error).lower())
+
+    def test_features_follow_the_snapshot(self):
+        self.stub.features[TRACK] = {"id": TRACK, "tempo": 128.0, "energy": 0.7}
+        self.stub.stall(0.3, path=spotify_stub.QUEUE)
+        provider = AudioFeatureProvider()
+        service = self.service(feature_provider=provider)
+        service.client = service.client_factory()
+        provider.source = SpotifyFeatureSource(service.client)
+        service.poll_once()
+        (_, connected), (_, playback), (kind, payload) = service.drain()
+        self.assertIsNone(playback.tempo)
+        self.assertEqual((kind, payload), ("features", (TRACK, AudioFeatures(128.0, 0.7))))
+        # Later polls of the same track carry the cached features and
+        # make no further feature requests
+        service.poll_once()
+        (kind, playback), = service.drain()
+        self.assertEqual((playback.tempo, playback.energy), (128.0, 0.7))
+        self.assertEqual(self.stub.count(spotify_stub.FEATURES), 1)
+
+    def test_stop_ends_the_worker(self):
+        service = self.service(max_playing_interval=60.0)
+        service.start()
+        self.assertEqual(self.next_update(service)[0], "connected")
+        self.assertEqual(self.next_update(service)[0], "playback")
+        # The worker is now waiting out a long delay; stop() wakes it
+        service.stop(2.0)
+        self.assertFalse(service.running)
+        with self.assertRaises(queue.Empty):
+            service.updates.get(timeout=0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import asyncio
+import random
+import unittest
+import sudoku_generator
+import sudoku_server
+
+
+class FlakyDealer:
+    # Fails the first `failures` deals, then hands out one fixed puzzle
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+        self.puzzle = sudoku_generator.generate(40, random.Random(0))
+
+    async def deal(self, box, difficulty):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("pool is down")
+        return self.puzzle
+
+
+class DealRetryTest(unittest.TestCase):
+    def run_deal(self, server, room):
+        server.rooms[room.name] = room
+        room.dealing = True
+        asyncio.run(asyncio.wait_for(server.deal(room), 5.0))
+
+    def test_failed_deal_is_retried(self):
+        dealer = FlakyDealer(failures=2)
+        server = sudoku_server.GameServer(dealer, deal_retry=0.01)
+        room = sudoku_server.Room("r", 3, "Easy", 2)
+        self.run_deal(server, room)
+        self.assertEqual(dealer.calls, 3)
+        self.assertIsNotNone(room.game)
+        self.assertFalse(room.dealing)
+
+    def test_retry_stops_once_the_room_is_gone(self):
+        dealer = FlakyDealer(failures=100)
+        server = sudoku_server.GameServer(dealer, deal_retry=0.01)
+        room = sudoku_server.Room("r", 3, "Easy", 2)
+        server.rooms["r"] = room
+        room.dealing = True
+
+        async def close_room():
+            task = asyncio.ensure_future(server.deal(room))
+            await asyncio.sleep(0.05)
+            del server.rooms["r"]
+            await asyncio.wait_for(task, 1.0)
+
+        asyncio.run(close_room())
+        self.assertIsNone(room.game)
+        self.assertFalse(room.dealing)
+
+
+if __name__ == "__main__":
+    unittest.main()
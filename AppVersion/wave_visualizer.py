@@ -0,0 +1,84 @@
+import time
+
+
+class WaveVisualizer:
+    def __init__(self, canvas, bar_count=50, fps=8, width=400, height=80,
+                 color='#00AAFF', source=None, min_fps=2):
+        self.canvas = canvas
+        self.bar_count = bar_count
+        self.width = width
+        self.height = height
+        self.color = color
+        # Called once per frame for the newest amplitude (0..1)
+        self.source = source
+
+        # Fixed-size ring buffer; head is the slot of the oldest amplitude
+        self.amplitudes = [0.0] * bar_count
+        self.head = 0
+
+        self.target_interval = 1000.0 / fps
+        self.max_interval = 1000.0 / min_fps
+        self.interval = self.target_interval
+        self.frame_time = 0.0
+        self.frames = 0
+
+        self.bars = []
+        self.create_bars()
+
+    def create_bars(self):
+        self.canvas.delete("wave_bar")
+        bar_width = self.width / self.bar_count
+        center_y = self.height / 2
+        self.x_coords = [(k * bar_width + 1.5, (k + 1) * bar_width - 1.5) for k in range(self.bar_count)]
+        self.bars = [self.canvas.create_rectangle(x0, center_y - 4, x1, center_y + 4,
+                                                  fill=self.color, outline=self.color,
+                                                  tags="wave_bar")
+                     for x0, x1 in self.x_coords]
+
+    def set_color(self, color):
+        if color != self.color:
+            self.color = color
+            self.canvas.itemconfigure("wave_bar", fill=color, outline=color)
+
+    def set_fps(self, fps):
+        self.target_interval = 1000.0 / fps
+        self.interval = self.target_interval
+
+    def push(self, amplitude):
+        self.amplitudes[self.head] = amplitude
+        self.head = (self.head + 1) % self.bar_count
+
+    def fill(self, amplitude_source):
+        for k in range(self.bar_count):
+            self.amplitudes[k] = amplitude_source()
+
+    def draw(self):
+        coords = self.canvas.coords
+        amplitudes = self.amplitudes
+        head = self.head
+        count = self.bar_count
+        center_y = self.height / 2
+        scale = self.height - 5
+        for k, bar in enumerate(self.bars):
+            half = max(8, amplitudes[(head + k) % count] * scale) / 2
+            x0, x1 = self.x_coords[k]
+            coords(bar, x0, center_y - half, x1, center_y + half)
+
+    def step(self):
+        # Draws one frame and returns the delay until the next one in seconds,
+        # which the caller's scheduler uses as the task interval
+        started = time.perf_counter()
+        if self.source is not None:
+            self.push(self.source())
+        self.draw()
+
+        # Smoothed frame cost; if a frame eats more than half its slot, back
+        # the rate off, and recover towards the target once frames are cheap
+        elapsed = (time.perf_counter() - started) * 1000.0
+        self.frame_time = elapsed if not self.frames else 0.8 * self.frame_time + 0.2 * elapsed
+        self.frames += 1
+        if self.frame_time > self.interval * 0.5:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+        elif self.interval > self.target_interval and self.frame_time < self.interval * 0.25:
+            self.interval = max(self.target_interval, self.interval * 0.9)
+        return self.interval / 1000.0